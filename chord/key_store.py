@@ -0,0 +1,680 @@
+"""
+This module holds the key store of the chord nodes.
+
+Keys are the integer ids of the ring, mapped to True for the keys owned by the node and False for the replicas
+it holds for its predecessors. Besides the mapping the store keeps the keys in a sorted index, so the keys
+of a ring interval, e.g. the ones handed to a joining node, are found and removed in O(log n + k) instead of
+scanning the whole store. The index is a list of sorted blocks of bounded size: inserting a key only shifts
+the keys of one block.
+
+With "store_backend": "compact" the keys are kept in two sorted numpy arrays of ids instead, one for the owned
+keys and one for the replicas, about 8 bytes per key instead of about 100 for a dictionary. Recent updates are
+buffered and merged into the arrays in batches.
+
+With "store_shards" above 1 the keys are spread by key modulo the shard count over as many stores of the
+backend, each with its own lock, so requests for different keys don't wait for each other.
+"""
+
+
+import bisect
+import heapq
+import itertools
+import sys
+import threading
+import numpy
+from constants.chord_constants import ChordConstants
+
+
+__all__ = ["KeyStore", "CompactKeyStore", "ShardedKeyStore", "create_key_store"]
+
+
+# ids stored by CompactKeyStore are below this limit
+UINT64_LIMIT = 2 ** 64
+
+
+def create_key_store(backend=ChordConstants.STORE_BACKEND_DICT, data=None, shards=1):
+    """
+    :param backend: Value of the store_backend configuration property.
+    :param data: Initial dictionary of key -> owned flag.
+    :param shards: Number of lock striped shards, 1 for a single store.
+    :return: Key store of the backend.
+    """
+    if shards > 1:
+        parts = ShardedKeyStore.split(data or {}, shards)
+        if backend == ChordConstants.STORE_BACKEND_COMPACT:
+            # the shards together buffer as many updates as a single store
+            merge_threshold = max(CompactKeyStore.merge_threshold // shards, 1)
+            return ShardedKeyStore([CompactKeyStore(part, merge_threshold) for part in parts])
+        return ShardedKeyStore([KeyStore(part) for part in parts])
+    if backend == ChordConstants.STORE_BACKEND_COMPACT:
+        return CompactKeyStore(data)
+    return KeyStore(data)
+
+
+class SortedKeyIndex(object):
+
+    """
+    Sorted list of ints split in blocks of at most 2 * load keys. _maxes holds the last key of every block.
+    """
+
+    load = 1000
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._blocks = [keys[i:i + self.load] for i in range(0, len(keys), self.load)]
+        self._maxes = [block[-1] for block in self._blocks]
+
+    def add(self, key):
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            return
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._blocks):
+            i -= 1
+            self._blocks[i].append(key)
+            self._maxes[i] = key
+        else:
+            bisect.insort(self._blocks[i], key)
+        if len(self._blocks[i]) > 2 * self.load:
+            block = self._blocks[i]
+            self._blocks[i:i + 1] = [block[:self.load], block[self.load:]]
+            self._maxes[i:i + 1] = [block[self.load - 1], block[-1]]
+
+    def remove(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        block = self._blocks[i]
+        del block[bisect.bisect_left(block, key)]
+        if not block:
+            del self._blocks[i]
+            del self._maxes[i]
+        else:
+            self._maxes[i] = block[-1]
+
+    def _locate(self, value, after):
+        # position (block, offset) of the first key >= value, or > value when after is set
+        if after:
+            i = bisect.bisect_right(self._maxes, value)
+            return i, bisect.bisect_right(self._blocks[i], value) if i < len(self._blocks) else 0
+        i = bisect.bisect_left(self._maxes, value)
+        return i, bisect.bisect_left(self._blocks[i], value) if i < len(self._blocks) else 0
+
+    def range(self, lower, higher, include_lower, include_higher, remove=False, limit=None):
+        """
+        :param lower: Lower bound, lower <= higher, None for no bound.
+        :param higher: Higher bound, None for no bound.
+        :param include_lower: Whether lower itself is part of the range.
+        :param include_higher: Whether higher itself is part of the range.
+        :param remove: Removes the keys of the range from the index.
+        :param limit: Gives only the first limit keys of the range, can't be combined with remove.
+        :return: Sorted keys of the range.
+        """
+        start = (0, 0) if lower is None else self._locate(lower, not include_lower)
+        end = (len(self._blocks), 0) if higher is None else self._locate(higher, include_higher)
+        if start >= end:
+            return []
+
+        keys = []
+        emptied = []
+        for i in range(start[0], min(end[0], len(self._blocks) - 1) + 1):
+            block = self._blocks[i]
+            first = start[1] if i == start[0] else 0
+            last = end[1] if i == end[0] else len(block)
+            if limit is not None:
+                keys.extend(block[first:min(last, first + limit - len(keys))])
+                if len(keys) >= limit:
+                    break
+                continue
+            keys.extend(block[first:last])
+            if remove:
+                del block[first:last]
+                if block:
+                    self._maxes[i] = block[-1]
+                else:
+                    emptied.append(i)
+        for i in reversed(emptied):
+            del self._blocks[i]
+            del self._maxes[i]
+        return keys
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+
+class BaseKeyStore(object):
+
+    """
+    Operations shared by the store backends. Backends are thread safe mappings of key -> owned flag which
+    also extract ring intervals and give the owned and replicated keys as arrays for the replication paths.
+    """
+
+    backend = None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def values(self):
+        return [value for key, value in self.items()]
+
+    def __str__(self):
+        return str(self.to_dict())
+
+    __repr__ = __str__
+
+    def get_stats(self):
+        """
+        :return: Backend, number of keys, owned and replicated keys, memory used by the store in bytes and
+                 bytes per key.
+        """
+        keys = len(self)
+        memory = self.memory_usage()
+        owned = len(self.owned_keys())
+        return {"backend": self.backend, "keys": keys, "owned": owned, "replicas": keys - owned, "bytes": memory,
+                "bytes_per_key": memory / keys if keys else 0.0}
+
+
+class KeyStore(BaseKeyStore):
+
+    """
+    Thread safe mapping of key -> owned flag with a sorted index of the keys. Supports the dictionary operations
+    the node uses and the extraction of ring intervals.
+    """
+
+    backend = ChordConstants.STORE_BACKEND_DICT
+
+    def __init__(self, data=None):
+        """
+        :param data: Initial dictionary of key -> owned flag.
+        """
+        self._values = dict(data or {})
+        self._index = SortedKeyIndex(self._values)
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key not in self._values:
+                self._index.add(key)
+            self._values[key] = value
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._values[key]
+            self._index.remove(key)
+
+    def pop(self, key, *default):
+        with self._lock:
+            if key in self._values:
+                self._index.remove(key)
+            return self._values.pop(key, *default)
+
+    def update(self, data):
+        with self._lock:
+            for key, value in data.items():
+                self[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._index = SortedKeyIndex()
+
+    def __len__(self):
+        return len(self._values)
+
+    def keys(self):
+        with self._lock:
+            return list(self._index)
+
+    def items(self):
+        with self._lock:
+            return [(key, self._values[key]) for key in self._index]
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self._values)
+
+    def _arrays(self):
+        # keys and owned flags in one pass each, split with a boolean mask instead of a loop per key
+        with self._lock:
+            count = len(self._values)
+            keys = numpy.fromiter(self._values.keys(), dtype=numpy.uint64, count=count)
+            owned = numpy.fromiter(self._values.values(), dtype=bool, count=count)
+        return keys, owned
+
+    def owned_keys(self):
+        """
+        :return: uint64 numpy array of the owned keys.
+        """
+        keys, owned = self._arrays()
+        return keys[owned]
+
+    def replica_keys(self):
+        """
+        :return: uint64 numpy array of the replicated keys.
+        """
+        keys, owned = self._arrays()
+        return keys[~owned]
+
+    def memory_usage(self):
+        """
+        :return: Approximate bytes used by the dictionary, the index and the key objects.
+        """
+        with self._lock:
+            blocks = self._index._blocks
+            return sys.getsizeof(self._values) + sum(sys.getsizeof(key) for key in self._values) + \
+                sys.getsizeof(blocks) + sum(sys.getsizeof(block) for block in blocks)
+
+    def _range(self, lower, higher, type, remove):
+        # ring interval as in Node.in_bracket, split in at most two sorted ranges when it wraps past zero
+        include_lower = type in ('c', 'l')
+        include_higher = type in ('c', 'r')
+        if lower < higher:
+            return self._index.range(lower, higher, include_lower, include_higher, remove)
+        if lower == higher:
+            # the whole ring, without lower itself for the open interval
+            include_lower = include_higher = type != 'o'
+        return self._index.range(lower, None, include_lower, True, remove) + \
+            self._index.range(None, higher, True, include_higher and lower != higher, remove)
+
+    def keys_in_range(self, lower, higher, type='c'):
+        """
+        :param lower: Lower boundary of the ring interval.
+        :param higher: Higher boundary of the ring interval.
+        :param type: c: closed, r: right closed, l: left closed, o: open, as for Node.in_bracket.
+        :return: Keys of the store in the interval.
+        """
+        with self._lock:
+            return self._range(lower, higher, type, False)
+
+    def keys_page(self, lower, higher, limit):
+        """
+        :param lower: Lowest id of the page.
+        :param higher: Highest id of the page, not wrapping past zero.
+        :param limit: Most keys given.
+        :return: Sorted first keys of [lower, higher].
+        """
+        with self._lock:
+            return self._index.range(lower, higher, True, True, limit=limit)
+
+    def pop_range(self, lower, higher, type='c'):
+        """
+        Removes the keys of a ring interval from the store.
+        :param lower: Lower boundary of the ring interval.
+        :param higher: Higher boundary of the ring interval.
+        :param type: As for keys_in_range.
+        :return: Removed keys as dictionary of key -> owned flag.
+        """
+        with self._lock:
+            return {key: self._values.pop(key) for key in self._range(lower, higher, type, True)}
+
+
+class CompactKeyStore(BaseKeyStore):
+
+    """
+    Key store keeping the owned and the replicated keys in two sorted uint64 arrays. Updates go to a pending
+    dictionary and a set of keys to be removed from the arrays first. They are merged into the arrays once
+    merge_threshold of them, or 1/16 of the store, piled up, or when the sorted keys are needed (iteration,
+    ranges), so a merge copying the arrays happens once per many updates. Ids have to fit in 64 bits.
+
+    It only saves memory: lookups search the arrays and updates pay for the merges, so it is slower than KeyStore
+    on every operation. Nodes use it only when store_backend asks for it.
+    """
+
+    backend = ChordConstants.STORE_BACKEND_COMPACT
+    merge_threshold = 4096
+
+    def __init__(self, data=None, merge_threshold=None):
+        """
+        :param data: Initial dictionary of key -> owned flag.
+        :param merge_threshold: Updates buffered before a merge, defaults to the class merge_threshold.
+        """
+        if merge_threshold:
+            self.merge_threshold = merge_threshold
+        self._owned = numpy.empty(0, dtype=numpy.uint64)
+        self._replicas = numpy.empty(0, dtype=numpy.uint64)
+        # key -> owned flag of the keys set since the last merge, overriding the arrays
+        self._pending = {}
+        # keys to be removed from the arrays, deleted or overridden by _pending since the last merge
+        self._deleted = set()
+        self._size = 0
+        self._lock = threading.RLock()
+        if data:
+            self.update(data)
+
+    @staticmethod
+    def _array_contains(array, key):
+        if not 0 <= key < UINT64_LIMIT:
+            return False
+        # searching with a python int converts the whole array, a numpy scalar doesn't
+        key = numpy.uint64(key)
+        i = array.searchsorted(key)
+        return i < len(array) and array[i] == key
+
+    def _in_arrays(self, key):
+        return self._array_contains(self._owned, key) or self._array_contains(self._replicas, key)
+
+    def _lookup(self, key):
+        # owned flag of key, None if not in the store. Expects lock to be held.
+        if key in self._pending:
+            return self._pending[key]
+        if key in self._deleted:
+            return None
+        if self._array_contains(self._owned, key):
+            return True
+        if self._array_contains(self._replicas, key):
+            return False
+        return None
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key not in self._pending:
+                if key in self._deleted or not self._in_arrays(key):
+                    self._size += 1
+                else:
+                    self._deleted.add(key)
+            self._pending[key] = bool(value)
+            self._merge_if_needed()
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key in self._pending:
+                del self._pending[key]
+            elif key not in self._deleted and self._in_arrays(key):
+                self._deleted.add(key)
+            else:
+                raise KeyError(key)
+            self._size -= 1
+            self._merge_if_needed()
+
+    def pop(self, key, *default):
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            del self[key]
+            return value
+
+    def update(self, data):
+        with self._lock:
+            for key, value in data.items():
+                self[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._owned = numpy.empty(0, dtype=numpy.uint64)
+            self._replicas = numpy.empty(0, dtype=numpy.uint64)
+            self._pending = {}
+            self._deleted = set()
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _merge_if_needed(self):
+        threshold = max(self.merge_threshold, (len(self._owned) + len(self._replicas)) >> 4)
+        if len(self._pending) + len(self._deleted) >= threshold:
+            self._merge()
+
+    @staticmethod
+    def _insert_sorted(array, keys):
+        keys = numpy.sort(numpy.array(keys, dtype=numpy.uint64))
+        return numpy.insert(array, numpy.searchsorted(array, keys), keys)
+
+    def _merge(self):
+        # applies the pending updates to the arrays. Expects lock to be held.
+        if self._deleted:
+            deleted = numpy.fromiter(self._deleted, dtype=numpy.uint64, count=len(self._deleted))
+            self._owned = self._owned[~numpy.isin(self._owned, deleted)]
+            self._replicas = self._replicas[~numpy.isin(self._replicas, deleted)]
+        if self._pending:
+            self._owned = self._insert_sorted(self._owned, [key for key, value in self._pending.items() if value])
+            self._replicas = self._insert_sorted(self._replicas,
+                                                 [key for key, value in self._pending.items() if not value])
+        self._pending = {}
+        self._deleted = set()
+
+    def keys(self):
+        with self._lock:
+            self._merge()
+            return numpy.sort(numpy.concatenate((self._owned, self._replicas))).tolist()
+
+    def items(self):
+        with self._lock:
+            self._merge()
+            keys = numpy.concatenate((self._owned, self._replicas))
+            owned = numpy.concatenate((numpy.ones(len(self._owned), dtype=bool),
+                                       numpy.zeros(len(self._replicas), dtype=bool)))
+        order = numpy.argsort(keys, kind="stable")
+        return list(zip(keys[order].tolist(), owned[order].tolist()))
+
+    def to_dict(self):
+        with self._lock:
+            self._merge()
+            data = dict.fromkeys(self._owned.tolist(), True)
+            data.update(dict.fromkeys(self._replicas.tolist(), False))
+        return data
+
+    @staticmethod
+    def _read_only(array):
+        # the arrays are replaced, never changed in place, by the store. A view keeps callers from changing them.
+        view = array.view()
+        view.setflags(write=False)
+        return view
+
+    def owned_keys(self):
+        """
+        :return: Sorted read only uint64 numpy array of the owned keys.
+        """
+        with self._lock:
+            self._merge()
+            return self._read_only(self._owned)
+
+    def replica_keys(self):
+        """
+        :return: Sorted read only uint64 numpy array of the replicated keys.
+        """
+        with self._lock:
+            self._merge()
+            return self._read_only(self._replicas)
+
+    def memory_usage(self):
+        """
+        :return: Approximate bytes used by the arrays and the pending updates.
+        """
+        with self._lock:
+            return self._owned.nbytes + self._replicas.nbytes + sys.getsizeof(self._pending) + \
+                sys.getsizeof(self._deleted) + sum(sys.getsizeof(key) for key in self._pending) + \
+                sum(sys.getsizeof(key) for key in self._deleted)
+
+    @staticmethod
+    def _range_mask(array, lower, higher, type):
+        # ring interval as in Node.in_bracket, as at most two slices of the sorted array
+        include_lower = type in ('c', 'l')
+        include_higher = type in ('c', 'r')
+        lower, higher = numpy.uint64(lower), numpy.uint64(higher)
+        mask = numpy.zeros(len(array), dtype=bool)
+        if lower < higher:
+            mask[numpy.searchsorted(array, lower, 'left' if include_lower else 'right'):
+                 numpy.searchsorted(array, higher, 'right' if include_higher else 'left')] = True
+            return mask
+        if lower == higher:
+            # the whole ring, without lower itself for the open interval
+            include_lower = type != 'o'
+            include_higher = False
+        mask[numpy.searchsorted(array, lower, 'left' if include_lower else 'right'):] = True
+        mask[:numpy.searchsorted(array, higher, 'right' if include_higher else 'left')] = True
+        return mask
+
+    def keys_in_range(self, lower, higher, type='c'):
+        """
+        :param lower: Lower boundary of the ring interval.
+        :param higher: Higher boundary of the ring interval.
+        :param type: c: closed, r: right closed, l: left closed, o: open, as for Node.in_bracket.
+        :return: Keys of the store in the interval.
+        """
+        with self._lock:
+            self._merge()
+            keys = numpy.concatenate((self._owned[self._range_mask(self._owned, lower, higher, type)],
+                                      self._replicas[self._range_mask(self._replicas, lower, higher, type)]))
+        return numpy.sort(keys).tolist()
+
+    def keys_page(self, lower, higher, limit):
+        """
+        :param lower: Lowest id of the page.
+        :param higher: Highest id of the page, not wrapping past zero.
+        :param limit: Most keys given.
+        :return: Sorted first keys of [lower, higher].
+        """
+        lower, higher = numpy.uint64(lower), numpy.uint64(higher)
+        with self._lock:
+            self._merge()
+            pages = []
+            for array in (self._owned, self._replicas):
+                start = numpy.searchsorted(array, lower, 'left')
+                end = min(numpy.searchsorted(array, higher, 'right'), start + limit)
+                pages.append(array[start:end])
+        return numpy.sort(numpy.concatenate(pages))[:limit].tolist()
+
+    def pop_range(self, lower, higher, type='c'):
+        """
+        Removes the keys of a ring interval from the store.
+        :param lower: Lower boundary of the ring interval.
+        :param higher: Higher boundary of the ring interval.
+        :param type: As for keys_in_range.
+        :return: Removed keys as dictionary of key -> owned flag.
+        """
+        with self._lock:
+            self._merge()
+            owned_mask = self._range_mask(self._owned, lower, higher, type)
+            replicas_mask = self._range_mask(self._replicas, lower, higher, type)
+            removed = dict.fromkeys(self._owned[owned_mask].tolist(), True)
+            removed.update(dict.fromkeys(self._replicas[replicas_mask].tolist(), False))
+            self._owned = self._owned[~owned_mask]
+            self._replicas = self._replicas[~replicas_mask]
+            self._size -= len(removed)
+        return removed
+
+
+class ShardedKeyStore(BaseKeyStore):
+
+    """
+    Key store spreading the keys over shards by key modulo the number of shards. Every shard is a key store
+    with its own lock, operations on one key only lock its shard. Operations on ring intervals go through
+    all the shards.
+    """
+
+    def __init__(self, shards):
+        """
+        :param shards: Key stores of the shards, empty or holding the keys of their shard only.
+        """
+        self._shards = shards
+        self.backend = shards[0].backend
+
+    @staticmethod
+    def split(data, count):
+        """
+        :param data: Dictionary of key -> owned flag.
+        :param count: Number of shards.
+        :return: The dictionary split in one dictionary per shard.
+        """
+        parts = [{} for _ in range(count)]
+        for key, owned in data.items():
+            parts[key % count][key] = owned
+        return parts
+
+    def _shard(self, key):
+        return self._shards[key % len(self._shards)]
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def __getitem__(self, key):
+        return self._shard(key)[key]
+
+    def __setitem__(self, key, value):
+        self._shard(key)[key] = value
+
+    def __delitem__(self, key):
+        del self._shard(key)[key]
+
+    def pop(self, key, *default):
+        return self._shard(key).pop(key, *default)
+
+    def update(self, data):
+        for shard, part in zip(self._shards, self.split(data, len(self._shards))):
+            if part:
+                shard.update(part)
+
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def keys(self):
+        return list(heapq.merge(*(shard.keys() for shard in self._shards)))
+
+    def items(self):
+        return list(heapq.merge(*(shard.items() for shard in self._shards), key=lambda item: item[0]))
+
+    def to_dict(self):
+        data = {}
+        for shard in self._shards:
+            data.update(shard.to_dict())
+        return data
+
+    def owned_keys(self):
+        return numpy.concatenate([shard.owned_keys() for shard in self._shards])
+
+    def replica_keys(self):
+        return numpy.concatenate([shard.replica_keys() for shard in self._shards])
+
+    def memory_usage(self):
+        return sum(shard.memory_usage() for shard in self._shards)
+
+    def keys_in_range(self, lower, higher, type='c'):
+        keys = []
+        for shard in self._shards:
+            keys.extend(shard.keys_in_range(lower, higher, type))
+        return keys
+
+    def keys_page(self, lower, higher, limit):
+        pages = (shard.keys_page(lower, higher, limit) for shard in self._shards)
+        return list(itertools.islice(heapq.merge(*pages), limit))
+
+    def pop_range(self, lower, higher, type='c'):
+        removed = {}
+        for shard in self._shards:
+            removed.update(shard.pop_range(lower, higher, type))
+        return removed
+
+    def get_stats(self):
+        stats = BaseKeyStore.get_stats(self)
+        stats["shards"] = len(self._shards)
+        return stats
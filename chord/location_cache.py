@@ -0,0 +1,150 @@
+"""
+This module holds the node local cache of key to owner resolutions.
+
+A lookup for key k ends with (predecessor, successor) of k, which tells that successor owns every id in
+(predecessor, successor]. The cache keeps these ranges keyed by the owner id, sorted so the range of an id is
+found with a binary search. Entries expire after a ttl and the least recently used entry is evicted when the
+cache is full. Cached owners are only a hint: requests sent to a cached owner ask it to verify ownership and
+fall back to a fresh lookup when it doesn't own the key anymore.
+"""
+
+
+import bisect
+import collections
+import threading
+import time
+
+
+__all__ = ["LocationCache"]
+
+
+def in_range(identifier, lower, higher):
+    """
+    :return: True if identifier is in the ring interval (lower, higher]. lower == higher covers the whole ring.
+    """
+    if lower < higher:
+        return lower < identifier <= higher
+    if lower > higher:
+        return identifier > lower or identifier <= higher
+    return True
+
+
+class LocationCache(object):
+
+    """
+    Thread safe, bounded cache of identifier range -> owner mappings with LRU eviction and a ttl.
+    """
+
+    def __init__(self, max_entries=1024, ttl=30):
+        """
+        :param max_entries: Maximum number of ranges held, 0 disables the cache.
+        :param ttl: Seconds after which a range is not trusted anymore.
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        # owner id -> [lower id, owner node, expiry time], ordered from least to most recently used
+        self._entries = collections.OrderedDict()
+        self._owner_ids = []
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def get(self, identifier):
+        """
+        :param identifier: Hashed key.
+        :return: Cached owner (node_id, connection_string) of the identifier or None.
+        """
+        if not self._max_entries:
+            return None
+        with self._lock:
+            owner_id = None
+            if self._owner_ids:
+                owner_id = self._owner_ids[bisect.bisect_left(self._owner_ids, identifier) % len(self._owner_ids)]
+            if owner_id is None or not in_range(identifier, self._entries[owner_id][0], owner_id):
+                self._stats["misses"] += 1
+                return None
+            lower, owner, expires = self._entries[owner_id]
+            if expires < time.monotonic():
+                self._remove(owner_id)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(owner_id)
+            self._stats["hits"] += 1
+            return owner
+
+    def put(self, lower, owner):
+        """
+        Records that owner is responsible for the ids in (lower, owner id].
+        :param lower: Id of the owner's predecessor.
+        :param owner: (node_id, connection_string) of the owner.
+        :return: None
+        """
+        if not self._max_entries:
+            return
+        owner = tuple(owner)
+        owner_id = owner[0]
+        with self._lock:
+            # ranges overlapping the new one are older information, drop or shrink them
+            for cached_id in [i for i in self._owner_ids if i != owner_id and in_range(i, lower, owner_id)]:
+                self._remove(cached_id)
+            if owner_id in self._entries:
+                self._remove(owner_id)
+            if self._owner_ids:
+                next_id = self._owner_ids[bisect.bisect_right(self._owner_ids, owner_id) % len(self._owner_ids)]
+                if in_range(owner_id, self._entries[next_id][0], next_id):
+                    self._entries[next_id][0] = owner_id
+
+            bisect.insort(self._owner_ids, owner_id)
+            self._entries[owner_id] = [lower, owner, time.monotonic() + self._ttl]
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self):
+        """
+        Drops all the cached ranges, used when the ring around this node changed.
+        :return: None
+        """
+        with self._lock:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._owner_ids = []
+
+    def invalidate_node(self, node):
+        """
+        Drops the ranges owned by a node which failed or refused the ownership of a key.
+        :param node: (node_id, connection_string)
+        :return: None
+        """
+        with self._lock:
+            for owner_id in [i for i in self._owner_ids if self._entries[i][1][1] == node[1]]:
+                self._remove(owner_id)
+                self._stats["invalidations"] += 1
+
+    def report_wrong_owner(self, node):
+        """
+        :param node: Cached owner which doesn't own the key anymore.
+        :return: None
+        """
+        with self._lock:
+            self._stats["wrong_owner"] += 1
+        self.invalidate_node(node)
+
+    def get_stats(self):
+        """
+        :return: Cache counters as dictionary (hits, misses, expired, evictions, invalidations, wrong_owner,
+                 size, hit_ratio).
+        """
+        with self._lock:
+            stats = {name: self._stats[name]
+                     for name in ("hits", "misses", "expired", "evictions", "invalidations", "wrong_owner")}
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, owner_id):
+        # expects lock to be held
+        del self._entries[owner_id]
+        del self._owner_ids[bisect.bisect_left(self._owner_ids, owner_id)]
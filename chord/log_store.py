@@ -0,0 +1,485 @@
+"""
+This module holds the on disk store of the chord nodes, used with "store_backend": "log".
+
+Every change of the key store and of the value store is appended as a record to a log split in segment files
+of store_segment_size bytes. The keys and the location of the latest record of every key are indexed in memory,
+so the log is only read to serve values, through memory maps of the segments. Writers append under a lock and
+then wait for the records to be fsynced. One of the waiting writers fsyncs for all the records appended so far
+(group commit), so concurrent writers share the fsyncs.
+
+Records replaced or deleted by later records are garbage. A background thread compacts the segments mostly
+made of garbage by appending their live records to the log again and removing the segment files. When a node
+restarts the segments are replayed to rebuild the index, the node serves its keys without pulling them from
+its successor again.
+
+Record layout: crc32 (4 bytes), kind (1 byte), key (8 bytes), payload length (4 bytes), payload. The crc
+covers everything after itself. A record cut by a crash at the end of the log is dropped at replay. Besides the
+keys and values the log records the deadlines of the keys set with a ttl, as a double of seconds since the epoch.
+"""
+
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+from chord.key_store import KeyStore
+from chord.value_store import ValueStore
+from constants.chord_constants import ChordConstants
+
+
+__all__ = ["SegmentLog", "LogKeyStore", "LogValueStore", "key_record", "expiry_record"]
+
+
+_HEADER = struct.Struct("<IBQI")
+_DEADLINE = struct.Struct("<d")
+
+# record kinds, the lowest bit marks the deletions
+KEY = 2
+KEY_DELETE = 3
+VALUE = 4
+VALUE_DELETE = 5
+EXPIRY = 6
+EXPIRY_DELETE = 7
+_KINDS = (KEY, KEY_DELETE, VALUE, VALUE_DELETE, EXPIRY, EXPIRY_DELETE)
+
+_OWNED = b"\x01"
+_REPLICA = b"\x00"
+
+
+def key_record(key, owned):
+    """
+    :param key: Key.
+    :param owned: Owned flag of the key.
+    :return: Record setting the flag of the key, for SegmentLog.append.
+    """
+    return KEY, key, _OWNED if owned else _REPLICA
+
+
+def expiry_record(key, deadline):
+    """
+    :param key: Key.
+    :param deadline: Time in seconds since the epoch at which the key expires, None if it doesn't expire anymore.
+    :return: Record setting or removing the deadline of the key, for SegmentLog.append.
+    """
+    if deadline is None:
+        return EXPIRY_DELETE, key, b""
+    return EXPIRY, key, _DEADLINE.pack(deadline)
+
+
+class SegmentLog(object):
+
+    """
+    Segmented append only log of key and value records with an in memory index of the live records.
+    """
+
+    # sealed segments whose live records take less than this share of the segment are compacted
+    compaction_ratio = 0.5
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, sync=True, compaction_interval=30):
+        """
+        Opens the log in directory, replaying the segments already there.
+        :param directory: Directory of the segment files, created if missing.
+        :param segment_size: Size in bytes after which a new segment is started.
+        :param sync: fsync the records before the writes return. When False they are only handed to the OS.
+        :param compaction_interval: Seconds between two compactions of the background thread, 0 disables it.
+        """
+        self._directory = directory
+        self._segment_size = segment_size
+        self._sync = sync
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+
+        # (KEY, VALUE or EXPIRY, key) -> (segment, offset, size, kind) of the latest record
+        self._live = {}
+        # segment -> [size, bytes of live records, live (KEY, VALUE or EXPIRY, key)]
+        self._segments = {}
+        # segment -> memoryview of the memory map of the segment file
+        self._maps = {}
+        self._value_count = 0
+        self._value_bytes = 0
+        self._stats = {"records": 0, "syncs": 0, "compactions": 0, "compaction_errors": 0, "truncated_bytes": 0}
+
+        # group commit: number of appends done and number of appends on disk
+        self._appended = 0
+        self._committed = 0
+        # files of full segments, closed by the next commit
+        self._retired = []
+
+        os.makedirs(directory, exist_ok=True)
+        self._recovered_keys = {}
+        self._recovered_expiries = {}
+        segments = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".log"))
+        for segment in segments:
+            self._replay(segment, segment == segments[-1])
+        self._active = segments[-1] if segments else 0
+        self._segments.setdefault(self._active, [0, 0, set()])
+        self._file = open(self._path(self._active), "ab")
+
+        self._closed = threading.Event()
+        if compaction_interval:
+            threading.Thread(target=self._compaction_loop, args=(compaction_interval,), daemon=True).start()
+
+    def _path(self, segment):
+        return os.path.join(self._directory, "{:010d}.log".format(segment))
+
+    def _replay(self, segment, last):
+        """
+        Indexes the records of a segment file. A torn record at the end of the last segment is cut off.
+        :param segment: Segment number.
+        :param last: Whether this is the last segment of the log.
+        :return: None
+        """
+        with open(self._path(segment), "rb") as segment_file:
+            data = segment_file.read()
+        self._segments[segment] = [0, 0, set()]
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            crc, kind, key, length = _HEADER.unpack_from(data, offset)
+            end = offset + _HEADER.size + length
+            if kind not in _KINDS or end > len(data) or zlib.crc32(memoryview(data)[offset + 4:end]) != crc:
+                break
+            if kind == KEY:
+                self._recovered_keys[key] = data[end - 1] == 1
+            elif kind == KEY_DELETE:
+                self._recovered_keys.pop(key, None)
+            elif kind == EXPIRY:
+                self._recovered_expiries[key] = _DEADLINE.unpack_from(data, end - _DEADLINE.size)[0]
+            elif kind == EXPIRY_DELETE:
+                self._recovered_expiries.pop(key, None)
+            self._index(segment, offset, end - offset, kind, key)
+            offset = end
+        self._segments[segment][0] = offset
+
+        if offset < len(data):
+            # reported by the truncated_bytes figure of get_stats
+            self._stats["truncated_bytes"] += len(data) - offset
+            if last:
+                with open(self._path(segment), "r+b") as segment_file:
+                    segment_file.truncate(offset)
+
+    def _index(self, segment, offset, size, kind, key):
+        # makes the record the live one of its key, the record it replaces becomes garbage
+        entry = (kind & ~1, key)
+        previous = self._live.get(entry)
+        if previous is not None:
+            accounting = self._segments[previous[0]]
+            accounting[1] -= previous[2]
+            accounting[2].discard(entry)
+            if previous[3] == VALUE:
+                self._value_count -= 1
+                self._value_bytes -= previous[2] - _HEADER.size
+        self._live[entry] = (segment, offset, size, kind)
+        accounting = self._segments[segment]
+        accounting[1] += size
+        accounting[2].add(entry)
+        if kind == VALUE:
+            self._value_count += 1
+            self._value_bytes += size - _HEADER.size
+
+    def take_recovered_keys(self):
+        """
+        :return: Keys found in the log when it was opened, as dictionary of key -> owned flag. Only given once.
+        """
+        recovered, self._recovered_keys = self._recovered_keys, {}
+        return recovered
+
+    def take_recovered_expiries(self):
+        """
+        :return: Deadlines found in the log when it was opened, as dictionary of key -> deadline. Only given once.
+        """
+        recovered, self._recovered_expiries = self._recovered_expiries, {}
+        return recovered
+
+    def append(self, records):
+        """
+        Appends records to the log and indexes them. They are on disk once commit returned for the ticket.
+        :param records: (kind, key, payload) tuples, payload a bytes like object.
+        :return: Ticket of the append, for commit.
+        """
+        with self._lock:
+            for kind, key, payload in records:
+                header = _HEADER.pack(0, kind, key, len(payload))
+                crc = zlib.crc32(payload, zlib.crc32(memoryview(header)[4:]))
+                size = len(header) + len(payload)
+                if self._segments[self._active][0] and self._segments[self._active][0] + size > self._segment_size:
+                    self._roll()
+                self._file.write(_HEADER.pack(crc, kind, key, len(payload)))
+                self._file.write(payload)
+                self._index(self._active, self._segments[self._active][0], size, kind, key)
+                self._segments[self._active][0] += size
+            self._stats["records"] += len(records)
+            self._appended += 1
+            return self._appended
+
+    def commit(self, ticket):
+        """
+        Waits until the records of an append are on disk. The first waiting writer syncs the records of all the
+        appends done so far, the writers it synced for return without syncing again.
+        :param ticket: Ticket returned by append.
+        :return: None
+        """
+        with self._sync_lock:
+            if self._committed >= ticket:
+                return
+            self._flush(self._sync)
+
+    def sync(self):
+        """
+        Forces the records appended so far to disk, also when the log was opened with sync False.
+        :return: None
+        """
+        with self._sync_lock:
+            self._flush(True)
+
+    def _flush(self, sync):
+        # called with the sync lock held
+        with self._lock:
+            self._file.flush()
+            ticket = self._appended
+            descriptor = self._file.fileno()
+            retired, self._retired = self._retired, []
+        if sync:
+            os.fsync(descriptor)
+            self._stats["syncs"] += 1
+        for retired_file in retired:
+            if sync and not self._sync:
+                os.fsync(retired_file.fileno())
+            retired_file.close()
+        self._committed = ticket
+
+    def write(self, records):
+        """
+        Appends records and waits until they are on disk.
+        :param records: As for append.
+        :return: None
+        """
+        if records:
+            self.commit(self.append(records))
+
+    def _roll(self):
+        # seals the active segment, its file is closed by the next commit which may still sync it
+        self._file.flush()
+        if self._sync:
+            os.fsync(self._file.fileno())
+        self._retired.append(self._file)
+        self._active += 1
+        self._segments[self._active] = [0, 0, set()]
+        self._file = open(self._path(self._active), "ab")
+
+    def _map(self, segment, end):
+        # memoryview of the segment file covering at least end bytes, remapped when the segment grew
+        view = self._maps.get(segment)
+        if view is None or len(view) < end:
+            with self._lock:
+                if segment == self._active:
+                    self._file.flush()
+                with open(self._path(segment), "rb") as segment_file:
+                    view = self._maps[segment] = memoryview(mmap.mmap(segment_file.fileno(), 0,
+                                                                      access=mmap.ACCESS_READ))
+        return view
+
+    def read_value(self, key):
+        """
+        :param key: Key.
+        :return: memoryview of the value of the key in the memory map of its segment, None if it has no value.
+        """
+        while True:
+            location = self._live.get((VALUE, key))
+            if location is None or location[3] != VALUE:
+                return None
+            segment, offset, size, kind = location
+            try:
+                return self._map(segment, offset + size)[offset + _HEADER.size:offset + size]
+            except FileNotFoundError:
+                # the segment was compacted meanwhile, the record has a new location
+                continue
+
+    def value_keys(self):
+        """
+        :return: Keys having a value.
+        """
+        with self._lock:
+            return [entry[1] for entry, location in self._live.items() if location[3] == VALUE]
+
+    def compact(self):
+        """
+        Compacts the sealed segments whose live records take less than compaction_ratio of the segment.
+        :return: Number of segments compacted.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                segments = [segment for segment, (size, live, entries) in sorted(self._segments.items())
+                            if segment != self._active and live < size * self.compaction_ratio]
+            for segment in segments:
+                self._compact_segment(segment)
+            return len(segments)
+
+    def _compact_segment(self, segment):
+        with self._lock:
+            size, live, entries = self._segments[segment]
+            view = self._map(segment, size) if size else None
+            # deletions are only needed while an older segment may hold a record they delete
+            oldest = segment == min(self._segments)
+            records = []
+            for entry in list(entries):
+                _, offset, record_size, kind = self._live[entry]
+                if kind & 1 and oldest:
+                    del self._live[entry]
+                    continue
+                records.append((kind, entry[1], view[offset + _HEADER.size:offset + record_size]))
+            ticket = self.append(records)
+        # the segment is only removed once its live records are on disk again
+        self.commit(ticket)
+        with self._lock:
+            del self._segments[segment]
+            self._maps.pop(segment, None)
+            os.remove(self._path(segment))
+            self._stats["compactions"] += 1
+
+    def _compaction_loop(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self.compact()
+            except OSError:
+                # retried at the next interval
+                self._stats["compaction_errors"] += 1
+
+    def close(self):
+        """
+        Stops the compaction thread and syncs the records appended so far.
+        :return: None
+        """
+        self._closed.set()
+        self.commit(self._appended)
+        with self._lock:
+            self._file.close()
+
+    def get_stats(self):
+        """
+        :return: Number of segments, bytes on disk and bytes of live records, records written, syncs done and
+                 segments compacted.
+        """
+        with self._lock:
+            disk_bytes = sum(size for size, _, _ in self._segments.values())
+            live_bytes = sum(live for _, live, _ in self._segments.values())
+            stats = {"segments": len(self._segments), "disk_bytes": disk_bytes, "live_bytes": live_bytes}
+            stats.update(self._stats)
+            return stats
+
+
+class LogKeyStore(KeyStore):
+
+    """
+    Key store recording its changes in a SegmentLog. The keys are kept in memory as in KeyStore, the log
+    gives them back when the node restarts.
+    """
+
+    backend = ChordConstants.STORE_BACKEND_LOG
+
+    def __init__(self, log, data=None, recovered=None):
+        """
+        :param log: SegmentLog of the node.
+        :param data: Initial dictionary of key -> owned flag, added to the recovered keys.
+        :param recovered: Keys of the log loaded without writing them again, defaults to all the keys recovered
+                          by the log.
+        """
+        KeyStore.__init__(self, log.take_recovered_keys() if recovered is None else recovered)
+        self._log = log
+        if data:
+            self.update(data)
+
+    def _set_records(self, data):
+        # records of the keys whose flag changes, appended with the store lock held so they match the memory order
+        records = [key_record(key, owned) for key, owned in data.items() if self._values.get(key) is not owned]
+        return self._log.append(records) if records else 0
+
+    def _delete_records(self, keys):
+        return self._log.append([(KEY_DELETE, key, b"") for key in keys]) if keys else 0
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            ticket = self._set_records({key: value})
+            KeyStore.__setitem__(self, key, value)
+        self._log.commit(ticket)
+
+    def __delitem__(self, key):
+        with self._lock:
+            KeyStore.__delitem__(self, key)
+            ticket = self._delete_records([key])
+        self._log.commit(ticket)
+
+    def pop(self, key, *default):
+        with self._lock:
+            ticket = self._delete_records([key] if key in self._values else [])
+            value = KeyStore.pop(self, key, *default)
+        self._log.commit(ticket)
+        return value
+
+    def update(self, data):
+        with self._lock:
+            ticket = self._set_records(data)
+            for key, value in data.items():
+                KeyStore.__setitem__(self, key, value)
+        self._log.commit(ticket)
+
+    def clear(self):
+        with self._lock:
+            ticket = self._delete_records(list(self._values))
+            KeyStore.clear(self)
+        self._log.commit(ticket)
+
+    def pop_range(self, lower, higher, type='c'):
+        with self._lock:
+            removed = KeyStore.pop_range(self, lower, higher, type)
+            ticket = self._delete_records(list(removed))
+        self._log.commit(ticket)
+        return removed
+
+
+class LogValueStore(ValueStore):
+
+    """
+    Value store keeping the values in a SegmentLog, read through the memory maps of its segments. Chunked
+    uploads are staged in memory as in ValueStore.
+    """
+
+    def __init__(self, log):
+        """
+        :param log: SegmentLog of the node.
+        """
+        ValueStore.__init__(self)
+        self._log = log
+
+    def get(self, key):
+        return self._log.read_value(key)
+
+    def put(self, key, value):
+        self._log.write([(VALUE, key, value)])
+
+    def pop(self, key):
+        with self._lock:
+            value = self._log.read_value(key)
+            ticket = self._log.append([(VALUE_DELETE, key, b"")]) if value is not None else 0
+        self._log.commit(ticket)
+        return value
+
+    def get_many(self, keys):
+        values = ((key, self._log.read_value(key)) for key in keys)
+        return [(key, value) for key, value in values if value is not None]
+
+    def pop_many(self, keys):
+        with self._lock:
+            keys = [key for key in keys if self._log.read_value(key) is not None]
+            ticket = self._log.append([(VALUE_DELETE, key, b"") for key in keys]) if keys else 0
+        self._log.commit(ticket)
+
+    def items(self):
+        return self.get_many(self._log.value_keys())
+
+    def get_stats(self):
+        stats = ValueStore.get_stats(self)
+        stats["values"] = self._log._value_count
+        stats["value_bytes"] = self._log._value_bytes
+        return stats
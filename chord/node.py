@@ -6,18 +6,72 @@ The classes represents as their name suggests.
 Authors: Adarsh Trivedi, Ishan Goel
 """
 from utilities.configuration import ConfigurationManager
-import xmlrpc.client
+from messaging.connection_pool import ConnectionPoolManager
+from messaging.socket_messaging import split_connection_string
+from constants.chord_constants import ChordConstants
+from constants.messaging_constants import MessagingConstants
+from chord.location_cache import LocationCache
+from chord.tracing import LookupTracer
+from chord.ring import get_ring
+from chord.key_store import create_key_store, ShardedKeyStore
+from chord.value_store import ValueStore, as_bytes
+from chord.log_store import SegmentLog, LogKeyStore, LogValueStore, expiry_record
+from chord.timer_wheel import TimerWheel
+from chord import ring_intervals
+from chord import snapshot
 import traceback
 import inspect
 from utilities import consistent_hashing
 import ast
+import bisect
+import collections
+import math
+import os
 import random
+import itertools
+import threading
+import time
+import uuid
+import concurrent.futures
+import xmlrpc.client
+import numpy
 from utilities.app_logging import Logging
 
 logger = Logging.get_logger(__name__)
 debug = False
 function_debug = False
 
+# how many times a lookup hop is retried on a failing node before the lookup fails
+LOOKUP_HOP_RETRIES = ChordConstants.LOOKUP_HOP_RETRIES
+LOOKUP_MAX_HOPS = ChordConstants.LOOKUP_MAX_HOPS
+
+# threads forwarding recursive lookups on behalf of other nodes
+FORWARDING_WORKERS = 16
+
+# threads sending the parallel queries of hedged lookups
+HEDGING_WORKERS = 16
+
+# store operations a recursive lookup can perform on the owner of the key
+RECURSIVE_OPERATIONS = ("set_key", "get_key", "delete_key", "get_value_key", "locate_key")
+
+# threads sending the batches of the multi key requests to the owners of the keys
+BATCH_WORKERS = 16
+
+# most keys sent to an owner in one batch
+BATCH_MAX_KEYS = 1024
+
+
+# routing state of a node, see Node._publish_routing
+RoutingState = collections.namedtuple("RoutingState", ["predecessor", "successor", "successor_list"])
+
+
+def _as_node(node):
+    """
+    :param node: (node id, connection string) as list (from RPCs) or tuple, or None.
+    :return: The node as tuple, None stays None.
+    """
+    return tuple(node) if node is not None else None
+
 
 class Finger(object):
 
@@ -27,7 +81,10 @@ class Finger(object):
     Contains basic attributes like ip, key(identifier) and port.
     """
 
-    def __init__(self, ip, identifier, port, finger_number, my_chord_server_node_id):
+    __slots__ = ("_my_chord_server_node_id", "_ring", "_ip", "_identifier", "_port", "_finger_number", "start",
+                 "node", "_connection_string")
+
+    def __init__(self, ip, identifier, port, finger_number, my_chord_server_node_id, ring=None):
         """
         Author: Adarsh Trivedi
         :param ip: Ip of the finger pointing to node.
@@ -35,18 +92,18 @@ class Finger(object):
         :param port: Port of the finger pointing to node.
         :param finger_number: Finger number in the finger table.
         :param my_chord_server_node_id: Node id of the chord node of which this finger is in.
+        :param ring: chord.ring.Ring of the node, defaults to the ring of the configured m_bits.
         """
         self._my_chord_server_node_id = my_chord_server_node_id
-        self._config = ConfigurationManager.get_configuration()
+        self._ring = ring or get_ring(ConfigurationManager.get_configuration().get_m_bits())
         self._ip = ip
         self._identifier = identifier
         self._port = port
         self._finger_number = finger_number
-        self.start = (self._my_chord_server_node_id + (2**(self._finger_number-1))) % (2**self._config.get_m_bits())
+        self.start = self._ring.finger_start(my_chord_server_node_id, finger_number)
 
         # should be successor of _start
         self.node = None
-        self.xml_client = None
         self._connection_string = ip + ":" + str(port)
 
     def __str__(self):
@@ -77,7 +134,7 @@ class Finger(object):
         return self._connection_string
 
     def get_xml_client(self):
-        return self.xml_client
+        return ConnectionPoolManager.get_connection_pool().get_client(self._connection_string)
 
     """
     Author: Adarsh Trivedi
@@ -95,15 +152,12 @@ class Finger(object):
     def set_node(self, node):
         self.node = node
 
-    def set_xml_client(self, client):
-        self.xml_client = client
-
     def set_connection_string(self, connection_string):
         self._connection_string = connection_string
 
     def set_finger_number(self, finger_number):
         self._finger_number = finger_number
-        self.start = (self._my_chord_server_node_id + (2 ** (self._finger_number - 1))) % (2 ** self._config.get_m_bits())
+        self.start = self._ring.finger_start(self._my_chord_server_node_id, finger_number)
 
     def create_copy(self, my_chord_server_id=None):
         """
@@ -113,12 +167,15 @@ class Finger(object):
         :return: Finger
         """
         if my_chord_server_id:
-            return Finger(self.get_ip(), self.get_identifier(), self.get_port(), self.get_finger_number(),
-                          my_chord_server_id)
+            finger = Finger(self.get_ip(), self.get_identifier(), self.get_port(), self.get_finger_number(),
+                            my_chord_server_id, self._ring)
 
         else:
-            return Finger(self.get_ip(), self.get_identifier(), self.get_port(), self.get_finger_number(),
-                          self._my_chord_server_node_id)
+            finger = Finger(self.get_ip(), self.get_identifier(), self.get_port(), self.get_finger_number(),
+                            self._my_chord_server_node_id, self._ring)
+        # the connection string also holds the path of a virtual node
+        finger.set_connection_string(self.get_connection_string())
+        return finger
 
     @staticmethod
     def go_back_n_test(node_id, i, m):
@@ -145,15 +202,29 @@ class FingerTable(object):
     """
     Represents the finger table for each node. Encapsulates some helper functions
     for the finger table.
+
+    Besides the m fingers the table keeps an index of the distinct nodes the fingers point to, sorted by
+    their clockwise distance from the owning node. Fingers pointing to the same node share one index entry,
+    which in small rings is most of them.
+
+    Updates copy the table and the index and replace them at once under a lock, lookups read them without
+    locking.
     """
 
-    def __init__(self, size):
+    def __init__(self, size, node_id=0):
         """
         Author: Adarsh Trivedi
         :param size: Size of the table. This is pre-decided based on m-bits.
+        :param node_id: Id of the node owning the table, distances in the index are measured from it.
         """
         self._table_size = size
-        self._table = [None]*self._table_size
+        self._table = (None,)*self._table_size
+        self._node_id = node_id
+        self._ring_size = get_ring(size).size
+        self._lock = threading.Lock()
+        # (sorted clockwise distances of the distinct finger nodes, (node_id, connection_string, finger numbers)
+        # of the node at the same position)
+        self._index = ((), ())
 
     def get_max_table_size(self) -> int:
         """
@@ -182,7 +253,9 @@ class FingerTable(object):
         if self.get_table_size() >= self.get_max_table_size():
             pass
         else:
-            self._table.append(finger)
+            with self._lock:
+                self._table = self._table + (finger,)
+                self._build_index()
 
     def update_finger_at_ith_position(self, i: int, finger: Finger) -> None:
         """
@@ -192,7 +265,56 @@ class FingerTable(object):
         :param finger: Finger class object representing finger
         :return: None
         """
-        self._table[i] = finger
+        with self._lock:
+            table = list(self._table)
+            table[i] = finger
+            self._table = tuple(table)
+            self._build_index()
+
+    def _build_index(self):
+        """
+        Rebuilds the sorted index of distinct finger nodes. Fingers change rarely compared to lookups,
+        rebuilding the m entries keeps the index simple.
+        :return: None
+        """
+        nodes = {}
+        for finger in self._table:
+            if finger is None or finger.node is None:
+                continue
+            offset = (finger.node - self._node_id) % self._ring_size
+            if offset in nodes:
+                nodes[offset][2].append(finger.get_finger_number())
+            else:
+                nodes[offset] = [finger.node, finger.get_connection_string(), [finger.get_finger_number()]]
+        offsets = tuple(sorted(nodes))
+        self._index = (offsets, tuple((nodes[offset][0], nodes[offset][1], tuple(nodes[offset][2]))
+                                      for offset in offsets))
+
+    def closest_preceding_finger(self, identifier):
+        """
+        Binary search of the index for the finger node closest before identifier, going clockwise
+        from the owning node.
+        :param identifier: ID
+        :return: (node_id, connection_string) of the finger or None if no finger precedes identifier.
+        """
+        fingers = self.preceding_fingers(identifier, 1)
+        return fingers[0] if fingers else None
+
+    def preceding_fingers(self, identifier, count):
+        """
+        :param identifier: ID
+        :param count: Maximum number of fingers returned.
+        :return: Distinct finger nodes preceding identifier, closest to identifier first.
+        """
+        # identifier equal to the node id stands for the whole ring
+        target = (identifier - self._node_id) % self._ring_size or self._ring_size
+        offsets, nodes = self._index
+        i = bisect.bisect_left(offsets, target)
+        fingers = []
+        while i > 0 and len(fingers) < count and offsets[i - 1] > 0:
+            i -= 1
+            fingers.append((nodes[i][0], nodes[i][1]))
+        return fingers
 
     def get_finger_ith(self, i):
         """
@@ -220,9 +342,9 @@ class FingerTable(object):
         """
 
         s = "Finger Table\n"
-        s += "| IP | Identifier | Port | Start | Node | Finger Number |\n"
-        for finger in self._table:
-            s += str(finger)
+        s += "| Node | Connection | Finger Numbers |\n"
+        for node_id, connection_string, finger_numbers in self._index[1]:
+            s += "| {} | {} | {} |\n".format(node_id, connection_string, ", ".join(map(str, finger_numbers)))
         return s
 
 
@@ -245,24 +367,47 @@ class Node(object):
     10. Delete
     """
 
-    def __init__(self, node_id, node_ip, bootstrap_node=None):
+    def __init__(self, node_id, node_ip, bootstrap_node=None, virtual_node=0):
 
         """
         Author: Adarsh Trivedi
         :param node_id: Hash node id, represents id on the chord ring.
         :param node_ip: IP of the node.
         :param bootstrap_node: Bootstrap server to start with. Can be None for new chord ring formation.
+        :param virtual_node: Index of the node among the virtual nodes of its server. Virtual node 0 is reached at
+                             ip:port, the others share its listener and are reached at ip:port/v<index>.
         """
 
         self._node_id = node_id
         self._node_ip = node_ip
         self._config = ConfigurationManager.get_configuration()
+        self._ring = get_ring(self._config.get_m_bits())
         self._port = self._config.get_socket_port()
+        # read on every request, lookup hop and value chunk, taken from the configuration once
+        self._rpc_engine = self._config.get_rpc_engine()
+        self._lookup_parallelism = self._config.get_lookup_parallelism()
+        self._lookup_hedge_delay = self._config.get_lookup_hedge_delay()
+        self._lookup_hop_timeout = self._config.get_lookup_hop_timeout()
+        self._proximity_routing = self._config.get_proximity_routing()
+        self._proximity_candidates = self._config.get_proximity_candidates()
+        self._lookup_mode = self._config.get_lookup_mode()
+        self._lookup_timeout = self._config.get_lookup_timeout()
+        self._value_chunk_size = self._config.get_value_chunk_size()
+        self._max_value_size = self._config.get_max_value_size()
+        self._scan_page_size = self._config.get_scan_page_size()
+        self._connection_string = self._node_ip + ":" + str(self._port)
+        if virtual_node:
+            self._connection_string += "/v{}".format(virtual_node)
         self._bootstrap_server = bootstrap_node
-        self._finger_table = FingerTable(size=self._config.get_m_bits())
-        self.predecessor = None
-        self.successor = None
-        self.successor_list = [(self.get_node_id(), self.get_connection_string())]*3
+        self._finger_table = FingerTable(size=self._config.get_m_bits(), node_id=node_id)
+        # predecessor, successor and successor list are published together as one immutable RoutingState,
+        # replaced under _routing_lock. Readers take the current state without locking.
+        self._routing_lock = threading.Lock()
+        self._routing = RoutingState(None, None, ((self.get_node_id(), self.get_connection_string()),) * 3)
+        self.location_cache = LocationCache(self._config.get_location_cache_size(),
+                                            self._config.get_location_cache_ttl())
+        self.tracer = LookupTracer(self._config.get_lookup_tracing(), self._config.get_lookup_trace_window(),
+                                   self._config.get_lookup_trace_history())
 
         if not bootstrap_node:
             logger.info("Creating new node, with no bootstrap server.")
@@ -273,7 +418,47 @@ class Node(object):
 
         self._set_default_node_parameters()
 
-        self._store = {}
+        if self._config.get_store_backend() == ChordConstants.STORE_BACKEND_LOG:
+            # keys and values persisted in the node's log, found again when the node restarts
+            self._store_log = SegmentLog(self._get_state_directory(),
+                                         self._config.get_store_segment_size(), self._config.get_store_sync(),
+                                         self._config.get_store_compaction_interval())
+            recovered = self._store_log.take_recovered_keys()
+            if self._config.get_store_shards() > 1:
+                self._store = ShardedKeyStore([LogKeyStore(self._store_log, recovered=part) for part in
+                                               ShardedKeyStore.split(recovered, self._config.get_store_shards())])
+            else:
+                self._store = LogKeyStore(self._store_log, recovered=recovered)
+            self._values = LogValueStore(self._store_log)
+            logger.info("Recovered {} keys from the store log.".format(len(self._store)))
+            if self._store_log.get_stats()["truncated_bytes"]:
+                logger.warning("Dropped {} bytes of damaged records of the store log.".format(
+                    self._store_log.get_stats()["truncated_bytes"]))
+        else:
+            self._store_log = None
+            self._store = create_key_store(self._config.get_store_backend(), shards=self._config.get_store_shards())
+            self._values = ValueStore()
+
+        # deadlines of the keys set with a ttl, owned keys and replicas alike
+        self._expiry = TimerWheel(time.time(), self._config.get_expiry_tick())
+        if self._store_log:
+            self._restore_expiries(self._store_log.take_recovered_expiries())
+
+        # recursive lookups started by this node waiting for the owner's reply, keyed by request id
+        self._recursive_lookups = {}
+        self._recursive_lookups_lock = threading.Lock()
+        self._recursive_lookup_ids = itertools.count()
+        self._forwarding_executor = None
+
+        self._proximity_stats = collections.Counter()
+        self._proximity_lock = threading.Lock()
+
+        self._hedging_executor = None
+        self._hedging_stats = collections.Counter()
+        self._hedging_lock = threading.Lock()
+
+        self._batch_executor = None
+        self._batch_lock = threading.Lock()
 
     def i_start(self, node_id, i) -> int:
         """
@@ -283,8 +468,7 @@ class Node(object):
         :param i: node_id + 2^i
         :return: node_id + 2^i
         """
-        start = (node_id + (2 ** (i - 1))) % (2 ** self._config.get_m_bits())
-        return start
+        return self._ring.finger_start(node_id, i)
 
     def go_back_n(self, node_id, i) -> int:
         """
@@ -294,12 +478,7 @@ class Node(object):
         :param i: How many steps to move back.
         :return: id after moving specified steps back.
         """
-        diff = node_id - i
-
-        if diff >= 0:
-            return diff
-        else:
-            return node_id + (2 ** self._config.get_m_bits() - i)
+        return self._ring.go_back(node_id, i)
 
     """
     Author: Adarsh Trivedi
@@ -307,8 +486,44 @@ class Node(object):
     """
     def _set_default_node_parameters(self) -> None:
 
-        self.predecessor = None
-        self.successor = None
+        self._publish_routing(predecessor=None, successor=None)
+
+    def _publish_routing(self, **changes):
+        """
+        Replaces the routing state by a copy with the changes. Invalidates the location cache when the
+        neighbours changed.
+        :param changes: New predecessor, successor and/or successor_list.
+        :return: None
+        """
+        with self._routing_lock:
+            previous = self._routing
+            self._routing = previous._replace(**changes)
+        if previous != self._routing:
+            self.location_cache.invalidate()
+
+    @property
+    def predecessor(self):
+        return self._routing.predecessor
+
+    @predecessor.setter
+    def predecessor(self, predecessor):
+        self._publish_routing(predecessor=_as_node(predecessor))
+
+    @property
+    def successor(self):
+        return self._routing.successor
+
+    @successor.setter
+    def successor(self, successor):
+        self._publish_routing(successor=_as_node(successor))
+
+    @property
+    def successor_list(self):
+        return self._routing.successor_list
+
+    @successor_list.setter
+    def successor_list(self, successor_list):
+        self._publish_routing(successor_list=tuple(_as_node(successor) for successor in successor_list))
 
     def set_predecessor(self, predecessor) -> None:
         self.predecessor = predecessor
@@ -326,48 +541,68 @@ class Node(object):
 
         logger.info("Setting successor for this node to {}.".format(successor))
 
+        # the new successor list is built aside and published at once, readers never see it half updated
+        state = self._routing
+
         # if normal set call, set the successor to specified value.
         # stabilization call passes "successor" as what node already has and makes no sense to set again.
-        if not stabilization:
-            self.successor = successor
+        if stabilization:
+            successor = state.successor
+        successor = _as_node(successor)
 
         # update the successor list's first value to the successor
-        self.successor_list[0] = self.successor
+        successor_list = [successor] + list(state.successor_list[1:])
+        crashed = False
 
         # the implementation maintains 3 successors in the successor list. As a part of stabilization
         # we try to make sure these pointers are correct.
         i = 1
         while i < 3:
             # get the client for the previous element in the successor list
-            intermediate_client = self.get_xml_client(self.successor_list[i-1])
+            intermediate_client = self._get_client(successor_list[i-1])
             try:
                 # if client obtained successfully then set current value of successor list
                 # to the successor of the previous element in successor list
                 intermediate_client.get_node_id()
-                self.successor_list[i] = intermediate_client.get_successor()
+                if intermediate_client is self:
+                    # this node's successor is the one being set, not the published one
+                    successor_list[i] = successor
+                else:
+                    successor_list[i] = _as_node(intermediate_client.get_successor())
             except:
                 # if client couldn't be obtained then this successor element should be the previous
                 # successor element since previous successor element is not valid
-                self.successor_list[i-1] = self.successor_list[i]
+                successor_list[i-1] = successor_list[i]
                 if i == 1:
                     # if i is 1 and client for 0 was not obtained successfully that means
                     # we have to change the successor also of this node
                     # since successor_list[0] is the successor
-                    logger.info("Suspect a crash for node [{}].".format(self.get_successor()))
-                    self.successor = self.successor_list[i]
-                    self.update_finger_table(self.get_successor(), 0, True)
-
-                    # update the predecessor as well
-                    try:
-                        intermediate_client_for_predecessor = self.get_xml_client(self.get_successor())
-                        intermediate_client_for_predecessor.get_node_id()
-                        intermediate_client_for_predecessor.set_predecessor((self.get_node_id(), self.get_connection_string()))
-                    except:
-                        logger.exception("Will try again updating the predecessor.")
-                    # as successor was changed replicate the keys to new successors in the successor_list
-                    self.replicate_keys_to_successors()
+                    logger.info("Suspect a crash for node [{}].".format(successor))
+                    successor = successor_list[i]
+                    crashed = True
             i += 1
 
+        with self._routing_lock:
+            if stabilization and self._routing.successor != state.successor:
+                # the successor was set while stabilizing, the next stabilization refreshes the list
+                return
+            self._routing = self._routing._replace(successor=successor, successor_list=tuple(successor_list))
+        if self._routing.successor_list != state.successor_list:
+            self.location_cache.invalidate()
+
+        if crashed:
+            self.update_finger_table(successor, 0, True)
+
+            # update the predecessor as well
+            try:
+                intermediate_client_for_predecessor = self._get_client(successor)
+                intermediate_client_for_predecessor.get_node_id()
+                intermediate_client_for_predecessor.set_predecessor((self.get_node_id(), self.get_connection_string()))
+            except:
+                logger.exception("Will try again updating the predecessor.")
+            # as successor was changed replicate the keys to new successors in the successor_list
+            self.replicate_keys_to_successors()
+
     """
     Author: Adarsh Trivedi
     Getter functions of the class attributes.
@@ -382,7 +617,7 @@ class Node(object):
         return self._node_id
 
     def get_connection_string(self):
-        return self._node_ip + ":" + str(self._port)
+        return self._connection_string
 
     def get_port(self):
         return self._port
@@ -411,35 +646,25 @@ class Node(object):
             logger.warning("No bootstrap server provided. Starting a new chord ring.")
             logger.info("Initializing the finger table.")
             for i in range(1, self._config.get_m_bits()+1):
-                finger = Finger(ip=self._config.get_chord_server_ip(),
-                                identifier=self._node_id,
-                                port=self._config.get_socket_port(),
-                                finger_number=i,
-                                my_chord_server_node_id=self.get_node_id())
-
-                finger.set_node(self.get_node_id())
-                finger.set_xml_client(xmlrpc.client.ServerProxy(
-                    'http://' + self.get_node_ip() + ":" + str(self.get_port()) + '/RPC2'))
+                finger = self._new_finger((self.get_node_id(), self.get_connection_string()), i)
 
                 self._finger_table.update_finger_at_ith_position(i-1, finger)
             logger.info("Predecessor {}.".format(self.get_node_id()))
-            self.set_predecessor(predecessor=(self.get_node_id(),
-                                              self.get_node_ip() + ":" + str(self.get_port())))
+            self.set_predecessor(predecessor=(self.get_node_id(), self.get_connection_string()))
             logger.info("Successor {}.".format(self.get_node_id()))
-            self.set_successor(successor=(self.get_node_id(),
-                                          self.get_node_ip() + ":" + str(self.get_port())))
+            self.set_successor(successor=(self.get_node_id(), self.get_connection_string()))
             logger.info("No need to update others. This is the only node is p2p system.")
         else:
             logger.info("Joining an existing chord ring with bootstrap server {}.".format(self._bootstrap_server))
             try:
 
-                nprime = xmlrpc.client.ServerProxy('http://' + self._bootstrap_server + '/RPC2')
+                nprime = self.get_xml_client((None, self._bootstrap_server))
                 nprime.get_finger_table()
                 self.set_predecessor(nprime.find_predecessor(self.get_node_id()))
 
                 logger.info("Found predecessor: " + str(self.get_predecessor()))
 
-                self.set_successor(self.get_xml_client(self.get_predecessor()).get_successor())
+                self.set_successor(self._get_client(self.get_predecessor()).get_successor())
                 logger.info("Found successor: " + str(self.get_successor()))
 
                 logger.info("Initializing the finger table.")
@@ -450,11 +675,11 @@ class Node(object):
                 logger.info("Successfully updated others about this join.")
 
                 logger.info("Updating this node's successor's predecessor pointer to this node.")
-                (self.get_xml_client(self.get_successor())).set_predecessor(
+                (self._get_client(self.get_successor())).set_predecessor(
                     (self.get_node_id(), self.get_connection_string()))
                 logger.info("Update successful.")
                 logger.info("Updating this node's predecessor's successor pointer to this node.")
-                (self.get_xml_client(self.get_predecessor())).set_successor(
+                (self._get_client(self.get_predecessor())).set_successor(
                     (self.get_node_id(), self.get_connection_string()))
                 logger.info("Update successful.")
 
@@ -474,15 +699,189 @@ class Node(object):
         logger.info(str(self._finger_table))
         logger.info("Join successful.")
 
+    def _get_state_directory(self):
+        """
+        :return: Directory of the store log and the snapshots of this node.
+        """
+        return os.path.join(self._config.get_store_directory(), str(self.get_node_id()))
+
+    def save_snapshot(self):
+        """
+        Saves the finger table, successor list and predecessor of this node with a checkpoint of its store, for
+        warm_restart. The log store backend only syncs its log, which is the checkpoint.
+        :return: None
+        """
+        checkpoint = None
+        if self._store_log:
+            self._store_log.sync()
+        else:
+            checkpoint = snapshot.write_checkpoint(self._get_state_directory(), self._store.items(),
+                                                   self._values.items(),
+                                                   self._expiry.get_deadlines(self._store.keys()))
+        fingers = [self._finger_table.get_finger_ith(i) for i in range(self._finger_table.get_table_size())]
+        failures = snapshot.save_snapshot(self._get_state_directory(), {
+            "node_id": self.get_node_id(),
+            "connection_string": self.get_connection_string(),
+            "m_bits": self._config.get_m_bits(),
+            "store_backend": self._config.get_store_backend(),
+            "predecessor": self.get_predecessor(),
+            "successor_list": self.get_successor_list(),
+            "fingers": [(finger.node, finger.get_connection_string()) for finger in fingers],
+            "checkpoint": checkpoint})
+        for name, error in failures:
+            logger.warning("Removing the old checkpoint {} failed. {}".format(name, error))
+        logger.info("Saved snapshot of {} fingers and {} keys.".format(len(fingers), len(self._store)))
+
+    def warm_restart(self):
+        """
+        Resumes from the last snapshot instead of joining again. The snapshot is used when it is recent enough
+        (snapshot_max_age) and its neighbours still are: the successor is reachable and no node joined between
+        this node and its predecessor or successor meanwhile. The fingers are taken as they were, fix_fingers
+        corrects the stale ones. Keys set at the successor while this node was away are pulled as during join.
+        :return: True if the node resumed, False if it has to join.
+        """
+        if not self._config.get_snapshot_interval():
+            return False
+        state = snapshot.load_snapshot(self._get_state_directory(), self._config.get_snapshot_max_age())
+        if not state:
+            logger.info("No recent snapshot, joining.")
+            return False
+        if (state["node_id"], state["connection_string"], state["m_bits"], state["store_backend"]) != \
+                (self.get_node_id(), self.get_connection_string(), self._config.get_m_bits(),
+                 self._config.get_store_backend()):
+            logger.info("Snapshot of another node configuration, joining.")
+            return False
+
+        predecessor = tuple(state["predecessor"])
+        successor_list = [tuple(successor) for successor in state["successor_list"]]
+        successor = self._validate_snapshot(predecessor, successor_list)
+        if not successor:
+            logger.info("Snapshot is stale, joining.")
+            return False
+
+        logger.info("Resuming from snapshot with predecessor {} and successor {}.".format(predecessor, successor))
+        fingers = [successor] + [tuple(finger) for finger in state["fingers"][1:]]
+        for i, finger_node in enumerate(fingers):
+            self._finger_table.update_finger_at_ith_position(i, self._new_finger(finger_node, i + 1))
+        self.successor_list = successor_list
+        self.set_predecessor(predecessor)
+        self.set_successor(successor)
+
+        if state["checkpoint"]:
+            keys, values, expiries = snapshot.read_checkpoint(self._get_state_directory(), state["checkpoint"])
+            self._store.update(keys)
+            for key, value in values:
+                self._values.put(key, value)
+            self._restore_expiries(expiries)
+
+        if successor[0] != self.get_node_id():
+            self._get_client(successor).set_predecessor((self.get_node_id(), self.get_connection_string()))
+            self._get_client(predecessor).set_successor((self.get_node_id(), self.get_connection_string()))
+            self.initialize_store()
+            self.replicate_keys_to_successors()
+        logger.info("Restart from snapshot successful, {} keys.".format(len(self._store)))
+        return True
+
+    def _validate_snapshot(self, predecessor, successor_list):
+        """
+        :param predecessor: Predecessor of the snapshot.
+        :param successor_list: Successor list of the snapshot.
+        :return: First reachable successor of the list if the snapshot neighbourhood is still valid, else None.
+                 This node itself when it was alone in the ring.
+        """
+        node_id = self.get_node_id()
+        timeout = self._lookup_hop_timeout
+        if predecessor[0] == node_id and all(successor[0] == node_id for successor in successor_list):
+            return predecessor
+
+        for successor in successor_list:
+            if successor[0] == node_id:
+                continue
+            try:
+                successor_predecessor = self._get_client(successor, timeout).get_predecessor()
+            except Exception:
+                continue
+            # the successor's predecessor is this node, or the node it fell back to while this node was away
+            if successor_predecessor and successor_predecessor[0] != node_id and \
+                    not self.in_bracket(node_id, [successor_predecessor[0], successor[0]], 'o'):
+                return None
+            break
+        else:
+            return None
+
+        try:
+            predecessor_successor = self._get_client(predecessor, timeout).get_successor()
+        except Exception:
+            return None
+        if predecessor_successor[0] != node_id and \
+                not self.in_bracket(node_id, [predecessor[0], predecessor_successor[0]], 'o'):
+            return None
+        return successor
+
     @staticmethod
-    def get_xml_client(node) -> xmlrpc.client.ServerProxy:
+    def get_xml_client(node, timeout=None):
         """
         Author: Adarsh Trivedi
-        Helper function. Creates an XML RPC client for the passed node.
+        Helper function. Gives an XML RPC client for the passed node backed by the node wide
+        connection pool, so consecutive calls to the same peer reuse a keep-alive connection.
         :param node: Node to create client for.
+        :param timeout: Seconds after which calls of the client fail, None for peer_call_timeout.
         :return: XML RPC Client
         """
-        return xmlrpc.client.ServerProxy("http://" + node[1] + "/RPC2")
+        return ConnectionPoolManager.get_connection_pool().get_client(node[1], timeout)
+
+    def _new_finger(self, node, finger_number):
+        """
+        :param node: (node id, connection string) the finger points to.
+        :param finger_number: Finger number, 1 to m.
+        :return: Finger of this node pointing to node.
+        """
+        ip, port, _ = split_connection_string(node[1])
+        finger = Finger(ip=ip, identifier=node[0], port=port, finger_number=finger_number,
+                        my_chord_server_node_id=self.get_node_id(), ring=self._ring)
+        # ip:port and the path of a virtual node
+        finger.set_connection_string(node[1])
+        finger.set_node(node[0])
+        return finger
+
+    def _get_client(self, node, timeout=None):
+        """
+        Helper function. Gives a client for the passed node. Calls to this node itself are served
+        in process instead of going through this node's own server.
+        :param node: Node to create client for.
+        :param timeout: Seconds after which remote calls fail, None for peer_call_timeout.
+        :return: This node or an XML RPC client of the node.
+        """
+        if node[1] == self.get_connection_string():
+            return self
+        return self.get_xml_client(node, timeout)
+
+    @staticmethod
+    def get_connection_pool_stats():
+        """
+        :return: Hit, miss, reconnect and eviction counters of the connection pool.
+        """
+        return ConnectionPoolManager.get_connection_pool().get_stats()
+
+    def get_location_cache_stats(self):
+        """
+        :return: Hit, miss, expiry, eviction, invalidation and wrong owner counters of the location cache.
+        """
+        return self.location_cache.get_stats()
+
+    def get_lookup_stats(self):
+        """
+        :return: Hop count and per hop latency histograms of the lookups traced by this node, and the hops,
+                 mean latency and retries per peer. Empty unless lookup_tracing is set.
+        """
+        return self.tracer.get_stats()
+
+    def get_lookup_traces(self, count=10):
+        """
+        :param count: Number of traces.
+        :return: Last traced lookups of this node, most recent first.
+        """
+        return self.tracer.get_traces(count)
 
     def _init_finger_table(self, bootstrap_server):
 
@@ -494,15 +893,10 @@ class Node(object):
 
         successor = self.get_successor()
 
-        self.set_predecessor(self.get_xml_client(successor).get_predecessor())
+        self.set_predecessor(self._get_client(successor).get_predecessor())
 
         logger.info("Initializing the first finger to successor node {}.".format(str(self.get_successor())))
-        finger = Finger(ip=successor[1].split(":")[0], identifier=successor[0],
-                        port=successor[1].split(":")[1], finger_number=1, my_chord_server_node_id=self.get_node_id())
-        finger.set_xml_client(xmlrpc.client.ServerProxy('http://' + successor[1] + '/RPC2'))
-        finger.set_node(successor[0])
-        self._finger_table.update_finger_at_ith_position(i=0, finger=finger)
-        self._finger_table.get_finger_ith(0)._node = successor[0]
+        self._finger_table.update_finger_at_ith_position(i=0, finger=self._new_finger(successor, 1))
 
         self.set_successor(successor)
 
@@ -520,11 +914,9 @@ class Node(object):
                 self._finger_table.update_finger_at_ith_position(i+1, new_finger)
             else:
                 entry = bootstrap_server.find_successor(self.i_start(self.get_node_id(), i+2))
-                finger = Finger(ip=entry[1].split(":")[0], identifier=entry[0],
-                                finger_number=i+2, port=entry[1].split(":")[1],
-                                my_chord_server_node_id=self.get_node_id())
-                finger.set_node(entry[0])
-                self._finger_table.update_finger_at_ith_position(i+1, finger)
+                if self._proximity_routing:
+                    entry = self._select_finger_node(i+2, entry)
+                self._finger_table.update_finger_at_ith_position(i+1, self._new_finger(entry, i+2))
 
     def _update_others(self):
 
@@ -538,7 +930,7 @@ class Node(object):
         for i in range(self._config.get_m_bits()):
 
             p = self.find_predecessor(self.go_back_n(self.get_node_id(), 2**(i)))
-            client = xmlrpc.client.ServerProxy('http://' + p[1] + '/RPC2')
+            client = self._get_client(p)
             client.update_finger_table((self.get_node_id(), self.get_connection_string()), i)
 
         logger.info("Finished updating others.")
@@ -556,21 +948,15 @@ class Node(object):
         """
 
         if for_leave:
-            finger = Finger(ip=s[1].split(":")[0], identifier=s[0], port=s[1].split(":")[1], finger_number=i + 1,
-                            my_chord_server_node_id=self.get_node_id())
-            finger.set_node(s[0])
-            finger.set_xml_client(xmlrpc.client.ServerProxy('http://' + s[1] + '/RPC2'))
-            self._finger_table.update_finger_at_ith_position(i, finger)
+            self._finger_table.update_finger_at_ith_position(i, self._new_finger(s, i + 1))
+            self.location_cache.invalidate()
 
             return
 
         if s[0] != self.get_node_id() and self.in_bracket(s[0], [self.get_node_id(), self._finger_table.get_finger_ith(i).node], type='l'):
 
-            finger = Finger(ip=s[1].split(":")[0], identifier=s[0], port=s[1].split(":")[1], finger_number=i+1,
-                            my_chord_server_node_id=self.get_node_id())
-            finger.set_node(s[0])
-            finger.set_xml_client(xmlrpc.client.ServerProxy('http://' + s[1] + '/RPC2'))
-            self._finger_table.update_finger_at_ith_position(i, finger)
+            self._finger_table.update_finger_at_ith_position(i, self._new_finger(s, i + 1))
+            self.location_cache.invalidate()
 
             p = self.get_predecessor()
 
@@ -580,11 +966,11 @@ class Node(object):
                         p_client = self
                         # here don't call update_finger_table as it will go to infinite recursion.
                     else:
-                        p_client = xmlrpc.client.ServerProxy('http://' + p[1] + '/RPC2')
+                        p_client = self._get_client(p)
                         p_client.update_finger_table(s, i)
                     break
                 except Exception as e:
-                    print(e)
+                    logger.warning("Updating finger {} of predecessor {} failed, retrying: {}".format(i, p, e))
                     continue
 
             return None
@@ -598,9 +984,7 @@ class Node(object):
         :param identifier: id whose successor to be found.
         :return: Successor
         """
-        predecessor = self.find_predecessor(identifier)
-        predecessor_client = xmlrpc.client.ServerProxy('http://' + predecessor[1] + '/RPC2')
-        return predecessor_client.get_successor()
+        return tuple(self._lookup(identifier)[1])
 
     def find_predecessor(self, identifier):
 
@@ -610,24 +994,641 @@ class Node(object):
         :return: Predecessor
         """
 
-        node = xmlrpc.client.ServerProxy('http://' + self.get_connection_string() + '/RPC2')
+        return tuple(self._lookup(identifier)[0])
 
-        if node.get_node_id() == node.get_successor()[0]:
-            return node.get_node_id(), node.get_connection_string()
+    def _lookup(self, identifier):
 
-        while not self.in_bracket(identifier, [node.get_node_id(), node.get_successor()[0]], type='r'):
+        """
+        Lookup driven by this node, traced when lookup_tracing is set.
+        :param identifier: Id to be looked up.
+        :return: (predecessor, successor) of the identifier.
+        """
+
+        trace = self.tracer.start(identifier)
+        if self._lookup_parallelism > 1:
+            result = self._parallel_lookup(identifier, trace)
+        else:
+            result = self._iterative_lookup(identifier, trace)
+        if trace:
+            self.tracer.finish(trace)
+        return result
 
-            node = node.closest_preceding_finger(identifier)
-            connection_string = node[1]
+    def _iterative_lookup(self, identifier, trace=None):
 
+        """
+        Iterative lookup driven by this node. Every hop is a single lookup_step call, which gives
+        the hop's node, its successor and its closest preceding finger in one round trip.
+        :param identifier: Id to be looked up.
+        :param trace: LookupTrace the remote hops are recorded in, None if not traced.
+        :return: (predecessor, successor) of the identifier.
+        """
+
+        next_hop = (self.get_node_id(), self.get_connection_string())
+        candidate_count = self._proximity_candidates if self._proximity_routing else 0
+        arguments = (identifier, candidate_count, trace.trace_id) if trace else (identifier, candidate_count)
+        successor = None
+
+        for _ in range(LOOKUP_MAX_HOPS):
+            retries = 0
+            failures = 0
             while True:
+                hop = next_hop
                 try:
-                    node = xmlrpc.client.ServerProxy('http://' + connection_string + '/RPC2')
-                    connection_string = node.get_connection_string()
+                    started = time.perf_counter()
+                    step = self._get_client(hop).lookup_step(*arguments)
+                    if trace and hop[1] != self.get_connection_string():
+                        trace.add_hop(hop, time.perf_counter() - started, failures)
+                    node, successor, next_hop = step[:3]
+                    if candidate_count and step[3]:
+                        next_hop = self._select_next_hop(identifier, [tuple(candidate) for candidate in step[3]])
                     break
                 except Exception as e:
+                    failures += 1
+                    self.location_cache.invalidate_node(next_hop)
+                    if successor and successor[1] != next_hop[1]:
+                        # dead finger, the previous hop's successor also makes progress
+                        logger.info("Lookup hop to {} failed, continuing with {}. {}".format(next_hop, successor, e))
+                        next_hop = successor
+                        continue
+                    retries += 1
+                    if retries > LOOKUP_HOP_RETRIES:
+                        raise
+                    logger.info("Lookup hop to {} failed, retrying. {}".format(next_hop, e))
+
+            if self.in_bracket(identifier, [node[0], successor[0]], type='r'):
+                return node, successor
+
+            if next_hop[0] == node[0]:
+                next_hop = self._no_progress_hop(identifier, node, successor)
+        raise Exception("Lookup of {} gave up after {} hops.".format(identifier, LOOKUP_MAX_HOPS))
+
+    def _no_progress_hop(self, identifier, node, successor):
+
+        """
+        Next hop when node has no finger preceding identifier although identifier isn't in (node, successor]:
+        its finger table lags behind its successor. The successor is the next node closer to identifier.
+        :return: Successor of node.
+        """
+
+        logger.info("Lookup of {} made no progress at {}, continuing with its successor.".format(identifier, node))
+        return successor
+
+    def _parallel_lookup(self, identifier, trace=None):
+
+        """
+        Iterative lookup with hedged hops. Every hop is sent to the best candidate next hop, when it hasn't
+        answered after lookup_hedge_delay (or failed) the next best candidate is queried as well, up to
+        lookup_parallelism queries in flight. The first answer wins, so a slow or half dead node on the
+        path costs a hedge delay instead of its timeouts.
+        :param identifier: Id to be looked up.
+        :param trace: LookupTrace the remote hops are recorded in, None if not traced.
+        :return: (predecessor, successor) of the identifier.
+        """
+
+        parallelism = self._lookup_parallelism
+        proximity = self._proximity_routing
+        candidate_count = max(parallelism, self._proximity_candidates if proximity else 0)
+        candidates = [(self.get_node_id(), self.get_connection_string())]
+
+        for _ in range(LOOKUP_MAX_HOPS):
+            step = self._hedged_lookup_step(identifier, candidates, candidate_count, trace)
+            node, successor, next_hop = [tuple(entry) for entry in step[:3]]
+
+            if self.in_bracket(identifier, [node[0], successor[0]], type='r'):
+                return node, successor
+
+            alternatives = [tuple(candidate) for candidate in step[3]]
+            if proximity and alternatives:
+                next_hop = self._select_next_hop(identifier, alternatives)
+
+            if next_hop[0] == node[0]:
+                next_hop = self._no_progress_hop(identifier, node, successor)
+
+            candidates = [next_hop]
+            for candidate in alternatives + [successor]:
+                if candidate not in candidates and candidate[0] != node[0]:
+                    candidates.append(candidate)
+        raise Exception("Lookup of {} gave up after {} hops.".format(identifier, LOOKUP_MAX_HOPS))
+
+    def _hedged_lookup_step(self, identifier, candidates, candidate_count, trace=None):
+
+        """
+        One hop of a hedged lookup.
+        :param identifier: Id being looked up.
+        :param candidates: Candidate next hops, best first.
+        :param candidate_count: Passed on to lookup_step.
+        :param trace: LookupTrace the hop is recorded in, None if not traced.
+        :return: lookup_step answer of the first candidate answering.
+        """
+
+        if candidates[0][1] == self.get_connection_string():
+            return self.lookup_step(identifier, candidate_count)
+
+        arguments = (identifier, candidate_count, trace.trace_id) if trace else (identifier, candidate_count)
+        started = time.perf_counter()
+        failures = 0
+
+        parallelism = self._lookup_parallelism
+        hedge_delay = self._lookup_hedge_delay
+        hop_timeout = self._lookup_hop_timeout
+
+        if not self._hedging_executor:
+            with self._hedging_lock:
+                if not self._hedging_executor:
+                    self._hedging_executor = concurrent.futures.ThreadPoolExecutor(max_workers=HEDGING_WORKERS)
+
+        remaining = list(candidates)
+        pending = {}
+        error = None
+        while True:
+            if remaining and len(pending) < parallelism:
+                candidate = remaining.pop(0)
+                future = self._hedging_executor.submit(self._get_client(candidate, hop_timeout).lookup_step,
+                                                       *arguments)
+                pending[future] = candidate
+                with self._hedging_lock:
+                    self._hedging_stats["requests"] += 1
+                    if len(pending) > 1 or candidate != candidates[0]:
+                        self._hedging_stats["hedges"] += 1
+
+            if not pending:
+                raise error
+
+            # wait for the hedge delay only when another query can still be sent
+            timeout = hedge_delay if remaining and len(pending) < parallelism else None
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                candidate = pending.pop(future)
+                try:
+                    step = future.result()
+                except Exception as e:
+                    logger.info("Lookup hop to {} failed. {}".format(candidate, e))
+                    self.location_cache.invalidate_node(candidate)
+                    with self._hedging_lock:
+                        self._hedging_stats["failed_requests"] += 1
+                    failures += 1
+                    error = e
                     continue
-        return node.get_node_id(), node.get_connection_string()
+                if trace:
+                    trace.add_hop(candidate, time.perf_counter() - started, failures)
+                with self._hedging_lock:
+                    self._hedging_stats["hops"] += 1
+                    if candidate != candidates[0]:
+                        self._hedging_stats["hedge_wins"] += 1
+                # queries still waiting for a worker are dropped, the answers of those in flight are ignored
+                for loser in pending:
+                    loser.cancel()
+                return step
+
+    def get_hedging_stats(self):
+
+        """
+        :return: Hedged lookup statistics. hops: remote hops answered, requests: lookup_step queries sent, hedges:
+                 queries sent to other candidates than the best one, hedge_wins: hops answered first by another
+                 candidate than the best one, failed_requests: queries failed or timed out.
+        """
+
+        with self._hedging_lock:
+            stats = {name: self._hedging_stats[name]
+                     for name in ("hops", "requests", "hedges", "hedge_wins", "failed_requests")}
+        stats["hedge_win_ratio"] = stats["hedge_wins"] / stats["hops"] if stats["hops"] else 0.0
+        return stats
+
+    def lookup_step(self, identifier, candidate_count=0, trace_id=None):
+
+        """
+        One hop of an iterative lookup, answered in a single round trip.
+        :param identifier: Id being looked up.
+        :param candidate_count: If set, this many nodes preceding identifier (fingers and successors) are added
+                                to the answer so the lookup can pick the next hop by proximity or query
+                                several of them in parallel.
+        :param trace_id: Trace id of a traced lookup.
+        :return: [this node, this node's successor, closest preceding finger of identifier(, candidates)]
+        """
+
+        if trace_id:
+            logger.debug("Lookup step for {} of trace {}.".format(identifier, trace_id))
+
+        step = [(self.get_node_id(), self.get_connection_string()), self.get_successor(),
+                self.closest_preceding_finger(identifier)]
+        if candidate_count:
+            step.append(self._preceding_nodes(identifier, candidate_count))
+        return step
+
+    def _successor_list_owner(self, identifier):
+
+        """
+        Finds the owner of identifier among the successor list entries. Entries past the successor are
+        only refreshed by stabilization, so the answer is a hint the owner has to confirm.
+        :param identifier: Id being looked up.
+        :return: (predecessor, owner) of identifier when it is in (this node, last successor], otherwise None.
+        """
+
+        ring_size = self._ring.size
+        previous = (self.get_node_id(), self.get_connection_string())
+        previous_offset = 0
+        for entry in self.successor_list:
+            if not entry:
+                break
+            offset = (entry[0] - self.get_node_id()) % ring_size or ring_size
+            if offset <= previous_offset:
+                # duplicate or out of order entry, the rest of the list can't be trusted
+                break
+            entry = tuple(entry)
+            if self.in_bracket(identifier, [previous[0], entry[0]], 'r'):
+                return previous, entry
+            previous, previous_offset = entry, offset
+        return None
+
+    def _select_next_hop(self, identifier, candidates):
+
+        """
+        Proximity route selection. Every candidate makes progress towards identifier, the one with the lowest
+        estimated latency to the end of the lookup is picked: its smoothed RTT plus the expected remaining
+        hops (half the log of the nodes left between it and identifier) at the average RTT.
+        :param identifier: Id being looked up.
+        :param candidates: Fingers preceding identifier, closest to identifier first.
+        :return: Selected candidate.
+        """
+
+        pool = ConnectionPoolManager.get_connection_pool()
+        rtts = [pool.get_rtt(candidate[1]) for candidate in candidates]
+        known = [rtt for rtt in rtts if rtt is not None]
+        if len(candidates) == 1 or not known:
+            return candidates[0]
+
+        average_rtt = sum(known) / len(known)
+        ring_size = self._ring.size
+        # average distance between nodes, estimated from the span of the successor list
+        node_gap = max((self.successor_list[-1][0] - self.get_node_id()) % ring_size, 1) / len(self.successor_list)
+        costs = []
+        for candidate, rtt in zip(candidates, rtts):
+            remaining_nodes = ((identifier - candidate[0]) % ring_size) / node_gap
+            costs.append((average_rtt if rtt is None else rtt) +
+                         average_rtt * 0.5 * math.log2(1 + remaining_nodes))
+
+        selected = costs.index(min(costs))
+        with self._proximity_lock:
+            self._proximity_stats["selections"] += 1
+            if selected:
+                self._proximity_stats["rerouted"] += 1
+                self._proximity_stats["estimated_latency_saved"] += costs[0] - costs[selected]
+        return candidates[selected]
+
+    def _select_finger_node(self, finger_number, successor):
+
+        """
+        Proximity neighbour selection. Any node in [start of finger, start of next finger) is a valid node
+        for the finger. The successor of the finger start and its successors in that interval are the
+        candidates, the one with the lowest RTT is picked. Candidates never called before are probed.
+        :param finger_number: Finger number, 1 to m.
+        :param successor: Successor of the finger start.
+        :return: Node for the finger.
+        """
+
+        start = self.i_start(self.get_node_id(), finger_number)
+        end = self.i_start(self.get_node_id(), finger_number + 1) \
+            if finger_number < self._ring.m_bits else self.get_node_id()
+        candidates = [tuple(successor)]
+        pool = ConnectionPoolManager.get_connection_pool()
+
+        try:
+            for node in self._get_client(successor).get_successor_list():
+                node = tuple(node)
+                if node not in candidates and node[0] != self.get_node_id() and \
+                        self.in_bracket(node[0], [start, end], 'l'):
+                    candidates.append(node)
+            for candidate in candidates:
+                if pool.get_rtt(candidate[1]) is None:
+                    self._get_client(candidate).get_node_id()
+        except Exception as e:
+            logger.info("Proximity selection for finger {} failed. {}".format(finger_number, e))
+
+        rtts = [pool.get_rtt(candidate[1]) for candidate in candidates]
+        selected = min(range(len(candidates)), key=lambda i: float("inf") if rtts[i] is None else rtts[i])
+        return candidates[selected]
+
+    def get_proximity_stats(self):
+
+        """
+        :return: Proximity routing statistics. selections: next hops picked among several candidates,
+                 rerouted: selections of another candidate than the closest finger, estimated_latency_saved_ms:
+                 estimated latency saved by these selections, peer_rtt_ms: smoothed RTT of the peers.
+        """
+
+        with self._proximity_lock:
+            stats = {"selections": self._proximity_stats["selections"],
+                     "rerouted": self._proximity_stats["rerouted"],
+                     "estimated_latency_saved_ms": self._proximity_stats["estimated_latency_saved"] * 1000}
+        stats["peer_rtt_ms"] = {peer: rtt * 1000
+                                for peer, rtt in ConnectionPoolManager.get_connection_pool().get_rtts().items()}
+        return stats
+
+    def _route(self, key, operation, lookup_mode=None, value=None, ttl=None):
+
+        """
+        Performs the store operation on the node responsible for the key. Keys of this node are served locally.
+        An owner found in the location cache or in the successor list is asked to verify its ownership, when it
+        refuses or can't be reached a fresh lookup is done.
+        :param key: Hashed key.
+        :param operation: One of RECURSIVE_OPERATIONS.
+        :param lookup_mode: ChordConstants.LOOKUP_MODE_*, defaults to the configured lookup mode.
+        :param value: Value sent with set_key, None for the operations without value.
+        :param ttl: Seconds after which the key set by set_key expires, None if it doesn't.
+        :return: Result of the operation on the responsible node.
+        """
+
+        if self._owns(key):
+            # keys of this node are served in process without looking them up
+            return self._perform((self.get_node_id(), self.get_connection_string()), operation, key, False,
+                                 value, ttl)
+
+        owner = self.location_cache.get(key)
+        if not owner:
+            successor_list_owner = self._successor_list_owner(key)
+            owner = successor_list_owner[1] if successor_list_owner else None
+        if owner:
+            try:
+                return self._perform(owner, operation, key, True, value, ttl)
+            except xmlrpc.client.Fault as fault:
+                if fault.faultCode != MessagingConstants.WRONG_OWNER_FAULT_CODE:
+                    raise
+                self.location_cache.report_wrong_owner(owner)
+            except Exception as e:
+                logger.info("Cached owner {} of key {} failed, looking it up again. {}".format(owner, key, e))
+                self.location_cache.invalidate_node(owner)
+
+        if (lookup_mode or self._lookup_mode) == ChordConstants.LOOKUP_MODE_RECURSIVE:
+            if value is None and ttl is None:
+                answered, result = self._recursive_route(key, operation)
+                if answered:
+                    return result
+            else:
+                # the value isn't carried along the hops, only the owner is looked up and the value sent to it
+                answered, owner = self._recursive_route(key, "locate_key")
+                if answered:
+                    try:
+                        return self._perform(owner, operation, key, True, value, ttl)
+                    except xmlrpc.client.Fault as fault:
+                        if fault.faultCode != MessagingConstants.WRONG_OWNER_FAULT_CODE:
+                            raise
+            if not answered:
+                logger.info("Recursive lookup of key {} timed out, falling back to iterative lookup.".format(key))
+
+        predecessor, successor = self._lookup(key)
+        self.location_cache.put(predecessor[0], successor)
+        return self._perform(successor, operation, key, False, value, ttl)
+
+    def _perform(self, node, operation, key, verify_owner, value=None, ttl=None):
+
+        """
+        Calls a store operation on a node. Values up to value_chunk_size are sent with the call, larger ones
+        are uploaded in chunks first and committed by the call.
+        :param node: (node id, connection string) of the node.
+        :param operation: Name of the operation.
+        :param key: Hashed key.
+        :param verify_owner: Ask the node to refuse the operation if it isn't responsible for the key.
+        :param value: Value sent with the operation, None if the operation has no value.
+        :param ttl: ttl sent with the operation, None if the key doesn't expire.
+        :return: Result of the operation.
+        """
+
+        client = self._get_client(node)
+        if value is None and ttl is None:
+            return getattr(client, operation)(key, verify_owner)
+        transfer_id = None
+        if value is not None and client is not self and len(value) > self._value_chunk_size:
+            value, transfer_id = None, self._upload_value(client, value)
+        if ttl is None:
+            return getattr(client, operation)(key, verify_owner, value, transfer_id)
+        return getattr(client, operation)(key, verify_owner, value, transfer_id, ttl)
+
+    def _payload(self, view):
+        """
+        :param view: memoryview over (a part of) a value.
+        :return: The view itself for the binary engines which send it without copying, bytes for xmlrpc which
+                 can't marshal memoryviews.
+        """
+        if self._rpc_engine == MessagingConstants.RPC_ENGINE_XMLRPC:
+            return view.tobytes()
+        return view
+
+    def _upload_value(self, client, value):
+        """
+        Sends a value to a node chunk by chunk, each chunk a slice of the value not copied before sending.
+        :param client: Client of the receiving node.
+        :param value: bytes like value.
+        :return: Transfer id to commit the value with on the receiving node.
+        """
+        transfer_id = "{}:{}".format(self.get_node_id(), uuid.uuid4().hex)
+        view = memoryview(value)
+        chunk_size = self._value_chunk_size
+        for offset in range(0, len(view), chunk_size):
+            client.put_value_chunk(transfer_id, offset, self._payload(view[offset:offset + chunk_size]), len(view))
+        return transfer_id
+
+    def _send_values(self, node, items):
+        """
+        Sends values to a node, small values batched in receive_values calls of about value_chunk_size bytes,
+        large values uploaded in chunks.
+        :param node: (node id, connection string) of the receiving node.
+        :param items: (key, value) pairs.
+        :return: None
+        """
+        if not items:
+            return
+        client = self._get_client(node)
+        chunk_size = self._value_chunk_size
+        batch, batch_bytes = [], 0
+        for key, value in items:
+            if client is not self and len(value) > chunk_size:
+                batch.append([key, None, self._upload_value(client, value)])
+            else:
+                batch.append([key, self._payload(memoryview(value)), None])
+                batch_bytes += len(value)
+            if batch_bytes >= chunk_size:
+                client.receive_values(batch)
+                batch, batch_bytes = [], 0
+        if batch:
+            client.receive_values(batch)
+
+    def _check_value_size(self, size):
+        """
+        Raises the value too large fault when size is over max_value_size.
+        :param size: Size of a value in bytes.
+        :return: None
+        """
+        if self._max_value_size and size > self._max_value_size:
+            raise xmlrpc.client.Fault(MessagingConstants.VALUE_TOO_LARGE_FAULT_CODE,
+                                      "{}: {} bytes, at most {}".format(MessagingConstants.VALUE_TOO_LARGE_FAULT_STRING,
+                                                                        size, self._max_value_size))
+
+    def _verify_owner(self, key):
+        """
+        Raises the wrong owner fault when this node isn't responsible for the key (anymore).
+        :param key: Hashed key.
+        :return: None
+        """
+        if not self._owns(key):
+            raise xmlrpc.client.Fault(MessagingConstants.WRONG_OWNER_FAULT_CODE,
+                                      MessagingConstants.WRONG_OWNER_FAULT_STRING)
+
+    def _owns(self, key):
+        """
+        :param key: Hashed key.
+        :return: True if this node is responsible for the key.
+        """
+        predecessor = self.get_predecessor()
+        return bool(predecessor) and self.in_bracket(key, [predecessor[0], self.get_node_id()], 'r')
+
+    def _not_owned(self, keys):
+        """
+        Batched _owns, the keys are classified against this node's range in one pass.
+        :param keys: Hashed keys.
+        :return: Set of the keys this node isn't responsible for.
+        """
+        predecessor = self.get_predecessor()
+        if not predecessor:
+            return set(keys)
+        keys = ring_intervals.to_identifier_array(keys)
+        return set(keys[~ring_intervals.in_interval(keys, predecessor[0], self.get_node_id(), 'r')].tolist())
+
+    def _recursive_route(self, key, operation):
+
+        """
+        Recursive lookup. The request is forwarded from node to node towards the key and the responsible
+        node performs the operation and replies directly to this node with deliver_lookup_result.
+        :param key: Hashed key.
+        :param operation: One of RECURSIVE_OPERATIONS.
+        :return: (answered, result). answered is False when no reply arrived before the lookup timeout.
+        """
+
+        trace = self.tracer.start(key)
+        request_id = trace.trace_id if trace else "{}:{}".format(self.get_node_id(), next(self._recursive_lookup_ids))
+        reply = [threading.Event(), None, None]
+        with self._recursive_lookups_lock:
+            self._recursive_lookups[request_id] = reply
+
+        try:
+            timeout = self._lookup_timeout
+            self._forward_lookup(request_id, key, operation, (self.get_node_id(), self.get_connection_string()),
+                                 timeout, False, [] if trace else None)
+            if reply[0].wait(timeout):
+                if trace:
+                    for node_id, connection_string, latency, retries in reply[2] or []:
+                        trace.add_hop((node_id, connection_string), latency, retries)
+                    self.tracer.finish(trace)
+                return True, reply[1]
+            return False, None
+        finally:
+            with self._recursive_lookups_lock:
+                self._recursive_lookups.pop(request_id, None)
+
+    def forward_lookup(self, request_id, identifier, operation, origin, budget, owner=False, trace=None):
+
+        """
+        One hop of a recursive lookup. Returns right away, the request is processed on the forwarding
+        threads so the caller isn't held for the rest of the lookup.
+        :param request_id: Id of the lookup given by the origin.
+        :param identifier: Key being looked up.
+        :param operation: One of RECURSIVE_OPERATIONS, performed by the responsible node.
+        :param origin: Node which started the lookup and receives the result.
+        :param budget: Seconds left before the origin gives up on the lookup.
+        :param owner: True when the previous hop found this node responsible for the key.
+        :param trace: Hops of a traced lookup so far, [node_id, connection_string, latency, retries] each.
+                      None if not traced.
+        :return: True
+        """
+
+        if operation not in RECURSIVE_OPERATIONS:
+            raise Exception('operation "{}" is not supported'.format(operation))
+
+        if not self._forwarding_executor:
+            with self._recursive_lookups_lock:
+                if not self._forwarding_executor:
+                    self._forwarding_executor = concurrent.futures.ThreadPoolExecutor(max_workers=FORWARDING_WORKERS)
+
+        self._forwarding_executor.submit(self._forward_lookup, request_id, identifier, operation, origin, budget,
+                                         owner, trace)
+        return True
+
+    def _forward_lookup(self, request_id, identifier, operation, origin, budget, owner=False, trace=None):
+
+        """
+        Performs the operation if this node is responsible for the identifier, otherwise forwards the
+        request to the closest preceding finger (or the successor when it is responsible). Each hop gets
+        min(lookup_hop_timeout, remaining budget) to accept the request. When no hop accepts it the
+        request is dropped and the origin falls back to an iterative lookup.
+        """
+
+        deadline = time.monotonic() + budget
+        hop_timeout = self._lookup_hop_timeout
+
+        try:
+            predecessor = self.get_predecessor()
+            if owner or (predecessor and self.in_bracket(identifier, [predecessor[0], self.get_node_id()], 'r')):
+                result = getattr(self, operation)(identifier)
+                self._get_client(origin, hop_timeout).deliver_lookup_result(request_id, result, trace)
+                return
+
+            successor = self.get_successor()
+            owner = self._successor_list_owner(identifier)
+            if self.in_bracket(identifier, [self.get_node_id(), successor[0]], 'r'):
+                candidates = [(successor, True)]
+            elif owner:
+                # not flagged as owner, the node confirms its ownership against its predecessor
+                candidates = [(owner[1], False), (successor, False)]
+            else:
+                next_hop = tuple(self.closest_preceding_finger(identifier))
+                if self._proximity_routing:
+                    nodes = self._preceding_nodes(identifier, self._proximity_candidates)
+                    if nodes:
+                        next_hop = self._select_next_hop(identifier, nodes)
+                candidates = [(successor, False)]
+                if next_hop[0] != self.get_node_id() and next_hop[0] != successor[0]:
+                    candidates.insert(0, (next_hop, False))
+
+            failures = 0
+            for next_hop, next_hop_is_owner in candidates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    next_trace = trace
+                    if trace is not None and next_hop[1] != self.get_connection_string():
+                        # the request travels with its trace, so the latency of the hop is this node's
+                        # smoothed RTT to the next hop instead of the latency of this very call
+                        rtt = ConnectionPoolManager.get_connection_pool().get_rtt(next_hop[1])
+                        next_trace = trace + [[next_hop[0], next_hop[1], rtt or 0.0, failures]]
+                    self._get_client(next_hop, min(hop_timeout, remaining)).forward_lookup(
+                        request_id, identifier, operation, origin, remaining, next_hop_is_owner, next_trace)
+                    return
+                except Exception as e:
+                    failures += 1
+                    logger.info("Forwarding lookup {} to {} failed. {}".format(request_id, next_hop, e))
+
+            logger.info("Dropping lookup {}, no hop accepted it in time.".format(request_id))
+        except Exception:
+            logger.exception("Recursive lookup {} failed at {}.".format(request_id, self.get_node_id()))
+
+    def deliver_lookup_result(self, request_id, result, trace=None):
+
+        """
+        Receives the result of a recursive lookup started by this node from the responsible node.
+        Results arriving after the lookup timed out are ignored.
+        :param request_id: Id of the lookup.
+        :param result: Result of the operation on the responsible node.
+        :param trace: Hops of a traced lookup, as sent along with forward_lookup.
+        :return: True
+        """
+
+        with self._recursive_lookups_lock:
+            reply = self._recursive_lookups.get(request_id)
+        if reply:
+            reply[1] = result
+            reply[2] = trace
+            reply[0].set()
+        return True
 
     def closest_preceding_finger(self, identifier):
 
@@ -638,14 +1639,32 @@ class Node(object):
         :return: Closest finger.
         """
 
-        m = self._config.get_m_bits()
-        for i in range(m-1, -1, -1):
-            if self.in_bracket(self._finger_table.get_finger_ith(i).node, [self.get_node_id(), identifier],
-                               "o"):
-                return self._finger_table.get_finger_ith(i).node, \
-                       self._finger_table.get_finger_ith(i).get_connection_string()
+        nodes = self._preceding_nodes(identifier, 1)
+        if nodes:
+            return nodes[0]
         return self.get_node_id(), self.get_connection_string()
 
+    def _preceding_nodes(self, identifier, count):
+
+        """
+        Candidate next hops towards identifier. Successor list entries are candidates as well as the fingers,
+        they stand in for dead or not yet fixed fingers.
+        :param identifier: ID
+        :param count: Maximum number of nodes returned.
+        :return: Distinct nodes preceding identifier, closest to identifier first.
+        """
+
+        ring_size = self._ring.size
+        target = (identifier - self.get_node_id()) % ring_size or ring_size
+        nodes = {}
+        for node in self._finger_table.preceding_fingers(identifier, count):
+            nodes[(node[0] - self.get_node_id()) % ring_size] = node
+        for entry in self.successor_list:
+            offset = (entry[0] - self.get_node_id()) % ring_size
+            if 0 < offset < target:
+                nodes[offset] = tuple(entry)
+        return [nodes[offset] for offset in sorted(nodes, reverse=True)[:count]]
+
     def leave(self):
 
         """
@@ -660,12 +1679,12 @@ class Node(object):
         logger.info("Starting to leave the system.")
         logger.info("Setting predecessor's [{}] successor to this node's successor [{}].".
                     format(self.get_predecessor(), self.get_successor()))
-        self.get_xml_client(self.get_predecessor()).set_successor(self.get_successor())
+        self._get_client(self.get_predecessor()).set_successor(self.get_successor())
         logger.info("Setting successor's [{}] predecessor to this node's predecessor [{}].".
                     format(self.get_successor(), self.get_predecessor()))
-        self.get_xml_client(self.get_successor()).set_predecessor(self.get_predecessor())
+        self._get_client(self.get_successor()).set_predecessor(self.get_predecessor())
         logger.info("Updating 1st finger (successor) to this node's successor.")
-        self.get_xml_client(self.get_predecessor()).update_finger_table(self.get_successor(), 0, True)
+        self._get_client(self.get_predecessor()).update_finger_table(self.get_successor(), 0, True)
         logger.info("Transferring keys to responsible node.")
         self.transfer_before_leave()
         logger.info("Node {} left the system successfully.".format(self.get_node_id()))
@@ -710,99 +1729,575 @@ class Node(object):
             print(return_type)
         return return_type
 
-    def __getattribute__(self, name):
-        """
-        Author: Adarsh Trivedi
-        Helper function to print order of function calls. Used for debugging.
-        :param name: Function name.
-        :return: bool
-        """
-        returned = object.__getattribute__(self, name)
-        if inspect.isfunction(returned) or inspect.ismethod(returned):
-            if function_debug:
+    if function_debug:
+        # only defined when debugging, every attribute access of the node goes through it
+        def __getattribute__(self, name):
+            """
+            Author: Adarsh Trivedi
+            Helper function to print order of function calls. Used for debugging.
+            :param name: Function name.
+            :return: bool
+            """
+            returned = object.__getattribute__(self, name)
+            if inspect.isfunction(returned) or inspect.ismethod(returned):
                 print('called ', returned.__name__)
-        return returned
+            return returned
 
-    def set(self, key, hash_it=True):
+    def set(self, key, hash_it=True, lookup_mode=None, value=None, ttl=None):
         """
         Author: Adarsh Trivedi
-        Store the key on responsible node. Performs routing to responsible node. Doesn't perform set on itself.
+        Store the key on responsible node. Performs routing to responsible node. Key owned by this node is set
+        directly in this node's store.
         :param key: Key to be stored.
         :param hash_it: If set false, expects key to be an integer value which is not hashed before storing.
                         Expect code blast if hash_it = False and key not int. Should be handled with assertion
                         before setting.
+        :param lookup_mode: "iterative" or "recursive", defaults to the configured lookup_mode.
+        :param value: Value stored with the key, bytes (str is stored utf-8 encoded). None keeps the value
+                      the key may already have.
+        :param ttl: Seconds after which the key and its value expire, None if they don't expire.
         :return: Node on which key is stored.
         """
         if hash_it:
-            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._config.get_m_bits())
+            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._ring.m_bits)
         logger.info("Set request for key {} at {}.".format(key, self.get_node_id()))
-        return (self.get_xml_client(self.find_successor(key))).set_key(key)
+        if value is not None:
+            value = as_bytes(value)
+            self._check_value_size(len(value))
+        self._check_ttl(ttl)
+        return self._route(key, "set_key", lookup_mode, value, ttl)
 
-    def get(self, key, hash_it=True):
+    def get(self, key, hash_it=True, lookup_mode=None):
         """
         Author: Adarsh Trivedi
-        Get the key from the p2p network. Performs routing to responsible node. Doesn't perform get from its own store.
+        Get the key from the p2p network. Performs routing to responsible node. Key owned by this node is read
+        directly from this node's store.
         :param key: Key to be retrieved.
         :param hash_it: As in set function.
+        :param lookup_mode: As in set function.
         :return: Node on which the key is retrieved from.
         """
         if hash_it:
-            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._config.get_m_bits())
+            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._ring.m_bits)
         logger.info("Get request for key {} at {}.".format(key, self.get_node_id()))
-        return (self.get_xml_client(self.find_successor(key))).get_key(key)
+        return self._route(key, "get_key", lookup_mode)
 
-    def delete(self, key, hash_it=True):
+    def get_value(self, key, hash_it=True, lookup_mode=None):
+        """
+        Get the value of a key from the p2p network. The first chunk of the value comes back with the lookup,
+        the rest is read directly from the responsible node chunk by chunk.
+        :param key: Key to be retrieved.
+        :param hash_it: As in set function.
+        :param lookup_mode: As in set function.
+        :return: Value of the key, None if the key has no value.
+        """
+        if hash_it:
+            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._ring.m_bits)
+        logger.info("Get value request for key {} at {}.".format(key, self.get_node_id()))
+        result = self._route(key, "get_value_key", lookup_mode)
+        if not result:
+            return None
+        owner, size, chunk = result
+        chunk = as_bytes(chunk)
+        if len(chunk) >= size:
+            return chunk
+
+        value = bytearray(size)
+        value[:len(chunk)] = chunk
+        offset = len(chunk)
+        client = self._get_client(owner)
+        chunk_size = self._value_chunk_size
+        while offset < size:
+            result = client.get_value_key(key, False, offset, chunk_size)
+            if not result or result[1] != size:
+                # deleted or replaced while being read
+                return None
+            chunk = as_bytes(result[2])
+            value[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        return value
+
+    def delete(self, key, hash_it=True, lookup_mode=None):
         """
         Author: Adarsh Trivedi
-        Delete the key from the network. Performs routing to responsible node. Doesn't perform delete itself.
+        Delete the key from the network. Performs routing to responsible node. Key owned by this node is deleted
+        directly from this node's store.
         :param key: Key to be deleted.
         :param hash_it: As is set function.
+        :param lookup_mode: As in set function.
         :return: Node on which key was present and deleted.
         """
         if hash_it:
-            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._config.get_m_bits())
+            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._ring.m_bits)
         logger.info("Delete request for key {} at {}.".format(key, self.get_node_id()))
-        return (self.get_xml_client(self.find_successor(key))).delete_key(key)
+        return self._route(key, "delete_key", lookup_mode)
+
+    def multi_set(self, keys, hash_it=True, lookup_mode=None, values=None, ttl=None):
+        """
+        Store many keys at once. Keys are grouped by responsible node and every node receives its keys in
+        batches, the nodes in parallel.
+        :param keys: Keys to be stored.
+        :param hash_it: As in set function.
+        :param lookup_mode: As in set function.
+        :param values: Values of the keys in the same order, None (or None items) keeps the current values.
+        :param ttl: As in set function, for all the keys.
+        :return: For every key, node on which it is stored, None if it couldn't be stored.
+        """
+        keys = self._hash_keys(keys, hash_it)
+        logger.info("Multi set request for {} keys at {}.".format(len(keys), self.get_node_id()))
+        if values is None:
+            values = [None] * len(keys)
+        if len(values) != len(keys):
+            raise Exception("Got {} values for {} keys.".format(len(values), len(keys)))
+        values = [as_bytes(value) if value is not None else None for value in values]
+        for value in values:
+            if value is not None:
+                self._check_value_size(len(value))
+        self._check_ttl(ttl)
+        return self._multi_route(keys, "set_key", lookup_mode, dict(zip(keys, values)), ttl)
+
+    def multi_get(self, keys, hash_it=True, lookup_mode=None):
+        """
+        Get many keys at once, see multi_set.
+        :param keys: Keys to be retrieved.
+        :param hash_it: As in set function.
+        :param lookup_mode: As in set function.
+        :return: For every key, node on which it is retrieved from, None if it isn't stored.
+        """
+        keys = self._hash_keys(keys, hash_it)
+        logger.info("Multi get request for {} keys at {}.".format(len(keys), self.get_node_id()))
+        return self._multi_route(keys, "get_key", lookup_mode)
+
+    def multi_delete(self, keys, hash_it=True, lookup_mode=None):
+        """
+        Delete many keys at once, see multi_set.
+        :param keys: Keys to be deleted.
+        :param hash_it: As in set function.
+        :param lookup_mode: As in set function.
+        :return: For every key, node on which it was present and deleted, None if it wasn't stored.
+        """
+        keys = self._hash_keys(keys, hash_it)
+        logger.info("Multi delete request for {} keys at {}.".format(len(keys), self.get_node_id()))
+        return self._multi_route(keys, "delete_key", lookup_mode)
 
-    def set_key(self, key):
+    def _hash_keys(self, keys, hash_it):
+        """
+        :param keys: Keys of a multi key request.
+        :param hash_it: As in set function.
+        :return: Hashed keys.
+        """
+        if not hash_it:
+            return [int(key) for key in keys]
+        m_bits = self._ring.m_bits
+        return [consistent_hashing.Consistent_Hashing.get_modulo_hash(key, m_bits) for key in keys]
+
+    def _locate_owners(self, keys, lookup_mode=None):
+        """
+        Finds the responsible node of many keys. The keys are walked in ring order and every lookup tells the
+        range of ids the found node is responsible for, so the following keys in that range need no lookup
+        of their own.
+        :param keys: Distinct hashed keys.
+        :param lookup_mode: As in set function.
+        :return: Dictionary of owner -> its keys. Keys whose owner wasn't found are left out.
+        """
+        owners = collections.defaultdict(list)
+        lower, owner = None, None
+        for key in sorted(keys):
+            if owner and self.in_bracket(key, [lower, owner[0]], 'r'):
+                owners[owner].append(key)
+                continue
+            try:
+                found_lower, found = self._locate(key, lookup_mode)
+            except Exception as e:
+                # routed on its own by _multi_route, the other keys go on
+                logger.info("Owner of key {} not found, routing it one by one. {}".format(key, e))
+                continue
+            if found_lower is not None:
+                lower, owner = found_lower, found
+            owners[found].append(key)
+        return owners
+
+    def _locate(self, key, lookup_mode=None):
+        """
+        Finds the node responsible for a key from the location cache or the successor list, otherwise by a
+        lookup. Owners from the cache or the successor list are hints the owner has to confirm.
+        :param key: Hashed key.
+        :param lookup_mode: As in set function.
+        :return: (lower, owner), owner is responsible for the ids in (lower, owner id]. lower is None when only
+                 the owner is known.
+        """
+        owner = self.location_cache.get(key)
+        if owner:
+            return None, tuple(owner)
+        located = self._successor_list_owner(key)
+        if located:
+            return located[0][0], located[1]
+        if (lookup_mode or self._lookup_mode) == ChordConstants.LOOKUP_MODE_RECURSIVE:
+            answered, owner = self._recursive_route(key, "locate_key")
+            if answered:
+                # no node lies between the key and the node found responsible for it
+                return (key - 1) % self._ring.size, tuple(owner)
+        predecessor, successor = self._lookup(key)
+        self.location_cache.put(predecessor[0], successor)
+        return predecessor[0], tuple(successor)
+
+    def _multi_route(self, keys, operation, lookup_mode=None, values=None, ttl=None):
+        """
+        Performs a store operation on many keys, one batched call per owner and batch. Keys the owner turns
+        down, or whose owner fails or isn't found, are routed one by one as single key requests are.
+        :param keys: Hashed keys.
+        :param operation: "set_key", "get_key" or "delete_key".
+        :param lookup_mode: As in set function.
+        :param values: Dictionary of key -> value for set_key.
+        :param ttl: ttl of the keys for set_key.
+        :return: Result of the operation for every key.
+        """
+        if not self._batch_executor:
+            with self._batch_lock:
+                if not self._batch_executor:
+                    self._batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+
+        results = {}
+        futures = {self._batch_executor.submit(self._perform_batches, owner, operation, owner_keys, values, ttl): owner
+                   for owner, owner_keys in self._locate_owners(set(keys), lookup_mode).items()}
+        for future in concurrent.futures.as_completed(futures):
+            results.update(future.result())
+
+        for key in set(keys) - results.keys():
+            # turned down by the node believed responsible or not located, a fresh lookup finds the owner
+            try:
+                if operation == "set_key":
+                    results[key] = self._route(key, operation, lookup_mode, values.get(key), ttl)
+                else:
+                    results[key] = self._route(key, operation, lookup_mode)
+            except Exception:
+                logger.exception("Multi key request failed for key {}.".format(key))
+                results[key] = None
+        return [results[key] for key in keys]
+
+    def _perform_batches(self, owner, operation, keys, values=None, ttl=None):
+        """
+        Sends keys to their owner in batches of at most BATCH_MAX_KEYS keys, and about value_chunk_size bytes
+        of values sent with the batch. Values larger than value_chunk_size are uploaded in chunks beforehand.
+        :param owner: (node id, connection string) of the owner.
+        :param operation: As in _multi_route.
+        :param keys: Keys of the owner.
+        :param values: As in _multi_route.
+        :param ttl: As in _multi_route.
+        :return: Dictionary of key -> result for the keys the owner accepted.
+        """
+        results = {}
+        turned_down = False
+        try:
+            client = self._get_client(owner)
+            chunk_size = self._value_chunk_size
+            batch, batch_bytes = [], 0
+            for position, key in enumerate(keys):
+                if operation != "set_key":
+                    batch.append(key)
+                else:
+                    value = values.get(key)
+                    if value is not None and client is not self and len(value) > chunk_size:
+                        batch.append([key, None, self._upload_value(client, value)])
+                    else:
+                        batch.append([key, self._payload(memoryview(value)) if value is not None else None, None])
+                        batch_bytes += len(value) if value is not None else 0
+                if len(batch) >= BATCH_MAX_KEYS or batch_bytes >= chunk_size or position == len(keys) - 1:
+                    arguments = (batch, True) if ttl is None else (batch, True, ttl)
+                    batch_results, refused = getattr(client, operation + "s")(*arguments)
+                    refused = set(refused)
+                    turned_down = turned_down or bool(refused)
+                    sent = batch if operation != "set_key" else [item[0] for item in batch]
+                    results.update((key, tuple(result) if result else None)
+                                   for key, result in zip(sent, batch_results) if key not in refused)
+                    batch, batch_bytes = [], 0
+            if turned_down:
+                self.location_cache.report_wrong_owner(owner)
+        except Exception as e:
+            logger.info("Batch to {} failed, routing its keys one by one. {}".format(owner, e))
+            self.location_cache.invalidate_node(owner)
+        return results
+
+    def scan(self, start_id, end_id, page_size=None, lookup_mode=None):
+        """
+        Iterates over the keys stored in the ring interval [start_id, end_id] in ring order, fetched page by
+        page from the responsible nodes with scan_page. Only one page is held at a time.
+        :param start_id: First id of the interval.
+        :param end_id: Last id of the interval, the interval wraps past zero when it is lower than start_id.
+        :param page_size: Most keys fetched at once, at most scan_page_size.
+        :param lookup_mode: As in set function.
+        :return: Generator of the keys.
+        """
+        cursor = start_id
+        while cursor is not None:
+            keys, cursor = self.scan_page(cursor, end_id, page_size, lookup_mode)
+            yield from keys
+
+    def scan_page(self, start_id, end_id, page_size=None, lookup_mode=None):
+        """
+        Gets the first keys of the ring interval [start_id, end_id] from the node responsible for start_id.
+        A page never spans two nodes, the cursor returned leads to the next node once a node's keys are done.
+        :param start_id: First id of the interval, the cursor returned by the previous page.
+        :param end_id: Last id of the interval.
+        :param page_size: Most keys given, defaults to and is bounded by scan_page_size.
+        :param lookup_mode: As in set function.
+        :return: [keys in ring order, cursor of the next page or None at the end of the interval].
+        """
+        ring_size = self._ring.size
+        if not (0 <= start_id < ring_size and 0 <= end_id < ring_size):
+            raise Exception("Scan ids must be in [0, {}).".format(ring_size))
+        limit = min(page_size or self._scan_page_size, self._scan_page_size)
+        logger.info("Scan request from {} to {} at {}.".format(start_id, end_id, self.get_node_id()))
+
+        owner = self._locate(start_id, lookup_mode)[1]
+        page = None
+        try:
+            page = self._get_client(owner).scan_keys(start_id, end_id, limit, True)
+        except xmlrpc.client.Fault as fault:
+            if fault.faultCode != MessagingConstants.WRONG_OWNER_FAULT_CODE:
+                raise
+            self.location_cache.report_wrong_owner(owner)
+        except Exception as e:
+            logger.info("Owner {} of scan cursor {} failed, looking it up again. {}".format(owner, start_id, e))
+            self.location_cache.invalidate_node(owner)
+        if page is None:
+            predecessor, owner = self._lookup(start_id)
+            self.location_cache.put(predecessor[0], owner)
+            page = self._get_client(owner).scan_keys(start_id, end_id, limit, False)
+
+        keys, cursor, successor = page
+        if successor and successor[0] != owner[0]:
+            # the next page is served by the owner's successor
+            self.location_cache.put(owner[0], successor)
+        return [keys, cursor]
+
+    def scan_keys(self, cursor, end_id, limit, verify_owner=False):
+        """
+        Gets the first keys of this instance's data store from cursor up to end_id or this node's id,
+        whichever comes first in ring order.
+        :param cursor: First id of the page.
+        :param end_id: Last id of the scanned interval.
+        :param limit: Most keys given.
+        :param verify_owner: As in set_key, for cursor.
+        :return: [keys in ring order, cursor of the next page or None, successor of this node].
+        """
+        if verify_owner:
+            self._verify_owner(cursor)
+        ring_size = self._ring.size
+        if (end_id - cursor) % ring_size <= (self.get_node_id() - cursor) % ring_size:
+            last = end_id
+        else:
+            last = self.get_node_id()
+
+        if cursor <= last:
+            keys = self._store.keys_page(cursor, last, limit)
+        else:
+            keys = self._store.keys_page(cursor, ring_size - 1, limit)
+            if len(keys) < limit:
+                keys += self._store.keys_page(0, last, limit - len(keys))
+
+        if len(keys) == limit and keys[-1] != last:
+            next_cursor = (keys[-1] + 1) % ring_size
+        elif last == end_id:
+            next_cursor = None
+        else:
+            next_cursor = (last + 1) % ring_size
+        expired = self._expired(keys)
+        if expired:
+            keys = [key for key in keys if key not in expired]
+        return [keys, next_cursor, self.get_successor()]
+
+    def set_key(self, key, verify_owner=False, value=None, transfer_id=None, ttl=None):
         """
         Author: Adarsh Trivedi
         Set the key in this instance's data store.
         :param key: Key to be set
+        :param verify_owner: Refuse the request with the wrong owner fault if this node isn't responsible for the key.
+        :param value: Value of the key, None keeps the current value.
+        :param transfer_id: Id of a value uploaded with put_value_chunk, used instead of value.
+        :param ttl: Seconds after which the key expires, None if it doesn't.
         :return: self
         """
         logger.info("Set request for key {} redirected at {}.".format(key, self.get_node_id()))
+        if transfer_id is not None:
+            # taken before the checks so a refused upload doesn't stay staged
+            value = self._values.take_staged(transfer_id)
+            if value is None:
+                raise Exception("Value upload {} not found.".format(transfer_id))
+        if verify_owner:
+            self._verify_owner(key)
+        if value is not None:
+            value = as_bytes(value)
+            self._check_value_size(len(value))
+            self._values.put(key, value)
+        self._set_expiries([(key, time.time() + ttl if ttl is not None else None)])
         self._store[key] = True
         if self.get_node_id() != self.get_successor()[0]:
-            self.replicate_single_key_to_successor(key)
+            self.replicate_single_key_to_successor(key, value)
         return self.get_node_id(), self.get_connection_string()
 
-    def get_key(self, key):
+    def get_key(self, key, verify_owner=False):
         """
         Author: Adarsh Trivedi
         Get the key in this instance's data store.
         :param key: Key to be searched.
+        :param verify_owner: As in set_key.
         :return: self
         """
         logger.info("Get request for key {} redirected at {}.".format(key, self.get_node_id()))
-        if key in self._store:
+        if verify_owner:
+            self._verify_owner(key)
+        if key in self._store and not self._is_expired(key):
             return self.get_node_id(), self.get_connection_string()
         return None
 
-    def delete_key(self, key):
+    def set_keys(self, items, verify_owner=False, ttl=None):
+        """
+        Set a batch of keys in this instance's data store. The keys are replicated to the successors at once.
+        :param items: [key, value, transfer id] lists as in receive_values, value and transfer id None keep the
+                      current value.
+        :param verify_owner: Turn down the keys this node isn't responsible for.
+        :param ttl: As in set_key, for all the keys.
+        :return: [self for every key, keys turned down]. Keys whose value upload isn't found are turned down too,
+                 so the sender routes them on their own.
+        """
+        logger.info("Set request for {} keys redirected at {}.".format(len(items), self.get_node_id()))
+        node = (self.get_node_id(), self.get_connection_string())
+        not_owned = self._not_owned([item[0] for item in items]) if verify_owner else ()
+        # every value is resolved and checked before any of them is stored, a bad item leaves no value behind
+        resolved = []
+        for key, value, transfer_id in items:
+            if transfer_id is not None:
+                value = self._values.take_staged(transfer_id)
+                if value is None:
+                    logger.info("Value upload {} of key {} not found.".format(transfer_id, key))
+                    resolved.append((key, None, False))
+                    continue
+            if value is not None:
+                value = as_bytes(value)
+                self._check_value_size(len(value))
+            resolved.append((key, value, key not in not_owned))
+
+        results, refused, replicated, replicated_values = [], [], {}, []
+        for key, value, accepted in resolved:
+            if not accepted:
+                refused.append(key)
+                results.append(None)
+                continue
+            if value is not None:
+                self._values.put(key, value)
+                replicated_values.append((key, value))
+            replicated[key] = False
+            results.append(node)
+        deadline = time.time() + ttl if ttl is not None else None
+        self._set_expiries([(key, deadline) for key in replicated])
+        self._store.update(dict.fromkeys(replicated, True))
+        if replicated and self.get_node_id() != self.get_successor()[0]:
+            self.replicate_keys_to_successors(replicated, replicated_values)
+        return [results, refused]
+
+    def get_keys(self, keys, verify_owner=False):
+        """
+        Get a batch of keys in this instance's data store.
+        :param keys: Keys to be searched.
+        :param verify_owner: As in set_keys.
+        :return: [self or None for every key, keys turned down].
+        """
+        refused = list(self._not_owned(keys)) if verify_owner else []
+        return [[self.get_key(key) for key in keys], refused]
+
+    def delete_keys(self, keys, verify_owner=False):
+        """
+        Delete a batch of keys from this instance's data store.
+        :param keys: Keys to be deleted.
+        :param verify_owner: As in set_keys.
+        :return: [self or None for every key, keys turned down].
+        """
+        refused = self._not_owned(keys) if verify_owner else set()
+        results = [self._delete_key(key) if key not in refused else None for key in keys]
+        deleted = [key for key, result in zip(keys, results) if result]
+        if deleted and self.get_node_id() != self.get_successor()[0]:
+            self.delete_keys_from_successors(deleted)
+        return [results, list(refused)]
+
+    def get_value_key(self, key, verify_owner=False, offset=0, length=None):
+        """
+        Get a chunk of the value of a key in this instance's data store.
+        :param key: Key to be searched.
+        :param verify_owner: As in set_key.
+        :param offset: Offset of the chunk in the value.
+        :param length: Length of the chunk, defaults to value_chunk_size.
+        :return: [self, size of the value, chunk], None if the key has no value.
+        """
+        if verify_owner:
+            self._verify_owner(key)
+        value = self._values.get(key)
+        if value is None or self._is_expired(key):
+            return None
+        length = length or self._value_chunk_size
+        return [(self.get_node_id(), self.get_connection_string()), len(value),
+                self._payload(memoryview(value)[offset:offset + length])]
+
+    def put_value_chunk(self, transfer_id, offset, chunk, size):
+        """
+        Receives a chunk of a value, committed later by set_key or receive_values with the transfer id.
+        :param transfer_id: Id of the upload.
+        :param offset: Offset of the chunk in the value.
+        :param chunk: Bytes of the chunk.
+        :param size: Size of the whole value.
+        :return: True
+        """
+        self._check_value_size(size)
+        self._values.stage_chunk(transfer_id, offset, as_bytes(chunk), size)
+        return True
+
+    def receive_values(self, values):
+        """
+        Stores values sent by another node, with replicated or transferred keys.
+        :param values: [key, value, transfer id] lists, value is None when it was uploaded with put_value_chunk.
+        :return: True
+        """
+        for key, value, transfer_id in values:
+            if transfer_id is not None:
+                value = self._values.take_staged(transfer_id)
+            if value is not None:
+                self._values.put(key, as_bytes(value))
+        return True
+
+    def locate_key(self, key):
+        """
+        Operation of the recursive lookups which only look for the responsible node.
+        :param key: Hashed key.
+        :return: self
+        """
+        return self.get_node_id(), self.get_connection_string()
+
+    def delete_key(self, key, verify_owner=False):
         """
         Author: Adarsh Trivedi
         Delete the key from this instance's data store.
         :param key: Key to be deleted.
+        :param verify_owner: As in set_key.
         :return: self
         """
         logger.info("Delete request for key {} redirected at {}.".format(key, self.get_node_id()))
-        if key in self._store:
-            del self._store[key]
-            if self.get_node_id() != self.get_successor()[0]:
-                self.del_key_from_successor(key)
-            return self.get_node_id(), self.get_connection_string()
-        return None
+        if verify_owner:
+            self._verify_owner(key)
+        result = self._delete_key(key)
+        if result and self.get_node_id() != self.get_successor()[0]:
+            self.del_key_from_successor(key)
+        return result
+
+    def _delete_key(self, key):
+        """
+        :param key: Key to be deleted from this node only.
+        :return: self, None if the key wasn't in the store.
+        """
+        if self._store.pop(key, None) is None:
+            return None
+        self._values.pop(key)
+        self._set_expiries([(key, None)])
+        return self.get_node_id(), self.get_connection_string()
 
     def get_store(self):
         """
@@ -811,35 +2306,68 @@ class Node(object):
         """
         return self._store
 
+    def get_store_stats(self):
+        """
+        :return: Store backend, number of owned and replicated keys, memory used per key, bytes held by the
+                 values and number of keys set with a ttl.
+        """
+        stats = self._store.get_stats()
+        stats.update(self._values.get_stats())
+        stats["expiring"] = len(self._expiry)
+        if self._store_log:
+            stats.update(("log_" + name, value) for name, value in self._store_log.get_stats().items())
+        return stats
+
+    def get_ownership_report(self):
+        """
+        Walks the ring along the successors, starting at this node, and adds up the part of the ring every
+        physical server is responsible for over its virtual nodes.
+        :return: Dictionary of server ip:port -> [number of nodes, fraction of the ring owned].
+        """
+        timeout = self._lookup_hop_timeout
+        nodes = {self.get_node_id(): self.get_connection_string()}
+        node = self.get_successor()
+        while node[0] not in nodes:
+            nodes[node[0]] = node[1]
+            node = _as_node(self._get_client(node, timeout).get_successor())
+
+        report = {}
+        for node_id, fraction in self._ring.owned_fractions(nodes).items():
+            server = report.setdefault(nodes[node_id].partition("/")[0], [0, 0.0])
+            server[0] += 1
+            server[1] += fraction
+        return report
+
     def initialize_store(self):
         """
         Author: Adarsh Trivedi
         Initialize this node's data from successor node's data store.
         :return: None
         """
-        self._store = ast.literal_eval(self.get_xml_client(self.get_successor()).get_transfer_data(self.get_node_id()))
+        self._store.update(ast.literal_eval(self._get_client(self.get_successor()).get_transfer_data(
+            self.get_node_id(), self.get_connection_string())))
 
-    def get_transfer_data(self, node_id):
+    def get_transfer_data(self, node_id, connection_string=None):
 
         """
         Author: Adarsh Trivedi
         Returns key from this node which precede node_id parameter. Used during join.
         :param node_id: New node's id.
+        :param connection_string: New node's connection string, the values of the keys are sent to it before
+                                  the keys are returned.
         :return: Responsible keys as dictionary.
         """
 
-        transfer_data = {}
-        keys_to_be_deleted = []
-
-        for key in self._store:
-            if self.in_bracket(key, [self.get_node_id(), node_id], 'o'):
-                transfer_data[key] = True
-                keys_to_be_deleted.append(key)
-
-        for key in keys_to_be_deleted:
-            del self._store[key]
-
-        return str(transfer_data)
+        transfer_data = self._store.pop_range(self.get_node_id(), node_id, 'o')
+        # keys whose ttl passed are dropped instead of handed over
+        expired = self._expired(transfer_data)
+        moving = [key for key in transfer_data if key not in expired]
+        if connection_string:
+            self._send_values((node_id, connection_string), self._values.get_many(moving))
+            self._get_client((node_id, connection_string)).receive_expiries(self._expiry.get_deadlines(moving))
+        self._values.pop_many(transfer_data)
+        self._set_expiries([(key, None) for key in transfer_data])
+        return str(dict.fromkeys(moving, True))
 
     def transfer_before_leave(self):
         """
@@ -847,20 +2375,110 @@ class Node(object):
         Transfer this node's key to successor before graceful leave.
         :return: None
         """
-        self.get_xml_client(self.get_successor()).receive_keys_before_leave(str(self._store))
+        store = self._store.to_dict()
+        expired = self._expired(store)
+        for key in expired:
+            del store[key]
+        self._send_values(self.get_successor(), [(key, value) for key, value in self._values.items()
+                                                 if key not in expired])
+        self._get_client(self.get_successor()).receive_keys_before_leave(str(store),
+                                                                         self._expiry.get_deadlines(store))
 
-    def receive_keys_before_leave(self, store):
+    def receive_keys_before_leave(self, store, expiries=None):
         """
         Author: Adarsh Trivedi
         Sets current node's data store with store values received from predecessor node before
         graceful leave.
         :param store: Received store values.
+        :param expiries: [key, deadline] pairs of the received keys set with a ttl, the other received keys don't
+                         expire. None leaves the deadlines as they are.
         :return: None
         """
         store = ast.literal_eval(store)
+        if expiries is not None:
+            deadlines = dict((key, deadline) for key, deadline in expiries)
+            self._set_expiries([(key, deadlines.get(key)) for key in store])
+        self._store.update(store)
+
+    def receive_expiries(self, expiries):
+        """
+        Sets the deadlines of keys transferred to this node, sent before the keys themselves during join.
+        :param expiries: [key, deadline] pairs.
+        :return: True
+        """
+        self._set_expiries([(key, deadline) for key, deadline in expiries])
+        return True
+
+    def expire_keys(self):
+        """
+        Removes the keys whose ttl passed, with their values. Called every expiry_tick. Replicas carry the
+        deadline of their key, so every node expires its own copies of a key. The owner also removes the
+        replicas of its expired keys from its successors, for the replicas which missed a change of the deadline.
+        :return: Number of keys expired.
+        """
+        expired = self._expiry.advance(time.time())
+        if not expired:
+            return 0
+        owned = [key for key in expired if self._store.pop(key, None)]
+        self._values.pop_many(expired)
+        if self._store_log:
+            self._store_log.write([expiry_record(key, None) for key in expired])
+        logger.info("Expired {} keys.".format(len(expired)))
+        successor = self.get_successor()
+        if owned and successor and successor[0] != self.get_node_id():
+            self.delete_keys_from_successors(owned)
+        return len(expired)
+
+    def _check_ttl(self, ttl):
+        """
+        :param ttl: ttl of a set request.
+        :return: None
+        """
+        if ttl is not None and ttl <= 0:
+            raise Exception("ttl must be positive, got {}.".format(ttl))
+
+    def _set_expiries(self, deadlines):
+        """
+        Schedules keys for expiry, recorded in the store log with the log store backend.
+        :param deadlines: (key, deadline) pairs, deadline None removes the deadline the key may have.
+        :return: None
+        """
+        records = []
+        for key, deadline in deadlines:
+            if deadline is not None:
+                self._expiry.schedule(key, deadline)
+                records.append(expiry_record(key, deadline))
+            elif self._expiry.cancel(key) is not None:
+                records.append(expiry_record(key, None))
+        if records and self._store_log:
+            self._store_log.write(records)
 
-        for key in store:
-            self._store[key] = store[key]
+    def _restore_expiries(self, deadlines):
+        """
+        Schedules the deadlines of a checkpoint or of the store log for the keys present in the store.
+        :param deadlines: Dictionary of key -> deadline.
+        :return: None
+        """
+        stale = []
+        for key, deadline in deadlines.items():
+            if key in self._store:
+                self._expiry.schedule(key, deadline)
+            else:
+                stale.append(key)
+        if stale and self._store_log:
+            self._store_log.write([expiry_record(key, None) for key in stale])
+
+    def _is_expired(self, key):
+        deadline = self._expiry.get_deadline(key)
+        return deadline is not None and deadline <= time.time()
+
+    def _expired(self, keys):
+        """
+        :param keys: Keys.
+        :return: Set of the keys whose ttl passed but which weren't removed by expire_keys yet.
+        """
+        now = time.time()
+        return set(key for key, deadline in self._expiry.get_deadlines(keys) if deadline <= now)
 
     def stabilize_paper(self):
         """
@@ -869,7 +2487,7 @@ class Node(object):
         :return: None
         """
         logger.info("Starting stabilization.")
-        successor_client = self.get_xml_client(self.get_successor())
+        successor_client = self._get_client(self.get_successor())
         x = successor_client.get_predecessor()
         if self.in_bracket(x[0], [self.get_node_id(), self.get_successor()[0]], 'o'):
             self.set_successor(x)
@@ -903,11 +2521,14 @@ class Node(object):
         finger = self._finger_table.get_finger_ith(i)
         finger = finger.create_copy()
         finger_start_successor = self.find_successor(finger.start)
+        if self._proximity_routing:
+            finger_start_successor = self._select_finger_node(i + 1, finger_start_successor)
         finger.set_node(finger_start_successor[0])
         finger.set_connection_string(finger_start_successor[1])
         finger.set_id(finger_start_successor[0])
-        finger.set_ip(finger_start_successor[1].split(":")[0])
-        finger.set_port(finger_start_successor[1].split(":")[1])
+        ip, port, _ = split_connection_string(finger_start_successor[1])
+        finger.set_ip(ip)
+        finger.set_port(port)
         self._finger_table.update_finger_at_ith_position(i, finger)
 
     def stabilize(self):
@@ -920,34 +2541,49 @@ class Node(object):
         :return: None
         """
         logger.info("Starting stabilization.")
-        self.set_successor(self.successor, True)
+        dropped = self._values.purge_staged()
+        if dropped:
+            logger.info("Dropped {} value uploads never committed.".format(dropped))
+        self.set_successor(self.get_successor(), True)
         logger.info("Finished stabilization.")
 
-    def replicate_keys_to_successors(self, store=None):
+    def replicate_keys_to_successors(self, store=None, values=None):
         """
         Author: Adarsh Trivedi
-        Replicates set of keys to successors for crash handling.
+        Replicates set of keys to successors for crash handling. The deadlines of the keys set with a ttl go
+        along, the keys whose ttl passed are not replicated.
         :param store: Keys to be replicated to successors.
+        :param values: (key, value) pairs replicated with store. All owned keys are replicated with their values
+                       when store isn't given.
         :return: None
         """
-        for i in range(len(self.get_successor_list())):
+        successors = self._replica_successors()
+        if successors and not store:
+            owned_keys = self._store.owned_keys()
+            expired = self._expired(owned_keys.tolist())
+            if expired:
+                owned_keys = owned_keys[~numpy.isin(owned_keys, numpy.fromiter(expired, dtype=owned_keys.dtype))]
+            owned_keys = owned_keys.tolist()
+        for successor in successors:
             if not store:
-                build_store = {}
-                for key in self._store:
-                    if self._store[key]:
-                        build_store[key] = False
-                self.get_xml_client(self.get_successor_list()[i]).receive_keys_before_leave(str(build_store))
+                build_store = dict.fromkeys(owned_keys, False)
+                self._send_values(successor, self._values.get_many(owned_keys))
+                self._get_client(successor).receive_keys_before_leave(
+                    str(build_store), self._expiry.get_deadlines(owned_keys))
             else:
-                self.get_xml_client(self.get_successor_list()[i]).receive_keys_before_leave(str(store))
+                self._send_values(successor, values)
+                self._get_client(successor).receive_keys_before_leave(
+                    str(store), self._expiry.get_deadlines(store))
 
-    def replicate_single_key_to_successor(self, key):
+    def replicate_single_key_to_successor(self, key, value=None):
         """
         Author: Adarsh Trivedi
         :param key: Key to be replicated.
+        :param value: Value of the key, None if it has none or it didn't change.
         :return: None
         """
         store = {key: False}
-        self.replicate_keys_to_successors(store)
+        self.replicate_keys_to_successors(store, [(key, value)] if value is not None else None)
 
     def del_key_from_successor(self, key):
         """
@@ -955,8 +2591,52 @@ class Node(object):
         :param key: Removes the replicated key from successors.
         :return:
         """
-        if key in self._store:
-            del self._store[key]
+        self.delete_keys_from_successors([key])
+
+    def delete_keys_from_successors(self, keys):
+        """
+        Removes the replicas of keys deleted or expired on this node from its successors, one call per successor.
+        A successor which can't be reached is skipped, it gets this node's keys again when it becomes its
+        successor anew.
+        :param keys: Keys deleted or expired.
+        :return: None
+        """
+        for successor in self._replica_successors():
+            try:
+                self._get_client(successor).delete_replicas(list(keys))
+            except Exception as e:
+                logger.warning("Removing {} replicas from {} failed. {}".format(len(keys), successor, e))
+
+    def delete_replicas(self, keys):
+        """
+        Removes the replicas of keys deleted or expired on their owner. Keys this node owns are left alone.
+        :param keys: Keys.
+        :return: True
+        """
+        replicas = [key for key in keys if self._store.get(key) is False]
+        for key in replicas:
+            self._store.pop(key, None)
+        self._values.pop_many(replicas)
+        self._set_expiries([(key, None) for key in replicas])
+        return True
+
+    def _replica_successors(self):
+        """
+        Virtual nodes of one server share its process, replicas on them are lost with the server. Only the first
+        successor of every other server gets replicas, that is the node taking over the keys when the servers
+        in between fail.
+        :return: Nodes of the successor list the keys of this node are replicated to.
+        """
+        servers = {self.get_connection_string().partition("/")[0]}
+        successors = []
+        for successor in self.get_successor_list():
+            if not successor:
+                continue
+            server = successor[1].partition("/")[0]
+            if server not in servers:
+                servers.add(server)
+                successors.append(tuple(successor))
+        return successors
 
     def replication_stabilization(self):
 
@@ -970,15 +2650,13 @@ class Node(object):
         it can be correctly implemented.
         """
 
-        false_store = {}
-        for key in self._store:
-            if not self._store[key]:
-                false_store[key] = True
+        false_store = dict.fromkeys(self._store.replica_keys().tolist(), True)
 
-        keys_to_be_removed = self.get_xml_client(self.get_predecessor()).get_non_owned_keys(str(false_store))
+        keys_to_be_removed = self._get_client(self.get_predecessor()).get_non_owned_keys(str(false_store))
 
         for key in keys_to_be_removed:
             del self._store[key]
+        self._values.pop_many(keys_to_be_removed)
 
     def get_non_owned_keys(self, false_store):
         """
@@ -988,12 +2666,5 @@ class Node(object):
         :param false_store: Keys which are replicated and should be deleted.
         :return: Non owned keys.
         """
-        false_store = ast.literal_eval(false_store)
-        non_owned_keys = []
-        for key in false_store:
-            if key not in self._store:
-                pass
-            elif not self._store[key]:
-                non_owned_keys.append(key)
-
-        return non_owned_keys
+        false_store = numpy.array(list(ast.literal_eval(false_store)), dtype=numpy.uint64)
+        return false_store[numpy.isin(false_store, self._store.replica_keys())].tolist()
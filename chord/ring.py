@@ -0,0 +1,81 @@
+"""
+This module holds the identifier ring arithmetic of the chord nodes.
+
+The modulus 2^m and the finger offsets 2^(i-1) only depend on m_bits, so they are computed once per ring
+and shared by the node, its finger table and its fingers instead of being recomputed (and m_bits fetched
+from the configuration) on every call.
+"""
+
+
+__all__ = ["Ring", "get_ring"]
+
+
+class Ring(object):
+
+    """
+    Arithmetic of an identifier ring of 2^m ids.
+    """
+
+    __slots__ = ("m_bits", "size", "_offsets")
+
+    def __init__(self, m_bits):
+        """
+        :param m_bits: Number of bits of the ids.
+        """
+        self.m_bits = m_bits
+        self.size = 2 ** m_bits
+        # offset of finger i (1 to m) from the node at index i, 2^(i-1)
+        self._offsets = (0,) + tuple(2 ** (i - 1) for i in range(1, m_bits + 1))
+
+    def finger_start(self, node_id, i):
+        """
+        :param node_id: Node id.
+        :param i: Finger number, 1 to m.
+        :return: node_id + 2^(i-1) on the ring.
+        """
+        return (node_id + self._offsets[i]) % self.size
+
+    def finger_starts(self, node_id):
+        """
+        :param node_id: Node id.
+        :return: Starts of the fingers 1 to m of the node.
+        """
+        return [(node_id + offset) % self.size for offset in self._offsets[1:]]
+
+    def go_back(self, node_id, steps):
+        """
+        :param node_id: Start id.
+        :param steps: Number of ids to move back, at most the ring size.
+        :return: Id steps counter clockwise from node_id.
+        """
+        return (node_id - steps) % self.size
+
+    def distance(self, lower, higher):
+        """
+        :return: Clockwise distance from lower to higher.
+        """
+        return (higher - lower) % self.size
+
+    def owned_fractions(self, node_ids):
+        """
+        :param node_ids: Ids of the nodes of the ring.
+        :return: Dictionary of node id -> fraction of the ring the node is responsible for, the ids from its
+                 predecessor (excluded) up to itself.
+        """
+        ordered = sorted(set(node_ids))
+        return {node_id: (self.distance(ordered[i - 1], node_id) or self.size) / self.size
+                for i, node_id in enumerate(ordered)}
+
+
+_rings = {}
+
+
+def get_ring(m_bits):
+    """
+    :param m_bits: Number of bits of the ids.
+    :return: Shared Ring instance of this size.
+    """
+    ring = _rings.get(m_bits)
+    if ring is None:
+        ring = _rings[m_bits] = Ring(m_bits)
+    return ring
@@ -0,0 +1,61 @@
+"""
+This module holds the batched version of Node.in_bracket used by the bulk key paths (batched key requests,
+multi key routing). A whole array of identifiers is classified against a ring interval in one vectorized pass
+instead of one in_bracket call per key.
+
+Interval types are the ones of in_bracket: c: closed, l: left closed, r: right closed, o: open.
+lower == higher is the whole ring, without lower itself for the open interval.
+"""
+
+
+import numpy
+
+
+__all__ = ["to_identifier_array", "in_interval", "select_in_interval"]
+
+
+def to_identifier_array(identifiers):
+    """
+    :param identifiers: Iterable of ids, e.g. the keys of a node's store.
+    :return: numpy array of the ids. int64 as long as the ids fit, which covers m_bits up to 63.
+    """
+    if isinstance(identifiers, numpy.ndarray):
+        return identifiers
+    identifiers = list(identifiers)
+    try:
+        return numpy.array(identifiers, dtype=numpy.int64)
+    except OverflowError:
+        return numpy.array(identifiers, dtype=object)
+
+
+def in_interval(identifiers, lower, higher, type='c'):
+    """
+    Vectorized Node.in_bracket.
+    :param identifiers: Array (or iterable) of ids.
+    :param lower: Lower boundary of the interval.
+    :param higher: Higher boundary of the interval.
+    :param type: c: closed, r: right closed, l: left closed, o: open
+    :return: Boolean numpy array, True for the ids in the interval.
+    """
+    identifiers = to_identifier_array(identifiers)
+
+    if lower < higher:
+        mask = (identifiers > lower) & (identifiers < higher)
+    elif lower > higher:
+        mask = (identifiers > lower) | (identifiers < higher)
+    else:
+        mask = identifiers != lower
+
+    if type in ('c', 'l'):
+        mask |= identifiers == lower
+    if type in ('c', 'r'):
+        mask |= identifiers == higher
+    return mask
+
+
+def select_in_interval(identifiers, lower, higher, type='c'):
+    """
+    :return: Ids of identifiers which are in the interval, as a list of ints.
+    """
+    identifiers = to_identifier_array(identifiers)
+    return identifiers[in_interval(identifiers, lower, higher, type)].tolist()
@@ -0,0 +1,111 @@
+"""
+This module saves and loads the snapshots a chord node restarts from.
+
+A snapshot is the routing state of the node (finger table, successor list and predecessor) saved as json,
+next to a checkpoint of the keys and values of the node for the in memory store backends. The checkpoint is
+written in the record format of the log store backend, whose own log already is the checkpoint. Files are
+written under a temporary name and renamed, so a crash while saving leaves the previous snapshot in place.
+"""
+
+
+import json
+import os
+import shutil
+import time
+from chord import log_store
+
+
+__all__ = ["save_snapshot", "load_snapshot", "write_checkpoint", "read_checkpoint"]
+
+
+SNAPSHOT_FILE = "routing.json"
+CHECKPOINT_PREFIX = "checkpoint-"
+
+
+def save_snapshot(directory, state):
+    """
+    Saves the snapshot and removes the checkpoints older than its checkpoint.
+    :param directory: State directory of the node.
+    :param state: json serializable routing state. saved_at is added.
+    :return: (name, OSError) of the old checkpoints which couldn't be removed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    state = dict(state, saved_at=time.time())
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    with open(path + ".tmp", "w") as snapshot_file:
+        json.dump(state, snapshot_file)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(path + ".tmp", path)
+
+    # checkpoints written before the one of the snapshot, the newer ones may belong to a snapshot being saved
+    failures = []
+    if not state.get("checkpoint"):
+        return failures
+    written = _checkpoint_time(state["checkpoint"])
+    for name in os.listdir(directory):
+        saved = _checkpoint_time(name)
+        if saved is not None and saved < written:
+            try:
+                shutil.rmtree(os.path.join(directory, name))
+            except OSError as e:
+                failures.append((name, e))
+    return failures
+
+
+def _checkpoint_time(name):
+    # time_ns the checkpoint was written at, None if name isn't a checkpoint
+    if not name.startswith(CHECKPOINT_PREFIX) or not name[len(CHECKPOINT_PREFIX):].isdigit():
+        return None
+    return int(name[len(CHECKPOINT_PREFIX):])
+
+
+def load_snapshot(directory, max_age):
+    """
+    :param directory: State directory of the node.
+    :param max_age: Seconds after which a snapshot is too old to restart from.
+    :return: Saved routing state, None if there is none or it is too old or damaged.
+    """
+    try:
+        with open(os.path.join(directory, SNAPSHOT_FILE)) as snapshot_file:
+            state = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if time.time() - state.get("saved_at", 0) > max_age:
+        return None
+    return state
+
+
+def write_checkpoint(directory, keys, values, expiries=()):
+    """
+    Writes the keys and values of a node in a new checkpoint directory. It becomes the checkpoint of the node
+    once a snapshot pointing to it is saved.
+    :param directory: State directory of the node.
+    :param keys: (key, owned flag) pairs.
+    :param values: (key, value) pairs.
+    :param expiries: (key, deadline) pairs of the keys set with a ttl.
+    :return: Name of the checkpoint.
+    """
+    name = "{}{}".format(CHECKPOINT_PREFIX, time.time_ns())
+    log = log_store.SegmentLog(os.path.join(directory, name), sync=False, compaction_interval=0)
+    log.append([log_store.key_record(key, owned) for key, owned in keys])
+    log.append([(log_store.VALUE, key, value) for key, value in values])
+    log.append([log_store.expiry_record(key, deadline) for key, deadline in expiries])
+    log.sync()
+    log.close()
+    return name
+
+
+def read_checkpoint(directory, name):
+    """
+    :param directory: State directory of the node.
+    :param name: Name of the checkpoint.
+    :return: (dictionary of key -> owned flag, list of (key, value), dictionary of key -> deadline) of the
+             checkpoint.
+    """
+    log = log_store.SegmentLog(os.path.join(directory, name), sync=False, compaction_interval=0)
+    keys = log.take_recovered_keys()
+    values = [(key, bytes(log.read_value(key))) for key in log.value_keys()]
+    expiries = log.take_recovered_expiries()
+    log.close()
+    return keys, values, expiries
@@ -0,0 +1,140 @@
+"""
+This module holds the hierarchical timer wheel expiring the keys set with a ttl.
+
+The wheel has levels of slots. A slot of the first level spans one tick, a slot of every next level spans a
+whole turn of the level below it. A key goes in the slot of the lowest level whose turn reaches its deadline.
+When the wheel advances to a slot of a higher level, the keys of that slot are put back into the lower levels,
+now closer to their deadline. Scheduling a key is O(1) and a key moves at most once per level before it expires,
+the store is never scanned. Rescheduled or cancelled keys are not looked for in their old slot, the deadline of
+the key is checked when the slot comes up instead.
+"""
+
+
+import threading
+
+
+__all__ = ["TimerWheel"]
+
+
+class TimerWheel(object):
+
+    """
+    Thread safe hierarchical timer wheel of keys. With the defaults (1 second ticks, 4 levels of 64 slots) the
+    levels reach 64 seconds, 68 minutes, 3 days and 194 days. Keys further away wait in an overflow set, looked at
+    once per turn of the last level.
+    """
+
+    def __init__(self, now, tick=1.0, slots=64, levels=4):
+        """
+        :param now: Current time in seconds.
+        :param tick: Seconds spanned by a slot of the first level.
+        :param slots: Slots per level.
+        :param levels: Number of levels.
+        """
+        self._tick = tick
+        self._slots = slots
+        self._levels = [[set() for _ in range(slots)] for _ in range(levels)]
+        # ticks spanned by a slot of every level
+        self._spans = [slots ** level for level in range(levels)]
+        self._overflow = set()
+        self._due = set()
+        # key -> deadline in seconds
+        self._deadlines = {}
+        self._current = self._to_tick(now)
+        self._lock = threading.Lock()
+
+    def _to_tick(self, seconds):
+        return int(seconds // self._tick)
+
+    def _insert(self, key, deadline_tick):
+        # lowest level whose turn reaches the deadline, keys due already expire at the next advance
+        delay = deadline_tick - self._current
+        if delay <= 0:
+            self._due.add(key)
+            return
+        for level, span in enumerate(self._spans):
+            if delay < span * self._slots:
+                self._levels[level][deadline_tick // span % self._slots].add(key)
+                return
+        self._overflow.add(key)
+
+    def schedule(self, key, deadline):
+        """
+        Sets the deadline of a key, replacing the one it may have.
+        :param key: Key.
+        :param deadline: Time in seconds at which the key expires.
+        :return: None
+        """
+        with self._lock:
+            self._deadlines[key] = deadline
+            self._insert(key, self._to_tick(deadline))
+
+    def cancel(self, key):
+        """
+        :param key: Key which doesn't expire anymore.
+        :return: Deadline the key had, None if it had none.
+        """
+        with self._lock:
+            return self._deadlines.pop(key, None)
+
+    def get_deadline(self, key):
+        """
+        :param key: Key.
+        :return: Deadline of the key in seconds, None if it has none.
+        """
+        return self._deadlines.get(key)
+
+    def get_deadlines(self, keys):
+        """
+        :param keys: Keys.
+        :return: (key, deadline) pairs of the keys which have a deadline.
+        """
+        deadlines = self._deadlines
+        return [(key, deadlines[key]) for key in keys if key in deadlines]
+
+    def advance(self, now):
+        """
+        Moves the wheel up to now.
+        :param now: Current time in seconds.
+        :return: Keys whose deadline passed, they are removed from the wheel.
+        """
+        expired = []
+        target = self._to_tick(now)
+        with self._lock:
+            if self._due:
+                keys, self._due = self._due, set()
+                self._reinsert(keys, expired)
+            while self._current < target:
+                self._current += 1
+                if self._overflow and self._current % (self._spans[-1] * self._slots) == 0:
+                    keys, self._overflow = self._overflow, set()
+                    self._reinsert(keys, expired)
+                # slots of the higher levels coming up hand their keys down, the highest level first
+                for level in range(len(self._levels) - 1, 0, -1):
+                    span = self._spans[level]
+                    if self._current % span == 0:
+                        slot = self._levels[level][self._current // span % self._slots]
+                        if slot:
+                            self._levels[level][self._current // span % self._slots] = set()
+                            self._reinsert(slot, expired)
+                slot = self._levels[0][self._current % self._slots]
+                if slot:
+                    self._levels[0][self._current % self._slots] = set()
+                    self._reinsert(slot, expired)
+        return expired
+
+    def _reinsert(self, keys, expired):
+        # keys of a slot coming up: expired, cancelled, or put in the slot of their (possibly new) deadline
+        for key in keys:
+            deadline = self._deadlines.get(key)
+            if deadline is None:
+                continue
+            deadline_tick = self._to_tick(deadline)
+            if deadline_tick <= self._current:
+                del self._deadlines[key]
+                expired.append(key)
+            else:
+                self._insert(key, deadline_tick)
+
+    def __len__(self):
+        return len(self._deadlines)
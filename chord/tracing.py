@@ -0,0 +1,143 @@
+"""
+This module holds the lookup tracing of the chord nodes.
+
+A traced lookup gets a trace id, sent along with its lookup_step/forward_lookup calls so the hops can be
+matched in the logs of the other nodes, and collects one record per remote hop: the node, the latency of
+the RPC and the number of failed attempts before it answered. The originating node keeps the last traces
+and rolling histograms of hop count and per hop latency over the last lookups.
+"""
+
+
+import bisect
+import collections
+import itertools
+import threading
+import time
+import uuid
+
+
+__all__ = ["LookupTracer", "LookupTrace"]
+
+
+# upper bounds in milliseconds of the per hop latency histogram buckets
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class LookupTrace(object):
+
+    """
+    Hops of a single lookup.
+    """
+
+    _ids = itertools.count()
+    _prefix = uuid.uuid4().hex[:8]
+
+    def __init__(self, identifier):
+        """
+        :param identifier: Id being looked up.
+        """
+        self.trace_id = "{}-{}".format(LookupTrace._prefix, next(LookupTrace._ids))
+        self.identifier = identifier
+        self.hops = []
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def add_hop(self, node, latency, retries=0):
+        """
+        :param node: (node_id, connection_string) of the node answering the hop.
+        :param latency: Seconds the hop's RPC took.
+        :param retries: Failed attempts of the hop before this node answered.
+        :return: None
+        """
+        self.hops.append({"node": node[0], "connection_string": node[1], "latency_ms": latency * 1000,
+                          "retries": retries})
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "identifier": self.identifier, "hop_count": len(self.hops),
+                "duration_ms": (self.duration or 0) * 1000, "hops": self.hops}
+
+
+class LookupTracer(object):
+
+    """
+    Collects the traces of the lookups started by a node.
+    """
+
+    def __init__(self, enabled=False, window=1000, history=100):
+        """
+        :param enabled: Lookups are only traced when set.
+        :param window: Number of last lookups the histograms are computed over.
+        :param history: Number of last traces kept.
+        """
+        self.enabled = enabled
+        self._hop_counts = collections.deque(maxlen=window)
+        self._hop_latencies = collections.deque(maxlen=window)
+        self._traces = collections.deque(maxlen=history)
+        self._peers = {}
+        self._lookups = 0
+        self._lock = threading.Lock()
+
+    def start(self, identifier):
+        """
+        :param identifier: Id being looked up.
+        :return: New LookupTrace, None when tracing is disabled.
+        """
+        if not self.enabled:
+            return None
+        return LookupTrace(identifier)
+
+    def finish(self, trace):
+        """
+        Records a finished lookup.
+        :param trace: LookupTrace given by start.
+        :return: None
+        """
+        trace.finish()
+        with self._lock:
+            self._lookups += 1
+            self._hop_counts.append(len(trace.hops))
+            self._hop_latencies.append([hop["latency_ms"] for hop in trace.hops])
+            self._traces.append(trace)
+            for hop in trace.hops:
+                peer = self._peers.setdefault(hop["connection_string"], [0, 0.0, 0])
+                peer[0] += 1
+                peer[1] += hop["latency_ms"]
+                peer[2] += hop["retries"]
+
+    def get_stats(self):
+        """
+        :return: lookups: lookups traced, mean_hops and hop_count_histogram over the last lookups,
+                 hop_latency_histogram_ms over their hops (keyed by bucket upper bound), peers: hops,
+                 mean latency and retries per peer since tracing started.
+        """
+        with self._lock:
+            hop_counts = list(self._hop_counts)
+            latencies = [latency for hops in self._hop_latencies for latency in hops]
+            peers = {peer: {"hops": hops, "mean_latency_ms": total / hops, "retries": retries}
+                     for peer, (hops, total, retries) in self._peers.items()}
+            lookups = self._lookups
+
+        hop_count_histogram = collections.Counter(str(hops) for hops in hop_counts)
+        latency_histogram = collections.OrderedDict(("<={}".format(bound), 0) for bound in LATENCY_BUCKETS_MS)
+        latency_histogram[">{}".format(LATENCY_BUCKETS_MS[-1])] = 0
+        keys = list(latency_histogram)
+        for latency in latencies:
+            latency_histogram[keys[bisect.bisect_left(LATENCY_BUCKETS_MS, latency)]] += 1
+
+        return {"lookups": lookups,
+                "mean_hops": sum(hop_counts) / len(hop_counts) if hop_counts else 0.0,
+                "hop_count_histogram": dict(hop_count_histogram),
+                "hop_latency_histogram_ms": dict(latency_histogram),
+                "peers": peers}
+
+    def get_traces(self, count):
+        """
+        :param count: Number of traces.
+        :return: Last count traces as dictionaries, most recent first.
+        """
+        with self._lock:
+            traces = list(self._traces)[-count:] if count > 0 else []
+        return [trace.to_dict() for trace in reversed(traces)]
@@ -0,0 +1,137 @@
+"""
+This module holds the values stored with the keys of a chord node.
+
+The key store only records which keys a node owns or replicates, the values live next to it keyed by the same
+ids. Values are raw bytes. Values larger than value_chunk_size are never sent in one RPC: they are cut in
+memoryview slices, staged on the receiving node with put_value_chunk and committed by a transfer id, and read
+back chunk by chunk with get_value_key.
+"""
+
+
+import threading
+import time
+import xmlrpc.client
+
+
+__all__ = ["ValueStore", "as_bytes"]
+
+
+def as_bytes(value):
+    """
+    :param value: Value as received from any RPC engine, bytes, bytearray, memoryview, xmlrpc.client.Binary
+                  or str (stored utf-8 encoded).
+    :return: bytes or bytearray holding the value.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value
+    if isinstance(value, xmlrpc.client.Binary):
+        return value.data
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return bytes(value)
+
+
+class ValueStore(object):
+
+    """
+    Thread safe key -> value mapping, keeping track of the bytes held. Also keeps the values being
+    received in chunks until they are committed.
+    """
+
+    # seconds after which a value whose upload was never committed is dropped
+    staged_value_ttl = 60
+
+    def __init__(self):
+        self._values = {}
+        self._bytes = 0
+        # transfer id -> [bytearray of the value, expiry time]
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._values.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            previous = self._values.get(key)
+            self._bytes += len(value) - (len(previous) if previous is not None else 0)
+            self._values[key] = value
+
+    def pop(self, key):
+        with self._lock:
+            value = self._values.pop(key, None)
+            if value is not None:
+                self._bytes -= len(value)
+            return value
+
+    def get_many(self, keys):
+        """
+        :param keys: Keys.
+        :return: (key, value) pairs of the keys which have a value.
+        """
+        values = self._values
+        return [(key, values[key]) for key in keys if key in values]
+
+    def pop_many(self, keys):
+        with self._lock:
+            for key in keys:
+                value = self._values.pop(key, None)
+                if value is not None:
+                    self._bytes -= len(value)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def stage_chunk(self, transfer_id, offset, chunk, size):
+        """
+        Writes a chunk of a value being received into its buffer.
+        :param transfer_id: Id of the transfer, chosen by the sender.
+        :param offset: Offset of the chunk in the value.
+        :param chunk: Bytes of the chunk.
+        :param size: Size of the whole value.
+        :return: None
+        """
+        now = time.monotonic()
+        with self._lock:
+            staged = self._staged.get(transfer_id)
+            if staged is None:
+                self._purge_staged(now)
+                staged = self._staged[transfer_id] = [bytearray(size), 0]
+            staged[1] = now + self.staged_value_ttl
+        if offset < 0 or offset + len(chunk) > len(staged[0]):
+            raise ValueError("Chunk at {} of {} bytes is out of the value of {} bytes.".format(offset, len(chunk),
+                                                                                        len(staged[0])))
+        staged[0][offset:offset + len(chunk)] = chunk
+
+    def _purge_staged(self, now):
+        # expects lock to be held
+        expired = [transfer_id for transfer_id, (_, expires) in self._staged.items() if expires < now]
+        for transfer_id in expired:
+            del self._staged[transfer_id]
+        return len(expired)
+
+    def purge_staged(self):
+        """
+        Drops the uploads not committed within staged_value_ttl of their last chunk.
+        :return: Number of uploads dropped.
+        """
+        with self._lock:
+            return self._purge_staged(time.monotonic())
+
+    def take_staged(self, transfer_id):
+        """
+        :param transfer_id: Id of the transfer.
+        :return: Received value, None if unknown or expired.
+        """
+        with self._lock:
+            staged = self._staged.pop(transfer_id, None)
+        return staged[0] if staged else None
+
+    def get_stats(self):
+        """
+        :return: Number of values, bytes held by the values and by uploads not committed yet.
+        """
+        with self._lock:
+            return {"values": len(self._values), "value_bytes": self._bytes,
+                    "staged_bytes": sum(len(staged[0]) for staged in self._staged.values())}
@@ -1,5 +1,8 @@
 import os
 from messaging.rpc import XMLRPCChordServerManager
+from messaging.socket_messaging import ChordSocketServerThreadManager
+from messaging.async_rpc import AsyncChordServerManager
+from constants.messaging_constants import MessagingConstants
 from utilities.configuration import ConfigurationManager
 from constants.configuration_constants import ConfigurationConstants
 from utilities.consistent_hashing import Consistent_Hashing
@@ -22,12 +25,59 @@ def stabilize_call(chord_node) -> None:
     scheduler.enter(ConfigurationManager.get_configuration().get_stabilize_interval(), 1, stabilize_call, (chord_node,))
 
 
-def start_chord_node(chord_node):
-    XMLRPCChordServerManager.start_server(chord_node)
+def snapshot_call(chord_node) -> None:
+    try:
+        chord_node.save_snapshot()
+    except Exception as e:
+        logger.exception("Something went wrong with the snapshot.")
+    scheduler.enter(ConfigurationManager.get_configuration().get_snapshot_interval(), 2, snapshot_call, (chord_node,))
+
+
+def expiry_call(chord_node) -> None:
+    try:
+        chord_node.expire_keys()
+    except Exception as e:
+        logger.exception("Something went wrong expiring keys.")
+    scheduler.enter(ConfigurationManager.get_configuration().get_expiry_tick(), 3, expiry_call, (chord_node,))
+
+
+def start_chord_node(chord_node, virtual_nodes=()):
+    if ConfigurationManager.get_configuration().get_rpc_engine() == MessagingConstants.RPC_ENGINE_SOCKET:
+        ChordSocketServerThreadManager.start_server(chord_node, virtual_nodes)
+    elif ConfigurationManager.get_configuration().get_rpc_engine() == MessagingConstants.RPC_ENGINE_ASYNCIO:
+        AsyncChordServerManager.start_server(chord_node, virtual_nodes)
+    else:
+        XMLRPCChordServerManager.start_server(chord_node, virtual_nodes)
+
+
+def create_virtual_nodes(chord_node, server_ip, server_port, count):
+    """
+    Creates the virtual nodes 1 to count - 1 of this server, the chord node being virtual node 0. Every virtual
+    node gets the id hashed from its own connection string and joins through the chord node.
+    :return: Virtual nodes, without the ones whose id is taken by another node of this server.
+    """
+    from chord.node import Node
+    m_bits = ConfigurationManager.get_configuration().get_m_bits()
+    node_ids = {chord_node.get_node_id()}
+    virtual_nodes = []
+    for i in range(1, count):
+        node_id = Consistent_Hashing.get_modulo_hash("{}:{}/v{}".format(server_ip, server_port, i), m_bits)
+        if node_id in node_ids:
+            logger.warning("Id {} of virtual node {} is taken, skipping it.".format(node_id, i))
+            continue
+        node_ids.add(node_id)
+        virtual_nodes.append(Node(node_id=node_id, node_ip=server_ip,
+                                  bootstrap_node=chord_node.get_connection_string(), virtual_node=i))
+    return virtual_nodes
 
 
 def stop_chord_node():
-    XMLRPCChordServerManager.stop_server()
+    if ConfigurationManager.get_configuration().get_rpc_engine() == MessagingConstants.RPC_ENGINE_SOCKET:
+        ChordSocketServerThreadManager.stop_server()
+    elif ConfigurationManager.get_configuration().get_rpc_engine() == MessagingConstants.RPC_ENGINE_ASYNCIO:
+        AsyncChordServerManager.stop_server()
+    else:
+        XMLRPCChordServerManager.stop_server()
 
 
 def get_arguments():
@@ -85,10 +135,19 @@ if __name__ == "__main__":
     if not server_id:
         server_id = Consistent_Hashing.get_modulo_hash(server_ip + ":" + str(server_port), ConfigurationManager.get_configuration().get_m_bits())
     node = Node(node_id=server_id,node_ip=server_ip, bootstrap_node=bootstrap_server)
-
-    start_chord_node(node)
-    node.join()
-    scheduler.enter(ConfigurationManager.get_configuration().get_stabilize_interval(), 1, stabilize_call, (node,))
+    virtual_nodes = create_virtual_nodes(node, server_ip, server_port,
+                                         ConfigurationManager.get_configuration().get_virtual_nodes())
+
+    start_chord_node(node, virtual_nodes)
+    # every virtual node joins and maintains its fingers on its own, all of them sharing the scheduler thread
+    for chord_node in [node] + virtual_nodes:
+        if not chord_node.warm_restart():
+            chord_node.join()
+        scheduler.enter(ConfigurationManager.get_configuration().get_stabilize_interval(), 1, stabilize_call,
+                        (chord_node,))
+        if ConfigurationManager.get_configuration().get_snapshot_interval():
+            scheduler.enter(0, 2, snapshot_call, (chord_node,))
+        scheduler.enter(ConfigurationManager.get_configuration().get_expiry_tick(), 3, expiry_call, (chord_node,))
     stabilization_thread = threading.Thread(target=scheduler.run, args=(True,))
     stabilization_thread.start()
 
@@ -99,16 +158,19 @@ if __name__ == "__main__":
                               "3. \"pred\" Get predecessor\n4. \"succ\" Get successor\n5. \"ftable\" Finger Table\n"
                               "6. \"store\" Store\n7. \"ssize\" Store Size\n8. \"set\" Set a key\n"
                               "9. \"get\" Get a key location\n10. \"del\" Delete a key\n"
+                              "11. \"scan\" Keys of an id interval\n12. \"owners\" Ring share of every server\n"
                               "Enter your input:")
         if console_input.strip() == "stop":
-            while True:
-                try:
-                    scheduler.cancel(scheduler.queue[0])
-                    stabilization_thread.join()
-                    break
-                except:
-                    continue
-            node.leave()
+            # events of every virtual node are queued, running ones enter their next run until cancelled again
+            while stabilization_thread.is_alive():
+                for event in scheduler.queue:
+                    try:
+                        scheduler.cancel(event)
+                    except ValueError:
+                        continue
+                stabilization_thread.join(0.1)
+            for chord_node in virtual_nodes + [node]:
+                chord_node.leave()
             stop_chord_node()
             break
 
@@ -163,3 +225,17 @@ if __name__ == "__main__":
                     print("Key deleted on : {}.".format(node.delete(value, hash_it=False)))
                 except ValueError:
                     print("Key deleted on : {}.".format(node.delete(del_input.strip())))
+
+        if console_input.strip() == "scan":
+            scan_input = input("\nEnter first and last id of the interval:")
+            try:
+                start_id, end_id = [int(value) for value in scan_input.split()]
+                for key in node.scan(start_id, end_id):
+                    print(key)
+            except ValueError:
+                print("Invalid interval provided, expected two ids.")
+
+        if console_input.strip() == "owners":
+            report = node.get_ownership_report()
+            for server in sorted(report, key=lambda server: -report[server][1]):
+                print("{:<24} {:>4} nodes {:>8.2%} of the ring".format(server, *report[server]))
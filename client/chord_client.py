@@ -1,4 +1,6 @@
 import xmlrpc.client
+from constants.messaging_constants import MessagingConstants
+from messaging.socket_messaging import ChordSocketClient, split_connection_string
 
 
 class ChordClient(object):
@@ -8,15 +10,26 @@ class ChordClient(object):
     This class provides basic methods a client can perform on a chord network (get/set/delete).
     """
 
-    def __init__(self, bootstrap_server):
+    def __init__(self, bootstrap_server, rpc_engine=MessagingConstants.RPC_ENGINE_XMLRPC, lookup_mode=None):
         """
         Author: Adarsh Trivedi
-        :param bootstrap_server: Server used to connect to the p2p network.
+        :param bootstrap_server: Server used to connect to the p2p network, ip:port or ip:port/v<index> for a
+                                 virtual node of the server.
+        :param rpc_engine: Engine the bootstrap server is served with, "xmlrpc", "socket" or "asyncio".
+                           The asyncio engine speaks the binary protocol of the socket engine.
+        :param lookup_mode: "iterative" or "recursive" lookups for the requests of this client. None uses
+                            the lookup_mode configured on the bootstrap server.
         """
         self._bootstrap_server = bootstrap_server
+        self._lookup_mode = lookup_mode
 
         try:
-            self._xml_rpc_client = xmlrpc.client.ServerProxy("http://" + bootstrap_server + "/RPC2")
+            host, port, path = split_connection_string(bootstrap_server)
+            if rpc_engine == MessagingConstants.RPC_ENGINE_XMLRPC:
+                self._xml_rpc_client = xmlrpc.client.ServerProxy("http://" + host + ":" + port + path,
+                                                                 allow_none=True, use_builtin_types=True)
+            else:
+                self._xml_rpc_client = ChordSocketClient(host, port, path)
         except Exception as e:
             print("Are you sure you are providing correct ip:port?")
             exit(1)
@@ -24,14 +37,23 @@ class ChordClient(object):
     def _get_xml_rpc_client(self):
         return self._xml_rpc_client
 
-    def set(self, key, hash_it=True):
+    def _get_arguments(self, key, hash_it):
+        if self._lookup_mode:
+            return key, hash_it, self._lookup_mode
+        return key, hash_it
+
+    def set(self, key, hash_it=True, value=None, ttl=None):
         """
         Author: Adarsh Trivedi
         :param key: Key to be stored on network.
         :param hash_it: Whether to perform hashing on key or not.
+        :param value: Value stored with the key, bytes or str. At most max_value_size bytes.
+        :param ttl: Seconds after which the key and its value expire, None if they don't expire.
         :return: Node on which key was store.
         """
-        return self._get_xml_rpc_client().set(key, hash_it)
+        if value is None and ttl is None:
+            return self._get_xml_rpc_client().set(*self._get_arguments(key, hash_it))
+        return self._get_xml_rpc_client().set(key, hash_it, self._lookup_mode, value, ttl)
 
     def delete(self, key, hash_it=True):
         """
@@ -40,7 +62,16 @@ class ChordClient(object):
         :param hash_it: Whether to perform hashing on key or not.
         :return: Node from which key was deleted.
         """
-        return self._get_xml_rpc_client().delete(key, hash_it)
+        return self._get_xml_rpc_client().delete(*self._get_arguments(key, hash_it))
+
+    def get_value(self, key, hash_it=True):
+        """
+        :param key: Key whose value is retrieved from the network.
+        :param hash_it: Whether to perform hashing on key or not.
+        :return: Value of the key as bytes, None if the key has no value.
+        """
+        value = self._get_xml_rpc_client().get_value(*self._get_arguments(key, hash_it))
+        return bytes(value) if value is not None else None
 
     def get(self, key, hash_it=True):
         """
@@ -49,4 +80,53 @@ class ChordClient(object):
         :param hash_it: Whether to perform hashing on key or not.
         :return: Node from which key was retrieved.
         """
-        return self._get_xml_rpc_client().get(key, hash_it)
+        return self._get_xml_rpc_client().get(*self._get_arguments(key, hash_it))
+
+    def multi_set(self, keys, hash_it=True, values=None, ttl=None):
+        """
+        :param keys: Keys to be stored on network, sent in batches to the node responsible for them.
+        :param hash_it: Whether to perform hashing on keys or not.
+        :param values: Values stored with the keys in the same order, bytes or str. None stores no values.
+        :param ttl: As in set, for all the keys.
+        :return: For every key, node on which it was stored, None if it couldn't be stored.
+        """
+        if values is None and ttl is None:
+            return self._get_xml_rpc_client().multi_set(*self._get_arguments(list(keys), hash_it))
+        return self._get_xml_rpc_client().multi_set(list(keys), hash_it, self._lookup_mode,
+                                                    list(values) if values is not None else None, ttl)
+
+    def multi_get(self, keys, hash_it=True):
+        """
+        :param keys: Keys to be retrieved from the network.
+        :param hash_it: Whether to perform hashing on keys or not.
+        :return: For every key, node from which it was retrieved, None if it isn't stored.
+        """
+        return self._get_xml_rpc_client().multi_get(*self._get_arguments(list(keys), hash_it))
+
+    def multi_delete(self, keys, hash_it=True):
+        """
+        :param keys: Keys to be deleted from network.
+        :param hash_it: Whether to perform hashing on keys or not.
+        :return: For every key, node from which it was deleted, None if it wasn't stored.
+        """
+        return self._get_xml_rpc_client().multi_delete(*self._get_arguments(list(keys), hash_it))
+
+    def scan(self, start_id, end_id, page_size=None):
+        """
+        :param start_id: First id of the ring interval to be scanned.
+        :param end_id: Last id of the interval, the interval wraps past zero when it is lower than start_id.
+        :param page_size: Most keys fetched in one request, defaults to and is bounded by the scan_page_size of
+                          the bootstrap server.
+        :return: Generator of the keys stored in the interval in ring order, fetched page by page.
+        """
+        cursor = start_id
+        while cursor is not None:
+            keys, cursor = self._get_xml_rpc_client().scan_page(cursor, end_id, page_size, self._lookup_mode)
+            yield from keys
+
+    def get_ownership_report(self):
+        """
+        :return: Dictionary of server ip:port -> [number of nodes, fraction of the ring owned], over all the
+                 virtual nodes of every server.
+        """
+        return self._get_xml_rpc_client().get_ownership_report()
@@ -0,0 +1,19 @@
+class ChordConstants(object):
+
+    """
+    This class holds the constants used by the chord protocol implementation.
+    """
+
+    # how many times a lookup hop is retried on a failing node before the lookup fails
+    LOOKUP_HOP_RETRIES = 3
+    # hops after which a lookup going in circles (routing state in flux) fails
+    LOOKUP_MAX_HOPS = 256
+
+    # values of the "lookup_mode" configuration property
+    LOOKUP_MODE_ITERATIVE = "iterative"
+    LOOKUP_MODE_RECURSIVE = "recursive"
+
+    # values of the "store_backend" configuration property
+    STORE_BACKEND_DICT = "dict"
+    STORE_BACKEND_COMPACT = "compact"
+    STORE_BACKEND_LOG = "log"
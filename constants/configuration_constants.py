@@ -12,6 +12,41 @@ class ConfigurationConstants(object):
     CHORD_SOCKET_PORT = "socket_port"
     CHORD_M_BITS = "m_bits"
     CHORD_STABILIZE_INTERVAL = "stabilize_interval"
+    CHORD_RPC_ENGINE = "rpc_engine"
+    CHORD_ASYNC_EXECUTOR_WORKERS = "async_executor_workers"
+    CHORD_SERVER_WORKER_COUNT = "server_worker_count"
+    CHORD_SERVER_QUEUE_SIZE = "server_queue_size"
+    CHORD_LOOKUP_MODE = "lookup_mode"
+    CHORD_LOOKUP_HOP_TIMEOUT = "lookup_hop_timeout"
+    CHORD_LOOKUP_TIMEOUT = "lookup_timeout"
+    CHORD_LOOKUP_PARALLELISM = "lookup_parallelism"
+    CHORD_LOOKUP_HEDGE_DELAY = "lookup_hedge_delay"
+    CHORD_LOOKUP_TRACING = "lookup_tracing"
+    CHORD_LOOKUP_TRACE_WINDOW = "lookup_trace_window"
+    CHORD_LOOKUP_TRACE_HISTORY = "lookup_trace_history"
+    CHORD_STORE_BACKEND = "store_backend"
+    CHORD_STORE_SHARDS = "store_shards"
+    CHORD_STORE_DIRECTORY = "store_directory"
+    CHORD_STORE_SEGMENT_SIZE = "store_segment_size"
+    CHORD_STORE_SYNC = "store_sync"
+    CHORD_STORE_COMPACTION_INTERVAL = "store_compaction_interval"
+    CHORD_SNAPSHOT_INTERVAL = "snapshot_interval"
+    CHORD_SNAPSHOT_MAX_AGE = "snapshot_max_age"
+    CHORD_MAX_VALUE_SIZE = "max_value_size"
+    CHORD_VALUE_CHUNK_SIZE = "value_chunk_size"
+    CHORD_SCAN_PAGE_SIZE = "scan_page_size"
+    CHORD_EXPIRY_TICK = "expiry_tick"
+    CHORD_VIRTUAL_NODES = "virtual_nodes"
+    CHORD_LOCATION_CACHE_SIZE = "location_cache_size"
+    CHORD_LOCATION_CACHE_TTL = "location_cache_ttl"
+    CHORD_PROXIMITY_ROUTING = "proximity_routing"
+    CHORD_PROXIMITY_CANDIDATES = "proximity_candidates"
+
+    # Connection pool
+    CONNECTION_POOL_SIZE = "connection_pool_size"
+    CONNECTION_POOL_SIZE_PER_PEER = "connection_pool_size_per_peer"
+    CONNECTION_IDLE_TIMEOUT = "connection_idle_timeout"
+    PEER_CALL_TIMEOUT = "peer_call_timeout"
 
     # Logging
     LOG_FILE = "log_file"
@@ -3,3 +3,20 @@ class MessagingConstants:
     # these constant should be overridden by parameters passed in configuration
     SERVER_HOST = "10.153.27.37"
     SERVER_PORT = 4001
+
+    # values of the "rpc_engine" configuration property
+    RPC_ENGINE_XMLRPC = "xmlrpc"
+    RPC_ENGINE_SOCKET = "socket"
+    RPC_ENGINE_ASYNCIO = "asyncio"
+
+    # fault returned by a node whose request queue is full, callers should fail over
+    OVERLOADED_FAULT_CODE = -32001
+    OVERLOADED_FAULT_STRING = "overloaded"
+
+    # fault returned by a node asked to verify its ownership of a key it isn't responsible for
+    WRONG_OWNER_FAULT_CODE = -32002
+    WRONG_OWNER_FAULT_STRING = "wrong owner"
+
+    # fault returned for values larger than the max_value_size of the node
+    VALUE_TOO_LARGE_FAULT_CODE = -32003
+    VALUE_TOO_LARGE_FAULT_STRING = "value too large"
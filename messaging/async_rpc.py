@@ -0,0 +1,437 @@
+"""
+This module holds an asyncio based engine for node communication, selected with "rpc_engine": "asyncio".
+It speaks the binary framing of messaging.socket_messaging, so synchronous ChordSocketClient's (stabilization,
+join, ChordClient) talk to it unchanged.
+
+The XML RPC and the threaded binary servers spend one OS thread per request and lookups keep those threads
+blocked on nested RPCs. Here a single event loop serves all the connections, requests on a connection are
+multiplexed by request id and the routing methods (find_predecessor, find_successor, set, get, delete) are
+coroutines whose remote calls are awaited instead of blocking a thread. Remaining node methods which may
+block (they perform synchronous RPCs, like replication in set_key) run on a bounded thread pool.
+"""
+
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+import xmlrpc.client
+from constants.chord_constants import ChordConstants
+from constants.messaging_constants import MessagingConstants
+from messaging.socket_messaging import BinaryCodec, FRAME_HEADER, DEFAULT_PATH, split_connection_string
+from utilities.configuration import ConfigurationManager
+from utilities import consistent_hashing
+
+
+__all__ = ["AsyncChordServerManager", "AsyncChordServer", "AsyncChordClient", "AsyncNodeRouter"]
+
+
+# methods which only read local state of the node, served directly on the event loop
+INLINE_METHODS = frozenset(["get_node_id", "get_connection_string", "get_successor", "get_predecessor",
+                            "get_successor_list", "closest_preceding_finger", "get_finger_table", "lookup_step",
+                            "forward_lookup", "deliver_lookup_result"])
+
+# methods served by AsyncNodeRouter coroutines instead of the node itself
+ROUTED_METHODS = frozenset(["find_predecessor", "find_successor", "set", "get", "delete"])
+
+
+class AsyncChordMethod(object):
+
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def __call__(self, *args):
+        return self._client.call(self._name, args)
+
+
+class AsyncChordClient(object):
+
+    """
+    Asyncio client of the binary engine. One connection is shared by any number of concurrent calls,
+    responses are matched to the waiting calls by request id. Remote methods are exposed as attributes
+    returning awaitables, e.g. await client.get_successor().
+    """
+
+    def __init__(self, host, port, path=DEFAULT_PATH):
+        self._host = host
+        self._port = int(port)
+        self._path = path
+        self._reader = None
+        self._writer = None
+        self._request_id = 0
+        self._pending = {}
+        self._connecting = None
+        self._reader_task = None
+
+    async def _connect(self):
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(asyncio.open_connection(self._host, self._port))
+        try:
+            reader, writer = await self._connecting
+        finally:
+            self._connecting = None
+        if self._writer is None:
+            self._reader, self._writer = reader, writer
+            self._reader_task = asyncio.ensure_future(self._read_responses(reader, writer))
+        elif self._writer is not writer:
+            writer.close()
+
+    async def _read_responses(self, reader, writer):
+        error = ConnectionResetError("Connection closed by {}:{}.".format(self._host, self._port))
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                body = await reader.readexactly(FRAME_HEADER.unpack(header)[0])
+                request_id, result, fault = BinaryCodec.split_response(body)
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if fault:
+                    future.set_exception(fault)
+                else:
+                    future.set_result(result)
+        except (asyncio.IncompleteReadError, OSError) as e:
+            if isinstance(e, OSError):
+                error = e
+        finally:
+            self._fail_pending(writer, error)
+
+    def _fail_pending(self, writer, error):
+        if self._writer is writer:
+            self._reader, self._writer = None, None
+            writer.close()
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def call(self, method, params):
+        """
+        :param method: Remote method name.
+        :param params: Arguments of the remote method.
+        :return: Result of the remote call. Raises xmlrpc.client.Fault for remote errors.
+        """
+        if self._writer is None:
+            await self._connect()
+        self._request_id += 1
+        request_id = self._request_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        writer = self._writer
+        try:
+            writer.write(BinaryCodec.encode_request(request_id, self._path, method, params))
+            # callers wait while the peer doesn't keep up reading the requests
+            await writer.drain()
+        except OSError as e:
+            self._fail_pending(writer, e)
+        try:
+            return await future
+        finally:
+            # a call timed out or cancelled by the caller gives up its own request only, the connection
+            # and the other calls on it carry on
+            self._pending.pop(request_id, None)
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+        self._reader, self._writer = None, None
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return AsyncChordMethod(self, name)
+
+
+class AsyncLocalNode(object):
+
+    """
+    Awaitable view of the local node, so routing treats the local node like any remote node
+    without going through the network.
+    """
+
+    def __init__(self, router):
+        self._router = router
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        async def method(*args):
+            return await self._router.call_local(name, args)
+        return method
+
+
+class AsyncNodeRouter(object):
+
+    """
+    Coroutine versions of the routing methods of chord.node.Node. Every remote call is awaited on the
+    event loop, so a node can have tens of thousands of lookups in flight with a handful of threads.
+    """
+
+    def __init__(self, chord_node, executor):
+        """
+        :param chord_node: Local Node instance.
+        :param executor: Thread pool used for node methods which may block.
+        """
+        self._node = chord_node
+        self._executor = executor
+        self._local = AsyncLocalNode(self)
+        self._clients = {}
+        config = ConfigurationManager.get_configuration()
+        self._m_bits = config.get_m_bits()
+        self._lookup_mode = config.get_lookup_mode()
+        self._lookup_hop_timeout = config.get_lookup_hop_timeout()
+        self._peer_call_timeout = config.get_peer_call_timeout()
+
+    @property
+    def node(self):
+        return self._node
+
+    def get_client(self, node):
+        """
+        :param node: (node_id, connection_string)
+        :return: Awaitable client for the node. Local node is served in process.
+        """
+        if node[1] == self._node.get_connection_string():
+            return self._local
+        client = self._clients.get(node[1])
+        if client is None:
+            client = self._clients[node[1]] = AsyncChordClient(*split_connection_string(node[1]))
+        return client
+
+    def _drop_client(self, node):
+        # a broken connection isn't reused, the next call connects again
+        client = self._clients.pop(node[1], None)
+        if client is not None:
+            client.close()
+
+    async def call_local(self, method, params):
+        function = getattr(self._node, method)
+        if method in INLINE_METHODS:
+            return function(*params)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, lambda: function(*params))
+
+    async def find_successor(self, identifier):
+        """
+        :param identifier: id whose successor to be found.
+        :return: Successor
+        """
+        return (await self._lookup(identifier))[1]
+
+    async def find_predecessor(self, identifier):
+        """
+        :param identifier: Id whose predecessor to be found.
+        :return: Predecessor
+        """
+        return (await self._lookup(identifier))[0]
+
+    async def _lookup(self, identifier):
+        """
+        Same as Node._lookup, one awaited lookup_step per hop.
+        :param identifier: Id to be looked up.
+        :return: (predecessor, successor) of the identifier.
+        """
+        local = self._node.get_connection_string()
+        next_hop = (self._node.get_node_id(), local)
+        trace = self._node.tracer.start(identifier)
+        arguments = (identifier, 0, trace.trace_id) if trace else (identifier,)
+        successor = None
+
+        for _ in range(ChordConstants.LOOKUP_MAX_HOPS):
+            # same retries and fallback to the previous hop's successor as Node._iterative_lookup
+            retries = 0
+            failures = 0
+            while True:
+                hop = next_hop
+                try:
+                    started = time.perf_counter()
+                    node, successor, following = await asyncio.wait_for(
+                        self.get_client(hop).lookup_step(*arguments), self._lookup_hop_timeout)
+                    if trace and hop[1] != local:
+                        trace.add_hop(hop, time.perf_counter() - started, failures)
+                    node, successor, next_hop = tuple(node), tuple(successor), tuple(following)
+                    break
+                except Exception as e:
+                    failures += 1
+                    # a slow hop only gives up its own request, other calls share the connection to the peer
+                    if isinstance(e, OSError) and not isinstance(e, asyncio.TimeoutError):
+                        self._drop_client(hop)
+                    self._node.location_cache.invalidate_node(hop)
+                    if successor and successor[1] != hop[1]:
+                        next_hop = successor
+                        continue
+                    retries += 1
+                    if retries > ChordConstants.LOOKUP_HOP_RETRIES:
+                        raise
+            if self._node.in_bracket(identifier, [node[0], successor[0]], type='r'):
+                if trace:
+                    self._node.tracer.finish(trace)
+                return node, successor
+            if next_hop[0] == node[0]:
+                next_hop = self._node._no_progress_hop(identifier, node, successor)
+        raise Exception("Lookup of {} gave up after {} hops.".format(identifier, ChordConstants.LOOKUP_MAX_HOPS))
+
+    async def _call_owner(self, owner, operation, *args):
+        return await asyncio.wait_for(getattr(self.get_client(owner), operation)(*args), self._peer_call_timeout)
+
+    async def _route(self, key, hash_it, lookup_mode, operation):
+        if (lookup_mode or self._lookup_mode) == ChordConstants.LOOKUP_MODE_RECURSIVE:
+            # recursive lookups wait for the owner's reply, which happens on a thread of the executor
+            return await self.call_local(operation.replace("_key", ""), (key, hash_it, lookup_mode))
+        if hash_it:
+            key = consistent_hashing.Consistent_Hashing.get_modulo_hash(key, self._m_bits)
+
+        # same location cache handling as Node._route
+        cache = self._node.location_cache
+        owner = cache.get(key)
+        if not owner:
+            successor_list_owner = self._node._successor_list_owner(key)
+            owner = successor_list_owner[1] if successor_list_owner else None
+        if owner:
+            try:
+                return await self._call_owner(owner, operation, key, True)
+            except xmlrpc.client.Fault as fault:
+                if fault.faultCode != MessagingConstants.WRONG_OWNER_FAULT_CODE:
+                    raise
+                cache.report_wrong_owner(owner)
+            except (OSError, asyncio.TimeoutError):
+                # stalled owners are treated as unreachable ones
+                cache.invalidate_node(owner)
+
+        predecessor, owner = await self._lookup(key)
+        cache.put(predecessor[0], owner)
+        return await self._call_owner(owner, operation, key)
+
+    async def set(self, key, hash_it=True, lookup_mode=None, value=None, ttl=None):
+        if value is not None or ttl is not None:
+            # values may be uploaded in chunks, which the node does on a thread of the executor
+            return await self.call_local("set", (key, hash_it, lookup_mode, value, ttl))
+        return await self._route(key, hash_it, lookup_mode, "set_key")
+
+    async def get(self, key, hash_it=True, lookup_mode=None):
+        return await self._route(key, hash_it, lookup_mode, "get_key")
+
+    async def delete(self, key, hash_it=True, lookup_mode=None):
+        return await self._route(key, hash_it, lookup_mode, "delete_key")
+
+
+class AsyncChordServer(object):
+
+    """
+    Event loop server of the node. Every request frame is handled by its own task, so slow requests
+    on a connection don't hold back the following ones. Virtual nodes hosted by the server get a router
+    of their own, selected by the request path, and share the event loop and the thread pool.
+    """
+
+    def __init__(self, chord_node, executor_workers=32):
+        self._node = chord_node
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=executor_workers)
+        self.router = AsyncNodeRouter(chord_node, self._executor)
+        self.routers = {DEFAULT_PATH: self.router}
+        self._server = None
+        self._tasks = set()
+
+    def register_virtual_node(self, path, chord_node):
+        """
+        :param path: Dispatcher path of the virtual node, see messaging.socket_messaging.split_connection_string.
+        :param chord_node: Node instance served on the path.
+        :return: None
+        """
+        self.routers[path] = AsyncNodeRouter(chord_node, self._executor)
+
+    async def start(self, ip, port):
+        self._server = await asyncio.start_server(self._serve_connection, ip or None, port, reuse_address=True)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                body = await reader.readexactly(FRAME_HEADER.unpack(header)[0])
+                task = asyncio.ensure_future(self._respond(body, writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, body, writer):
+        request_id = 0
+        try:
+            request_id, path, method, params = BinaryCodec.decode_request(body)
+            response = BinaryCodec.encode_result(request_id, await self._dispatch(path, method, params))
+        except xmlrpc.client.Fault as fault:
+            response = BinaryCodec.encode_fault(request_id, fault.faultCode, fault.faultString)
+        except Exception as e:
+            response = BinaryCodec.encode_fault(request_id, 1, "{}:{}".format(type(e), e))
+        if not writer.is_closing():
+            writer.write(response)
+            try:
+                # slow readers hold back their responses instead of growing the write buffer
+                await writer.drain()
+            except OSError:
+                pass
+
+    async def _dispatch(self, path, method, params):
+        router = self.routers.get(path)
+        if router is None or method.startswith("_"):
+            raise Exception('method "{}" is not supported'.format(method))
+        if method in ROUTED_METHODS:
+            return await getattr(router, method)(*params)
+        if not callable(getattr(router.node, method, None)):
+            raise Exception('method "{}" is not supported'.format(method))
+        return await router.call_local(method, params)
+
+
+class AsyncChordServerManager(object):
+
+    server = None
+    server_thread = None
+    loop = None
+
+    @staticmethod
+    def start_server(chord_node, virtual_nodes=()):
+
+        """
+        Starts the event loop on a daemon thread and serves the chord node on the configured port.
+        :param chord_node: Node instance to be served.
+        :param virtual_nodes: Further Node instances of this server, served on the path of their connection string.
+        :return: None
+        """
+
+        config = ConfigurationManager.get_configuration()
+
+        if not AsyncChordServerManager.server:
+            AsyncChordServerManager.loop = asyncio.new_event_loop()
+            AsyncChordServerManager.server = AsyncChordServer(chord_node, config.get_async_executor_workers())
+            for virtual_node in virtual_nodes:
+                AsyncChordServerManager.server.register_virtual_node(
+                    split_connection_string(virtual_node.get_connection_string())[2], virtual_node)
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(AsyncChordServerManager.loop)
+                AsyncChordServerManager.loop.run_until_complete(
+                    AsyncChordServerManager.server.start(config.get_advertised_ip(), config.get_socket_port()))
+                started.set()
+                AsyncChordServerManager.loop.run_forever()
+
+            AsyncChordServerManager.server_thread = threading.Thread(target=run)
+            AsyncChordServerManager.server_thread.daemon = True
+            AsyncChordServerManager.server_thread.start()
+            started.wait()
+
+    @staticmethod
+    def stop_server():
+
+        if AsyncChordServerManager.server and AsyncChordServerManager.server_thread:
+            asyncio.run_coroutine_threadsafe(AsyncChordServerManager.server.stop(),
+                                             AsyncChordServerManager.loop).result()
+            AsyncChordServerManager.loop.call_soon_threadsafe(AsyncChordServerManager.loop.stop)
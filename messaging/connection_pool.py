@@ -0,0 +1,344 @@
+"""
+This module holds a node wide pool of keep-alive XML RPC connections to other chord nodes.
+Every hop of a lookup used to create a brand new ServerProxy, paying a TCP handshake and
+HTTP setup per call. The pool keeps a few idle connections per peer ("ip:port") and hands
+them out to the calling threads. Idle connections are evicted after a timeout and the total
+number of idle connections is bounded.
+
+The pool also measures the round trip time of the calls and keeps a smoothed (EWMA) RTT
+per peer, used for proximity aware routing.
+"""
+
+
+import collections
+import http.client
+import socket
+import threading
+import time
+import xmlrpc.client
+from constants.messaging_constants import MessagingConstants
+from messaging.socket_messaging import ChordSocketClient, split_connection_string
+from utilities.configuration import ConfigurationManager
+
+
+__all__ = ["ConnectionPool", "ConnectionPoolManager", "PooledClient"]
+
+
+class TimeoutTransport(xmlrpc.client.Transport):
+
+    """
+    Transport whose keep-alive connection follows a timeout which can be changed between requests.
+    """
+
+    timeout = None
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        if connection.sock:
+            connection.sock.settimeout(self.timeout)
+        return connection
+
+
+class PooledConnection(object):
+
+    """
+    One keep-alive connection to a peer. xmlrpc.client.Transport already keeps its HTTP/1.1
+    connection open between requests, so a ServerProxy per connection is all we need for the
+    XML RPC engine. The binary engine client is persistent by itself.
+    """
+
+    def __init__(self, connection_string, rpc_engine=MessagingConstants.RPC_ENGINE_XMLRPC):
+        self.connection_string = connection_string
+        self.rpc_engine = rpc_engine
+        host, port, path = split_connection_string(connection_string)
+        if rpc_engine == MessagingConstants.RPC_ENGINE_XMLRPC:
+            self.proxy = xmlrpc.client.ServerProxy("http://" + host + ":" + port + path,
+                                                   transport=TimeoutTransport(), allow_none=True)
+        else:
+            self.proxy = ChordSocketClient(host, port, path)
+        self.timeout = None
+        self.last_used = time.monotonic()
+
+    def set_timeout(self, timeout):
+        """
+        :param timeout: Socket timeout in seconds for the following calls, None blocks.
+        :return: None
+        """
+        if timeout == self.timeout:
+            return
+        self.timeout = timeout
+        if self.rpc_engine == MessagingConstants.RPC_ENGINE_XMLRPC:
+            self.proxy("transport").timeout = timeout
+        else:
+            self.proxy.settimeout(timeout)
+
+    def close(self):
+        try:
+            if self.rpc_engine == MessagingConstants.RPC_ENGINE_XMLRPC:
+                self.proxy("close")()
+            else:
+                self.proxy.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool(object):
+
+    """
+    Thread safe pool of keep-alive connections keyed by the peer's connection string.
+    A connection is checked out by exactly one thread for the duration of a call and is
+    returned to the pool afterwards. Connections failing with transport errors are dropped
+    and the call is retried once on a fresh connection when the failed one was a reused one.
+    Calls running into their timeout are not retried, the caller decides what to do next.
+    """
+
+    # weight of a new sample in the smoothed RTT, same as TCP's SRTT
+    rtt_smoothing = 0.125
+
+    def __init__(self, max_size=64, max_size_per_peer=4, idle_timeout=30,
+                 rpc_engine=MessagingConstants.RPC_ENGINE_XMLRPC, call_timeout=None):
+        """
+        :param max_size: Maximum number of idle connections held across all peers.
+        :param max_size_per_peer: Maximum number of idle connections held for a single peer.
+        :param idle_timeout: Seconds after which an idle connection is closed.
+        :param rpc_engine: Engine the peers are served with (MessagingConstants.RPC_ENGINE_*).
+        :param call_timeout: Seconds after which the calls of clients created without a timeout fail, None blocks.
+        """
+        self._rpc_engine = rpc_engine
+        self._call_timeout = call_timeout
+        self._max_size = max_size
+        self._max_size_per_peer = max_size_per_peer
+        self._idle_timeout = idle_timeout
+        self._idle = {}
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+        self._rtt = {}
+
+    def get_client(self, connection_string, timeout=None):
+        """
+        :param connection_string: Peer in form ip:port.
+        :param timeout: Seconds after which a call of the client fails with socket.timeout, None for the
+                        call_timeout of the pool.
+        :return: A ServerProxy like object whose method calls go through this pool.
+        """
+        return PooledClient(self, connection_string, self._call_timeout if timeout is None else timeout)
+
+    def acquire(self, connection_string):
+        """
+        Checks out an idle connection for the peer or creates a new one.
+        :param connection_string: Peer in form ip:port.
+        :return: (PooledConnection, bool reused)
+        """
+        now = time.monotonic()
+        expired = []
+        connection = None
+        with self._lock:
+            idle = self._idle.get(connection_string)
+            while idle:
+                candidate = idle.pop()
+                self._idle_count -= 1
+                if now - candidate.last_used > self._idle_timeout:
+                    expired.append(candidate)
+                    continue
+                connection = candidate
+                break
+            if idle is not None and not idle:
+                del self._idle[connection_string]
+            self._stats["evictions"] += len(expired)
+            if connection:
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        for candidate in expired:
+            candidate.close()
+
+        if connection:
+            return connection, True
+        return PooledConnection(connection_string, self._rpc_engine), False
+
+    def release(self, connection):
+        """
+        Returns a healthy connection to the pool. Closes it instead if the pool is full.
+        :param connection: PooledConnection checked out with acquire.
+        :return: None
+        """
+        connection.last_used = time.monotonic()
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(connection.connection_string, collections.deque())
+            if len(idle) >= self._max_size_per_peer:
+                evicted.append(connection)
+            else:
+                idle.append(connection)
+                self._idle_count += 1
+                while self._idle_count > self._max_size:
+                    evicted.append(self._pop_oldest())
+            self._stats["evictions"] += len(evicted)
+
+        for candidate in evicted:
+            candidate.close()
+
+    def discard(self, connection):
+        """
+        Closes a connection which failed and should not be reused.
+        :param connection: PooledConnection checked out with acquire.
+        :return: None
+        """
+        with self._lock:
+            self._stats["discarded"] += 1
+        connection.close()
+
+    def call(self, connection_string, method, args, timeout=None):
+        """
+        Performs an RPC on the peer through a pooled connection.
+        :param connection_string: Peer in form ip:port.
+        :param method: Remote method name.
+        :param args: Positional arguments of the remote method.
+        :param timeout: Seconds after which the call fails with socket.timeout, None blocks.
+        :return: Result of the remote call.
+        """
+        while True:
+            connection, reused = self.acquire(connection_string)
+            try:
+                connection.set_timeout(timeout)
+                started = time.monotonic()
+                result = getattr(connection.proxy, method)(*args)
+                self._record_rtt(connection_string, time.monotonic() - started)
+            except xmlrpc.client.Fault:
+                # fault is an application error, connection itself is healthy
+                self.release(connection)
+                raise
+            except socket.timeout:
+                # response might still arrive on this connection, it can't be reused
+                self.discard(connection)
+                raise
+            except (OSError, http.client.HTTPException, xmlrpc.client.ProtocolError):
+                self.discard(connection)
+                if reused:
+                    # server might have closed the idle connection, reconnect once
+                    with self._lock:
+                        self._stats["reconnects"] += 1
+                    continue
+                raise
+            self.release(connection)
+            return result
+
+    def _record_rtt(self, connection_string, rtt):
+        with self._lock:
+            smoothed = self._rtt.get(connection_string)
+            if smoothed is None:
+                self._rtt[connection_string] = rtt
+            else:
+                self._rtt[connection_string] = smoothed + self.rtt_smoothing * (rtt - smoothed)
+
+    def get_rtt(self, connection_string):
+        """
+        :param connection_string: Peer in form ip:port.
+        :return: Smoothed round trip time of the calls to the peer in seconds, None if never called.
+        """
+        return self._rtt.get(connection_string)
+
+    def get_rtts(self):
+        """
+        :return: Smoothed round trip times in seconds of all the peers called so far, keyed by ip:port.
+        """
+        with self._lock:
+            return dict(self._rtt)
+
+    def close(self):
+        """
+        Closes all the idle connections of the pool.
+        :return: None
+        """
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle = {}
+            self._idle_count = 0
+        for connection in connections:
+            connection.close()
+
+    def get_stats(self):
+        """
+        :return: Pool counters as dictionary (hits, misses, reconnects, evictions, discarded, idle).
+        """
+        with self._lock:
+            stats = {name: self._stats[name] for name in ("hits", "misses", "reconnects", "evictions", "discarded")}
+            stats["idle"] = self._idle_count
+            stats["peers"] = len(self._idle)
+        return stats
+
+    def _pop_oldest(self):
+        # expects lock to be held
+        oldest_key = min(self._idle, key=lambda key: self._idle[key][0].last_used)
+        idle = self._idle[oldest_key]
+        connection = idle.popleft()
+        if not idle:
+            del self._idle[oldest_key]
+        self._idle_count -= 1
+        return connection
+
+
+class PooledMethod(object):
+
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def __call__(self, *args):
+        return self._client.pool.call(self._client.connection_string, self._name, args, self._client.timeout)
+
+
+class PooledClient(object):
+
+    """
+    Drop in replacement of xmlrpc.client.ServerProxy for node to node calls. Attribute access
+    gives a callable remote method, the connection is only held while the call is in progress.
+    """
+
+    def __init__(self, pool, connection_string, timeout=None):
+        self.pool = pool
+        self.connection_string = connection_string
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return PooledMethod(self, name)
+
+    def __repr__(self):
+        return "<PooledClient for {}>".format(self.connection_string)
+
+
+class ConnectionPoolManager(object):
+
+    """
+    Makes sure a single connection pool is shared by everything running in this process.
+    """
+
+    pool = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_connection_pool():
+
+        if not ConnectionPoolManager.pool:
+            with ConnectionPoolManager._lock:
+                if not ConnectionPoolManager.pool:
+                    config = ConfigurationManager.get_configuration()
+                    ConnectionPoolManager.pool = ConnectionPool(max_size=config.get_connection_pool_size(),
+                                                                max_size_per_peer=config.get_connection_pool_size_per_peer(),
+                                                                idle_timeout=config.get_connection_idle_timeout(),
+                                                                rpc_engine=config.get_rpc_engine(),
+                                                                call_timeout=config.get_peer_call_timeout())
+
+        return ConnectionPoolManager.pool
+
+    @staticmethod
+    def reset_connection_pool():
+        with ConnectionPoolManager._lock:
+            if ConnectionPoolManager.pool:
+                ConnectionPoolManager.pool.close()
+            ConnectionPoolManager.pool = None
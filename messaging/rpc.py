@@ -2,13 +2,17 @@
 Author: Adarsh Trivedi
 This module holds code to spawn XML RPC servers for node communication. The code is basic boiler plate
 code with few understandable tweaks to fit our use case.
-A threaded XML RPC server is created on start and the thread is closed at stop request.
+An XML RPC server served by a bounded worker pool (messaging.worker_pool) is created on start and
+is closed at stop request.
 """
 
 
 from xmlrpc import server
 import threading
-import socketserver
+import xmlrpc.client
+from constants.messaging_constants import MessagingConstants
+from messaging.socket_messaging import split_connection_string
+from messaging.worker_pool import BoundedWorkerPoolMixIn
 from utilities.configuration import ConfigurationManager
 
 
@@ -26,9 +30,82 @@ class Node(object):
 class ChordRPCRequestHandler(server.SimpleXMLRPCRequestHandler):
     rpc_paths = ('/', '/RPC2',)
 
+    # HTTP/1.1 keeps the connection open between requests so pooled clients
+    # (messaging.connection_pool) can reuse it for the following calls.
+    protocol_version = "HTTP/1.1"
 
-class AsyncXMLRPCServer(socketserver.ThreadingMixIn, server.SimpleXMLRPCServer):
-    pass
+    def is_rpc_path_valid(self):
+        # virtual nodes of the server are served on their own path
+        return super().is_rpc_path_valid() or self.path in self.server.dispatchers
+
+    def setup(self):
+        # idle keep-alive connections are dropped after this many seconds, freeing the thread
+        self.timeout = ConfigurationManager.get_configuration().get_connection_idle_timeout()
+        super().setup()
+
+    def handle(self):
+        if not hasattr(self.server, "park_connection"):
+            return super().handle()
+        # serve a single request, worker pool waits for the next one without holding a worker
+        self.close_connection = True
+        self.handle_one_request()
+        if not self.close_connection:
+            self.server.park_connection()
+
+    def log_error(self, format, *args):
+        if self.server.logRequests:
+            super().log_error(format, *args)
+
+
+class AsyncXMLRPCServer(BoundedWorkerPoolMixIn, server.SimpleXMLRPCServer):
+
+    """
+    XML RPC server with a fixed number of workers and a bounded request queue. Requests arriving
+    on a full queue get the overloaded fault. Worker pool statistics are served as get_server_stats.
+    Virtual nodes hosted by the server get a dispatcher of their own, selected by the request path.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dispatchers = {}
+        self.register_function(self.get_server_stats, "get_server_stats")
+
+    def register_virtual_node(self, path, instance):
+        """
+        :param path: Request path of the virtual node, see messaging.socket_messaging.split_connection_string.
+        :param instance: Node instance served on the path.
+        :return: None
+        """
+        dispatcher = server.SimpleXMLRPCDispatcher(allow_none=True)
+        dispatcher.register_instance(instance)
+        dispatcher.register_function(self.get_server_stats, "get_server_stats")
+        self.dispatchers[path] = dispatcher
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        dispatcher = self.dispatchers.get(path)
+        if dispatcher is None:
+            return super()._marshaled_dispatch(data, dispatch_method, path)
+        return dispatcher._marshaled_dispatch(data, dispatch_method, path)
+
+    def reject_request(self, request, client_address):
+        # read the request before answering, closing a socket with unread data resets the connection
+        rfile = request.makefile("rb")
+        content_length = 0
+        while True:
+            line = rfile.readline(65537)
+            if not line or line in (b"\r\n", b"\n"):
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                content_length = int(value)
+        rfile.read(content_length)
+        body = xmlrpc.client.dumps(xmlrpc.client.Fault(MessagingConstants.OVERLOADED_FAULT_CODE,
+                                                       MessagingConstants.OVERLOADED_FAULT_STRING),
+                                   methodresponse=True).encode()
+        request.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/xml\r\nConnection: close\r\n"
+                        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
 
 
 class XMLRPCChordServerManager(object):
@@ -37,7 +114,7 @@ class XMLRPCChordServerManager(object):
     server_thread = None
 
     @staticmethod
-    def start_server(chord_node):
+    def start_server(chord_node, virtual_nodes=()):
 
         ip = ConfigurationManager.get_configuration().get_advertised_ip()
         port = ConfigurationManager.get_configuration().get_socket_port()
@@ -46,6 +123,9 @@ class XMLRPCChordServerManager(object):
             XMLRPCChordServerManager.server = AsyncXMLRPCServer((ip, port), ChordRPCRequestHandler, allow_none=True,
                                                                 logRequests=False)
             XMLRPCChordServerManager.server.register_instance(chord_node)
+            for virtual_node in virtual_nodes:
+                XMLRPCChordServerManager.server.register_virtual_node(
+                    split_connection_string(virtual_node.get_connection_string())[2], virtual_node)
             XMLRPCChordServerManager.server_thread = \
                 threading.Thread(target=XMLRPCChordServerManager.server.serve_forever)
             XMLRPCChordServerManager.server_thread.daemon = True
@@ -1,57 +1,455 @@
+"""
+This module holds a binary RPC engine for node communication. It is an alternative to the XML RPC
+engine in messaging.rpc and serves the same Node methods, selected by the "rpc_engine" configuration
+property.
+
+Every message is a frame: 4 byte big endian body length followed by the body. Request body holds the
+request id, the dispatcher path, the method name and the arguments. Response body holds the request
+id and either the result or a fault (code and message). Values are encoded with a one byte type tag,
+integers as zigzag varints and strings/bytes as length prefixed raw data, so tuples like
+(node_id, "ip:port") cost a handful of bytes instead of an XML document.
+"""
+
+
 import socket
+import struct
 import threading
 import socketserver
+import xmlrpc.client
+from constants.messaging_constants import MessagingConstants
+from messaging.worker_pool import BoundedWorkerPoolMixIn
 from utilities.configuration import ConfigurationManager
 
 
-__all__ = ["ChordSocketServerThreadManager", "ChordSocketClient"]
+__all__ = ["ChordSocketServerThreadManager", "ChordSocketClient", "BinaryCodec", "ThreadedChordTCPServer",
+           "split_connection_string"]
+
+
+FRAME_HEADER = struct.Struct(">I")
+FLOAT = struct.Struct(">d")
+
+MESSAGE_REQUEST = 0
+MESSAGE_RESULT = 1
+MESSAGE_FAULT = 2
+
+TAG_NONE = 0x4e         # N
+TAG_TRUE = 0x54         # T
+TAG_FALSE = 0x46        # F
+TAG_INT = 0x69          # i
+TAG_FLOAT = 0x66        # f
+TAG_STR = 0x73          # s
+TAG_BYTES = 0x62        # b
+TAG_TUPLE = 0x74        # t
+TAG_LIST = 0x6c         # l
+TAG_DICT = 0x64         # d
+
+DEFAULT_PATH = "/RPC2"
+
+
+def split_connection_string(connection_string):
+    """
+    :param connection_string: Node in form ip:port, or ip:port/name for the virtual nodes sharing a server.
+    :return: (host, port, dispatcher path) of the node. Plain ip:port is served on DEFAULT_PATH.
+    """
+    address, _, name = connection_string.partition("/")
+    host, port = address.split(":")
+    return host, port, "/" + name if name else DEFAULT_PATH
+
+
+class BinaryCodec(object):
+
+    """
+    Compact typed encoding of the values exchanged between chord nodes.
+    Supported types: None, bool, int, float, str, bytes, tuple, list and dict.
+    """
+
+    @staticmethod
+    def encode(value) -> bytes:
+        buffer = bytearray()
+        BinaryCodec._encode(value, buffer)
+        return bytes(buffer)
+
+    @staticmethod
+    def decode(data):
+        value, offset = BinaryCodec._decode(memoryview(data), 0)
+        return value
+
+    @staticmethod
+    def encode_varint(number, buffer):
+        while number > 0x7f:
+            buffer.append((number & 0x7f) | 0x80)
+            number >>= 7
+        buffer.append(number)
+
+    @staticmethod
+    def decode_varint(view, offset):
+        number = 0
+        shift = 0
+        while True:
+            byte = view[offset]
+            offset += 1
+            number |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return number, offset
+            shift += 7
+
+    @staticmethod
+    def _encode(value, buffer):
+        # bool is checked before int since bool is a subclass of int
+        if value is None:
+            buffer.append(TAG_NONE)
+        elif value is True:
+            buffer.append(TAG_TRUE)
+        elif value is False:
+            buffer.append(TAG_FALSE)
+        elif isinstance(value, int):
+            buffer.append(TAG_INT)
+            BinaryCodec.encode_varint((value << 1) if value >= 0 else ((-value << 1) - 1), buffer)
+        elif isinstance(value, str):
+            data = value.encode("utf-8")
+            buffer.append(TAG_STR)
+            BinaryCodec.encode_varint(len(data), buffer)
+            buffer += data
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            buffer.append(TAG_BYTES)
+            BinaryCodec.encode_varint(len(value), buffer)
+            buffer += value
+        elif isinstance(value, tuple):
+            buffer.append(TAG_TUPLE)
+            BinaryCodec.encode_varint(len(value), buffer)
+            for item in value:
+                BinaryCodec._encode(item, buffer)
+        elif isinstance(value, list):
+            buffer.append(TAG_LIST)
+            BinaryCodec.encode_varint(len(value), buffer)
+            for item in value:
+                BinaryCodec._encode(item, buffer)
+        elif isinstance(value, dict):
+            buffer.append(TAG_DICT)
+            BinaryCodec.encode_varint(len(value), buffer)
+            for key, item in value.items():
+                BinaryCodec._encode(key, buffer)
+                BinaryCodec._encode(item, buffer)
+        elif isinstance(value, float):
+            buffer.append(TAG_FLOAT)
+            buffer += FLOAT.pack(value)
+        else:
+            raise TypeError("Cannot encode value of type {}.".format(type(value).__name__))
+
+    @staticmethod
+    def _decode(view, offset):
+        tag = view[offset]
+        offset += 1
+        if tag == TAG_INT:
+            number, offset = BinaryCodec.decode_varint(view, offset)
+            return (number >> 1) if not number & 1 else -((number + 1) >> 1), offset
+        if tag == TAG_STR:
+            length, offset = BinaryCodec.decode_varint(view, offset)
+            return str(view[offset:offset + length], "utf-8"), offset + length
+        if tag == TAG_TUPLE or tag == TAG_LIST:
+            length, offset = BinaryCodec.decode_varint(view, offset)
+            items = []
+            for _ in range(length):
+                item, offset = BinaryCodec._decode(view, offset)
+                items.append(item)
+            return (tuple(items) if tag == TAG_TUPLE else items), offset
+        if tag == TAG_NONE:
+            return None, offset
+        if tag == TAG_TRUE:
+            return True, offset
+        if tag == TAG_FALSE:
+            return False, offset
+        if tag == TAG_BYTES:
+            length, offset = BinaryCodec.decode_varint(view, offset)
+            return bytes(view[offset:offset + length]), offset + length
+        if tag == TAG_DICT:
+            length, offset = BinaryCodec.decode_varint(view, offset)
+            items = {}
+            for _ in range(length):
+                key, offset = BinaryCodec._decode(view, offset)
+                items[key], offset = BinaryCodec._decode(view, offset)
+            return items, offset
+        if tag == TAG_FLOAT:
+            return FLOAT.unpack_from(view, offset)[0], offset + FLOAT.size
+        raise ValueError("Unknown type tag {} in message.".format(tag))
+
+    @staticmethod
+    def encode_request(request_id, path, method, params) -> bytes:
+        buffer = bytearray(FRAME_HEADER.size)
+        buffer.append(MESSAGE_REQUEST)
+        BinaryCodec.encode_varint(request_id, buffer)
+        BinaryCodec._encode(path, buffer)
+        BinaryCodec._encode(method, buffer)
+        BinaryCodec._encode(tuple(params), buffer)
+        FRAME_HEADER.pack_into(buffer, 0, len(buffer) - FRAME_HEADER.size)
+        return bytes(buffer)
+
+    @staticmethod
+    def decode_request(body):
+        """
+        :return: (request_id, path, method, params)
+        """
+        view = memoryview(body)
+        request_id, offset = BinaryCodec.decode_varint(view, 1)
+        path, offset = BinaryCodec._decode(view, offset)
+        method, offset = BinaryCodec._decode(view, offset)
+        params, offset = BinaryCodec._decode(view, offset)
+        return request_id, path, method, params
+
+    @staticmethod
+    def encode_result(request_id, result) -> bytes:
+        buffer = bytearray(FRAME_HEADER.size)
+        buffer.append(MESSAGE_RESULT)
+        BinaryCodec.encode_varint(request_id, buffer)
+        BinaryCodec._encode(result, buffer)
+        FRAME_HEADER.pack_into(buffer, 0, len(buffer) - FRAME_HEADER.size)
+        return bytes(buffer)
+
+    @staticmethod
+    def encode_fault(request_id, fault_code, fault_string) -> bytes:
+        buffer = bytearray(FRAME_HEADER.size)
+        buffer.append(MESSAGE_FAULT)
+        BinaryCodec.encode_varint(request_id, buffer)
+        BinaryCodec._encode(fault_code, buffer)
+        BinaryCodec._encode(fault_string, buffer)
+        FRAME_HEADER.pack_into(buffer, 0, len(buffer) - FRAME_HEADER.size)
+        return bytes(buffer)
+
+    @staticmethod
+    def split_response(body):
+        """
+        Decodes a response body without raising its fault.
+        :return: (request_id, result, fault) where fault is None or xmlrpc.client.Fault.
+        """
+        view = memoryview(body)
+        request_id, offset = BinaryCodec.decode_varint(view, 1)
+        if view[0] == MESSAGE_FAULT:
+            fault_code, offset = BinaryCodec._decode(view, offset)
+            fault_string, offset = BinaryCodec._decode(view, offset)
+            return request_id, None, xmlrpc.client.Fault(fault_code, fault_string)
+        result, offset = BinaryCodec._decode(view, offset)
+        return request_id, result, None
+
+    @staticmethod
+    def decode_response(body):
+        """
+        Decodes a response body. Faults are raised as xmlrpc.client.Fault so callers handle
+        both the engines the same way.
+        :return: (request_id, result)
+        """
+        request_id, result, fault = BinaryCodec.split_response(body)
+        if fault:
+            raise fault
+        return request_id, result
 
 
-class ChordSocketServerHandler(socketserver.StreamRequestHandler, socketserver.ThreadingMixIn):
+def read_exactly(stream, length):
+    data = stream.read(length)
+    if data is None or len(data) == length:
+        return data
+    # unbuffered streams may return short reads
+    chunks = [data]
+    received = len(data)
+    while data and received < length:
+        data = stream.read(length - received)
+        chunks.append(data)
+        received += len(data)
+    return b"".join(chunks)
 
+
+def read_frame(stream):
     """
-    This is a singleton class with not __init__ method. Can't have multiple server instances.
-    The request handler our class for the dht server.
-    The handle method receives a message from a client and forwards it to a handler class.
-    The handler class will decide the suitable handler for the received message.
-    This is a file stream based implementation where the files are used as buffers.
+    Reads one frame body from a file like object.
+    :param stream: Binary stream (socket makefile / rfile).
+    :return: Frame body as bytes or None when the peer closed the connection.
     """
+    header = read_exactly(stream, FRAME_HEADER.size)
+    if not header or len(header) < FRAME_HEADER.size:
+        return None
+    length = FRAME_HEADER.unpack(header)[0]
+    body = read_exactly(stream, length)
+    if len(body) < length:
+        return None
+    return body
+
+
+class ChordSocketServerHandler(socketserver.StreamRequestHandler):
+
+    """
+    Serves one binary RPC request of a connection. The connection is then parked by the worker pool
+    until the next request arrives, or closed when idle for longer than connection_idle_timeout.
+    """
+
+    disable_nagle_algorithm = True
+    # unbuffered, so no request data is left behind in a buffer while the connection is parked
+    rbufsize = 0
+
+    def setup(self):
+        self.timeout = ConfigurationManager.get_configuration().get_connection_idle_timeout()
+        super().setup()
 
     def handle(self):
 
+        try:
+            body = read_frame(self.rfile)
+        except (OSError, socket.timeout):
+            return
+        if body is None:
+            return
+        self.wfile.write(self.server.handle_frame(body))
+        self.wfile.flush()
+        self.server.park_connection()
+
+
+class ThreadedChordTCPServer(BoundedWorkerPoolMixIn, socketserver.TCPServer):
+
+    """
+    Binary RPC server. Registered instance methods are dispatched the same way SimpleXMLRPCServer
+    dispatches them: methods starting with underscore are not exposed and exceptions are returned
+    to the caller as faults. Requests are served by a bounded worker pool, see messaging.worker_pool.
+    Virtual nodes hosted by the server are registered on their own path, requests are dispatched to
+    the instance of their path.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, request_handler=ChordSocketServerHandler, bind_and_activate=True, **kwargs):
+        self.instance = None
+        self.instances = {}
+        self.funcs = {}
+        super().__init__(server_address, request_handler, bind_and_activate, **kwargs)
+        self.register_function(self.get_server_stats, "get_server_stats")
+
+    def reject_request(self, request, client_address):
+        body = read_frame(request.makefile("rb", 0))
+        if body is not None:
+            request_id = BinaryCodec.decode_request(body)[0]
+            request.sendall(BinaryCodec.encode_fault(request_id, MessagingConstants.OVERLOADED_FAULT_CODE,
+                                                     MessagingConstants.OVERLOADED_FAULT_STRING))
+
+    def register_instance(self, instance):
+        self.instance = instance
+
+    def register_virtual_node(self, path, instance):
         """
-        Receives the data sent from client. Expects every data to be separated by \n.
+        :param path: Dispatcher path of the virtual node, see split_connection_string.
+        :param instance: Node instance served on the path.
         :return: None
         """
+        self.instances[path] = instance
+
+    def register_function(self, function, name=None):
+        self.funcs[name or function.__name__] = function
+
+    def _dispatch(self, path, method, params):
+        function = self.funcs.get(method)
+        if function is None:
+            instance = self.instance if path == DEFAULT_PATH else self.instances.get(path)
+            if instance is None or method.startswith("_"):
+                raise Exception('method "{}" is not supported'.format(method))
+            function = getattr(instance, method, None)
+            if function is None or not callable(function):
+                raise Exception('method "{}" is not supported'.format(method))
+        return function(*params)
+
+    def handle_frame(self, body):
+        """
+        :param body: Request frame body.
+        :return: Response frame.
+        """
+        request_id = 0
+        try:
+            request_id, path, method, params = BinaryCodec.decode_request(body)
+            return BinaryCodec.encode_result(request_id, self._dispatch(path, method, params))
+        except xmlrpc.client.Fault as fault:
+            return BinaryCodec.encode_fault(request_id, fault.faultCode, fault.faultString)
+        except BaseException as e:
+            return BinaryCodec.encode_fault(request_id, 1, "{}:{}".format(type(e), e))
 
-        data = self.rfile.readline().strip()
-        print("{} wrote:".format(self.client_address[0]))
-        print(data)
 
+class ChordSocketMethod(object):
 
-class ThreadedChordTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-    pass
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def __call__(self, *args):
+        return self._client.call(self._name, args)
 
 
 class ChordSocketClient(object):
 
-    def __init__(self, host, port, message):
+    """
+    Client of the binary RPC engine. Holds one persistent TCP connection and, like ServerProxy,
+    exposes remote methods as attributes. A client should be used by one thread at a time,
+    messaging.connection_pool takes care of that for node to node calls.
+    """
 
+    def __init__(self, host, port, path=DEFAULT_PATH, timeout=None):
+        """
+        :param host: Host of the chord node.
+        :param port: Port of the chord node.
+        :param path: Dispatcher path on the node.
+        :param timeout: Socket timeout in seconds, None blocks.
+        """
         self._host = host
-        self._port = port
-        self._message = message
+        self._port = int(port)
+        self._path = path
+        self._timeout = timeout
+        self._socket = None
+        self._stream = None
+        self._request_id = 0
+
+    def _connect(self):
+        self._socket = socket.create_connection((self._host, self._port), timeout=self._timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._stream = self._socket.makefile("rb")
+
+    def settimeout(self, timeout):
+        """
+        :param timeout: Socket timeout in seconds for the following calls, None blocks.
+        :return: None
+        """
+        self._timeout = timeout
+        if self._socket:
+            self._socket.settimeout(timeout)
 
-    def send(self):
-        # Create a socket (SOCK_STREAM means a TCP socket)
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+    def call(self, method, params):
+        """
+        :param method: Remote method name.
+        :param params: Arguments of the method.
+        :return: Result of the remote call. Raises xmlrpc.client.Fault for remote errors.
+        """
+        if not self._socket:
+            self._connect()
+        self._request_id += 1
+        try:
+            self._socket.sendall(BinaryCodec.encode_request(self._request_id, self._path, method, params))
+            body = read_frame(self._stream)
+        except OSError:
+            self.close()
+            raise
+        if body is None:
+            self.close()
+            raise ConnectionResetError("Connection closed by {}:{}.".format(self._host, self._port))
+        request_id, result = BinaryCodec.decode_response(body)
+        if request_id != self._request_id:
+            self.close()
+            raise ConnectionError("Response {} received for request {}.".format(request_id, self._request_id))
+        return result
 
-            # Connect to the server and send data
-            sock.connect((self._host, self._port))
+    def close(self):
+        if self._stream:
+            self._stream.close()
+        if self._socket:
+            self._socket.close()
+        self._stream = None
+        self._socket = None
 
-            if self._message[-1] == "\n":
-                sock.sendall(bytes(self._message, "utf-8"))
-            else:
-                sock.sendall(bytes(self._message + "\n", "utf-8"))
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return ChordSocketMethod(self, name)
 
 
 class ChordSocketServerThreadManager(object):
@@ -60,11 +458,13 @@ class ChordSocketServerThreadManager(object):
     server_thread = None
 
     @staticmethod
-    def start_server():
+    def start_server(chord_node, virtual_nodes=()):
 
         """
-        Start the socket server to listen on the specified port.
+        Start the socket server to listen on the specified port and serve the chord node methods.
         Sets the attribute "open_server" of the class which is used to later close the server on stop_server() method.
+        :param chord_node: Node instance to be served.
+        :param virtual_nodes: Further Node instances of this server, served on the path of their connection string.
         :return: None
         """
 
@@ -74,6 +474,10 @@ class ChordSocketServerThreadManager(object):
         if not ChordSocketServerThreadManager.server:
             ChordSocketServerThreadManager.server = \
                 ThreadedChordTCPServer((ip, port), ChordSocketServerHandler)
+            ChordSocketServerThreadManager.server.register_instance(chord_node)
+            for virtual_node in virtual_nodes:
+                ChordSocketServerThreadManager.server.register_virtual_node(
+                    split_connection_string(virtual_node.get_connection_string())[2], virtual_node)
 
             ChordSocketServerThreadManager.server_thread = \
                 threading.Thread(target=ChordSocketServerThreadManager.server.serve_forever)
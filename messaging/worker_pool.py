@@ -0,0 +1,238 @@
+"""
+This module holds the bounded worker pool used by the node servers in place of socketserver.ThreadingMixIn.
+
+ThreadingMixIn spawns a thread per connection, without any limit, so an overloaded node thrashes instead of
+degrading. Here a fixed number of workers take requests from a bounded queue. When the queue is full the
+request is rejected right away with an "overloaded" fault (MessagingConstants.OVERLOADED_FAULT_CODE) so the
+caller can fail over to another node. Rejected requests are answered by a thread of their own, a slow client
+holds back neither the accepting thread nor the parked connections.
+
+A worker serves one request of a connection at a time. Keep-alive connections waiting for their next request
+are parked in a selector and only queued again when the next request arrives, so idle connections of the
+connection pools of other nodes don't hold on to workers.
+"""
+
+
+import queue
+import select
+import selectors
+import socket
+import threading
+import time
+from utilities.configuration import ConfigurationManager
+
+
+__all__ = ["BoundedWorkerPoolMixIn"]
+
+
+class BoundedWorkerPoolMixIn(object):
+
+    """
+    Mix-in for socketserver servers. Servers define reject_request(request, client_address) which writes
+    the protocol specific overloaded fault. Request handlers serving keep-alive connections handle one
+    request and call server.park_connection() to get the connection back on its next request.
+    """
+
+    # seconds given to a rejected client to finish sending its request
+    reject_timeout = 1
+    # seconds a worker waits for the next request of a keep-alive connection before parking it,
+    # only when no other request is queued. Lookups send a burst of calls to the same peer.
+    keep_alive_linger = 0.002
+
+    def __init__(self, *args, worker_count=None, queue_size=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        config = ConfigurationManager.get_configuration()
+        self.worker_count = worker_count or config.get_server_worker_count()
+        self.queue_size = queue_size or config.get_server_queue_size()
+        self.idle_timeout = config.get_connection_idle_timeout()
+
+        self._requests = queue.Queue(maxsize=self.queue_size)
+        self._rejections = queue.Queue(maxsize=self.queue_size)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self._busy_time = 0.0
+        self._served = 0
+        self._rejected = 0
+        self._parked = 0
+        self._started = time.monotonic()
+        self._closed = False
+
+        self._to_park = []
+        self._park_lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+        self._wakeup_read.setblocking(False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+
+        self._workers = []
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._worker_loop, name="chord-worker-{}".format(i))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        self._parking_thread = threading.Thread(target=self._parking_loop, name="chord-parking")
+        self._parking_thread.daemon = True
+        self._parking_thread.start()
+        self._rejecting_thread = threading.Thread(target=self._rejecting_loop, name="chord-rejecting")
+        self._rejecting_thread.daemon = True
+        self._rejecting_thread.start()
+
+    def process_request(self, request, client_address):
+        self._enqueue(request, client_address)
+
+    def _enqueue(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            try:
+                self._rejections.put_nowait((request, client_address))
+            except queue.Full:
+                # rejections pile up too, the connection is closed without an answer
+                self.shutdown_request(request)
+
+    def _rejecting_loop(self):
+        while True:
+            item = self._rejections.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                request.settimeout(self.reject_timeout)
+                self.reject_request(request, client_address)
+            except Exception:
+                pass
+            self.shutdown_request(request)
+
+    def reject_request(self, request, client_address):
+        pass
+
+    def park_connection(self):
+        """
+        Called by a request handler, on the worker thread, when the connection is kept alive
+        for further requests.
+        :return: None
+        """
+        self._local.keep_alive = True
+
+    def _worker_loop(self):
+        item = None
+        while True:
+            if item is None:
+                item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            item = None
+            self._local.keep_alive = False
+            started = time.monotonic()
+            with self._stats_lock:
+                self._busy += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+                self._local.keep_alive = False
+            finally:
+                with self._stats_lock:
+                    self._busy -= 1
+                    self._served += 1
+                    self._busy_time += time.monotonic() - started
+            if self._local.keep_alive and not self._closed:
+                if self._requests.empty() and self._next_request_arrives(request):
+                    item = (request, client_address)
+                    continue
+                with self._park_lock:
+                    self._to_park.append((request, client_address))
+                self._wakeup()
+            else:
+                self.shutdown_request(request)
+
+    def _next_request_arrives(self, request):
+        try:
+            return bool(select.select([request], [], [], self.keep_alive_linger)[0])
+        except (OSError, ValueError):
+            return False
+
+    def _wakeup(self):
+        try:
+            self._wakeup_write.send(b"\0")
+        except OSError:
+            pass
+
+    def _parking_loop(self):
+        while not self._closed:
+            events = self._selector.select(timeout=1)
+            now = time.monotonic()
+            with self._park_lock:
+                to_park, self._to_park = self._to_park, []
+            for request, client_address in to_park:
+                self._selector.register(request, selectors.EVENT_READ, (client_address, now))
+            for key, mask in events:
+                if key.fileobj is self._wakeup_read:
+                    try:
+                        self._wakeup_read.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                self._selector.unregister(key.fileobj)
+                self._enqueue(key.fileobj, key.data[0])
+            for key in list(self._selector.get_map().values()):
+                if key.data and now - key.data[1] > self.idle_timeout:
+                    self._selector.unregister(key.fileobj)
+                    self.shutdown_request(key.fileobj)
+            self._parked = len(self._selector.get_map()) - 1
+
+    def get_server_stats(self):
+        """
+        :return: Worker pool statistics as dictionary. utilization is the fraction of worker time spent
+                 serving requests since the server started.
+        """
+        with self._stats_lock:
+            elapsed = max(time.monotonic() - self._started, 1e-9)
+            return {
+                "workers": self.worker_count,
+                "busy_workers": self._busy,
+                "queue_depth": self._requests.qsize(),
+                "queue_size": self.queue_size,
+                "rejected": self._rejected,
+                "served": self._served,
+                "parked_connections": self._parked,
+                "utilization": self._busy_time / (elapsed * self.worker_count)
+            }
+
+    def server_close(self):
+        super().server_close()
+        self._closed = True
+        self._wakeup()
+        for _ in self._workers:
+            self._put_stop(self._requests)
+        self._put_stop(self._rejections)
+        self._parking_thread.join()
+        for key in list(self._selector.get_map().values()):
+            if key.fileobj is not self._wakeup_read:
+                self.shutdown_request(key.fileobj)
+        self._selector.close()
+        self._wakeup_read.close()
+        self._wakeup_write.close()
+
+    def _put_stop(self, requests):
+        # queued requests make room for the stop marker, they are closed unanswered
+        stops = 1
+        while stops:
+            try:
+                requests.put(None, timeout=0.1)
+                stops -= 1
+                continue
+            except queue.Full:
+                pass
+            try:
+                item = requests.get_nowait()
+            except queue.Empty:
+                continue
+            if item is None:
+                stops += 1
+            else:
+                self.shutdown_request(item[0])
@@ -0,0 +1,120 @@
+"""
+This module measures how the node state holds up under concurrent requests: store throughput for a growing
+number of client threads with one or more store shards (store_shards), while a maintenance thread walks the
+owned keys as replication does, and lookup steps served while the stabilization updates the routing state.
+No chord servers are needed.
+
+Usage: python -m performance.contention_benchmark [--keys 100000] [--seconds 2] [--shards 16]
+"""
+
+
+import argparse
+import os
+import random
+import threading
+import time
+from constants.chord_constants import ChordConstants
+from constants.configuration_constants import ConfigurationConstants
+
+if ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE not in os.environ:
+    os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test", "config.test.json")
+
+from chord.key_store import create_key_store
+from performance.ring_microbenchmark import build_node
+
+
+def run_threads(workers, seconds):
+    """
+    :param workers: Functions called in a loop by one thread each, returning the number of operations done.
+    :param seconds: Duration of the run.
+    :return: Operations done by every worker.
+    """
+    stop = threading.Event()
+    counts = [0] * len(workers)
+
+    def loop(index, worker):
+        while not stop.is_set():
+            counts[index] += worker()
+
+    threads = [threading.Thread(target=loop, args=(i, worker)) for i, worker in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def store_throughput(backend, shards, client_threads, key_count, seconds):
+    """
+    :return: (operations per second, 99.9th percentile latency of an operation in microseconds) of the clients.
+    """
+    store = create_key_store(backend, {key: key % 2 == 0 for key in range(key_count)}, shards)
+    latencies = []
+
+    def client():
+        key = random.randrange(key_count)
+        started = time.perf_counter()
+        store[key] = True
+        key in store
+        latencies.append(time.perf_counter() - started)
+        return 2
+
+    def maintenance():
+        store.owned_keys()
+        return 0
+
+    counts = run_threads([client] * client_threads + [maintenance], seconds)
+    latencies.sort()
+    return sum(counts) / seconds, latencies[int(len(latencies) * 0.999)] * 1e6
+
+
+def routing_throughput(reader_threads, seconds, with_writer):
+    node = build_node(64)
+    m = node._ring.m_bits
+    identifiers = [random.randrange(2 ** m) for _ in range(1024)]
+    successor_list = node.get_successor_list()
+
+    def reader():
+        node.lookup_step(identifiers[random.randrange(1024)])
+        return 1
+
+    def writer():
+        # what fix_fingers and stabilize publish, without the network
+        i = random.randrange(1, m)
+        finger = node._finger_table.get_finger_ith(i).create_copy()
+        finger.set_node(finger.get_identifier())
+        node._finger_table.update_finger_at_ith_position(i, finger)
+        node.successor_list = successor_list
+        return 0
+
+    counts = run_threads([reader] * reader_threads + ([writer] if with_writer else []), seconds)
+    return sum(counts) / seconds
+
+
+def run(key_count, seconds, shards):
+    random.seed(7)
+    for backend in (ChordConstants.STORE_BACKEND_DICT, ChordConstants.STORE_BACKEND_COMPACT):
+        print("{} store, {} keys, operations per second and 99.9th percentile latency".format(backend, key_count))
+        print("  {:<10} {:>24} {:>24}".format("threads", "1 shard", "{} shards".format(shards)))
+        for client_threads in (1, 2, 4, 8):
+            print("  {:<10} {:>12.0f} {:>8.0f} us {:>12.0f} {:>8.0f} us".format(
+                client_threads, *store_throughput(backend, 1, client_threads, key_count, seconds),
+                *store_throughput(backend, shards, client_threads, key_count, seconds)))
+
+    print("lookup steps per second")
+    print("  {:<10} {:>14} {:>14}".format("threads", "no updates", "with updates"))
+    for reader_threads in (1, 2, 4, 8):
+        print("  {:<10} {:>14.0f} {:>14.0f}".format(reader_threads, routing_throughput(reader_threads, seconds, False),
+                                                    routing_throughput(reader_threads, seconds, True)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100000, dest="keys", help="Number of keys stored.")
+    parser.add_argument("--seconds", type=float, default=2, dest="seconds", help="Duration of every measurement.")
+    parser.add_argument("--shards", type=int, default=16, dest="shards", help="Number of store shards compared.")
+    arguments = parser.parse_args()
+    run(arguments.keys, arguments.seconds, arguments.shards)
@@ -0,0 +1,67 @@
+"""
+This module reports how evenly the ring is split between the physical servers. Without a bootstrap server it
+places the ids of a number of servers, each with a growing number of virtual nodes (virtual_nodes), the way
+chord_server does and prints the share of the ring of the most and least loaded server. With a bootstrap server
+it prints the share of every server of the running ring.
+
+Usage: python -m performance.ownership_report [--servers 8] [--m-bits 32]
+       python -m performance.ownership_report --bootstrap-server localhost:5000 [--rpc-engine xmlrpc]
+"""
+
+
+import argparse
+from chord.ring import Ring
+from client.chord_client import ChordClient
+from constants.messaging_constants import MessagingConstants
+from utilities.consistent_hashing import Consistent_Hashing
+
+
+def server_shares(servers, virtual_nodes, m_bits):
+    """
+    :param servers: Number of servers, at localhost on consecutive ports.
+    :param virtual_nodes: Virtual nodes per server.
+    :param m_bits: Number of bits of the ids.
+    :return: Fraction of the ring owned by every server.
+    """
+    owners = {}
+    for port in range(5000, 5000 + servers):
+        address = "127.0.0.1:{}".format(port)
+        owners[Consistent_Hashing.get_modulo_hash(address, m_bits)] = address
+        for i in range(1, virtual_nodes):
+            owners.setdefault(Consistent_Hashing.get_modulo_hash("{}/v{}".format(address, i), m_bits), address)
+
+    shares = dict.fromkeys(owners.values(), 0.0)
+    for node_id, fraction in Ring(m_bits).owned_fractions(owners).items():
+        shares[owners[node_id]] += fraction
+    return list(shares.values())
+
+
+def simulate(servers, m_bits):
+    print("{} servers, share of the ring of the most and least loaded server".format(servers))
+    print("  {:<14} {:>10} {:>10} {:>14}".format("virtual nodes", "max", "min", "max / mean"))
+    for virtual_nodes in (1, 2, 4, 8, 16, 32, 64):
+        shares = server_shares(servers, virtual_nodes, m_bits)
+        print("  {:<14} {:>10.2%} {:>10.2%} {:>14.2f}".format(virtual_nodes, max(shares), min(shares),
+                                                             max(shares) * servers))
+
+
+def report(bootstrap_server, rpc_engine):
+    shares = ChordClient(bootstrap_server, rpc_engine).get_ownership_report()
+    print("  {:<24} {:>6} {:>10}".format("server", "nodes", "share"))
+    for server in sorted(shares, key=lambda server: -shares[server][1]):
+        print("  {:<24} {:>6} {:>10.2%}".format(server, *shares[server]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servers", type=int, default=8, dest="servers", help="Number of simulated servers.")
+    parser.add_argument("--m-bits", type=int, default=32, dest="m_bits", help="Number of bits of the ids.")
+    parser.add_argument("--bootstrap-server", default=None, dest="bootstrap_server",
+                        help="Node of a running ring to report on, in the form localhost:5000.")
+    parser.add_argument("--rpc-engine", default=MessagingConstants.RPC_ENGINE_XMLRPC, dest="rpc_engine",
+                        help="Engine the bootstrap server is served with.")
+    arguments = parser.parse_args()
+    if arguments.bootstrap_server:
+        report(arguments.bootstrap_server, arguments.rpc_engine)
+    else:
+        simulate(arguments.servers, arguments.m_bits)
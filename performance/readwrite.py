@@ -12,11 +12,12 @@ class ReadWritePerformance(Performance):
     """
     Author: Adarsh Trivedi
     This class compares read vs write latency for range of sample sizes. The run performs consecutive
-    write and read for performance measure.
+    write and read for performance measure, key by key or batched (multi_set/multi_get).
     """
 
-    def __init__(self, input_file, chord_client, sample_sizes, epochs_per_sample_size):
+    def __init__(self, input_file, chord_client, sample_sizes, epochs_per_sample_size, batched=False):
         super().__init__(input_file, chord_client, sample_sizes, epochs_per_sample_size)
+        self.batched = batched
 
     def plot(self):
         x, y_read, y_write = [], [], []
@@ -43,15 +44,21 @@ class ReadWritePerformance(Performance):
             epoch_counter = 0
             while epoch_counter < self.epochs_per_sample_size:
                 start_time_write = self.record_time()
-                for i in range(sample_size):
-                    self.chord_client.set(content[i])
+                if self.batched:
+                    self.chord_client.multi_set(content[:sample_size])
+                else:
+                    for i in range(sample_size):
+                        self.chord_client.set(content[i])
                 end_time_write = self.record_time()
                 performance_values_write.append(end_time_write-start_time_write)
                 print("Write\nSample Size: {}\nEpoch Counter: {}\nTime take: {}\n".format(sample_size, epoch_counter,
                                                                                          end_time_write - start_time_write))
                 start_time_read = self.record_time()
-                for i in range(sample_size):
-                    self.chord_client.get(content[i])
+                if self.batched:
+                    self.chord_client.multi_get(content[:sample_size])
+                else:
+                    for i in range(sample_size):
+                        self.chord_client.get(content[i])
                 end_time_read = self.record_time()
                 performance_values_read.append(end_time_read - start_time_read)
                 print("Read\nSample Size: {}\nEpoch Counter: {}\nTime take: {}\n".format(sample_size, epoch_counter,
@@ -75,8 +82,9 @@ class WritePerformance(Performance):
     write for different sample sizes as provided for performance measure.
     """
 
-    def __init__(self, input_file, chord_client, sample_sizes, epochs_per_sample_size):
+    def __init__(self, input_file, chord_client, sample_sizes, epochs_per_sample_size, batched=False):
         super().__init__(input_file, chord_client, sample_sizes, epochs_per_sample_size)
+        self.batched = batched
 
     def plot(self):
         x, y = [], []
@@ -99,8 +107,11 @@ class WritePerformance(Performance):
             epoch_counter = 0
             while epoch_counter < self.epochs_per_sample_size:
                 start_time = self.record_time()
-                for i in range(sample_size):
-                    self.chord_client.set(content[i])
+                if self.batched:
+                    self.chord_client.multi_set(content[:sample_size])
+                else:
+                    for i in range(sample_size):
+                        self.chord_client.set(content[i])
                 end_time = self.record_time()
                 performance_values.append(end_time-start_time)
                 epoch_counter += 1
@@ -0,0 +1,72 @@
+"""
+This module holds CPU microbenchmarks of the node local routing code: ring arithmetic, finger creation and
+the work a node does per lookup hop. No chord servers are needed.
+
+Usage: python -m performance.ring_microbenchmark [--nodes 64] [--iterations 100000]
+"""
+
+
+import argparse
+import os
+import random
+import time
+from constants.configuration_constants import ConfigurationConstants
+
+if ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE not in os.environ:
+    os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test", "config.test.json")
+
+from utilities.configuration import ConfigurationManager
+from chord.node import Node, Finger
+
+
+def build_node(node_count):
+    """
+    :param node_count: Number of nodes of the simulated ring.
+    :return: Node with the finger table and successor list it would have in a ring of node_count nodes.
+    """
+    m = ConfigurationManager.get_configuration().get_m_bits()
+    random.seed(7)
+    ring = sorted(random.sample(range(2 ** m), node_count))
+    node = Node(node_id=ring[0], node_ip="localhost")
+    for i in range(1, m + 1):
+        start = node.i_start(node.get_node_id(), i)
+        successor = next((n for n in ring if n >= start), ring[0])
+        finger = Finger("localhost", successor, 5000 + ring.index(successor), i, node.get_node_id())
+        finger.set_node(successor)
+        node._finger_table.update_finger_at_ith_position(i - 1, finger)
+    node.successor = (ring[1], "localhost:{}".format(5001))
+    node.successor_list = [(n, "localhost:{}".format(5000 + ring.index(n))) for n in ring[1:4]]
+    return node
+
+
+def measure(name, function, iterations):
+    started = time.process_time()
+    for i in range(iterations):
+        function(i)
+    elapsed = time.process_time() - started
+    print("{:<32} {:>10.3f} us".format(name, elapsed / iterations * 1e6))
+
+
+def run(node_count, iterations):
+    node = build_node(node_count)
+    m = ConfigurationManager.get_configuration().get_m_bits()
+    identifiers = [random.randrange(2 ** m) for _ in range(1024)]
+    node_id = node.get_node_id()
+
+    print("CPU time per call, ring of {} nodes, m = {}".format(node_count, m))
+    measure("i_start", lambda i: node.i_start(node_id, i % m + 1), iterations)
+    measure("go_back_n", lambda i: node.go_back_n(node_id, 2 ** (i % m)), iterations)
+    measure("Finger()", lambda i: Finger("localhost", node_id, 5000, i % m + 1, node_id), iterations)
+    measure("closest_preceding_finger", lambda i: node.closest_preceding_finger(identifiers[i % 1024]), iterations)
+    measure("lookup_step", lambda i: node.lookup_step(identifiers[i % 1024]), iterations)
+    measure("lookup_step with candidates", lambda i: node.lookup_step(identifiers[i % 1024], 3), iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=64, dest="nodes", help="Number of nodes of the simulated ring.")
+    parser.add_argument("--iterations", type=int, default=100000, dest="iterations",
+                        help="Calls per measurement.")
+    arguments = parser.parse_args()
+    run(arguments.nodes, arguments.iterations)
@@ -14,6 +14,31 @@ def get_arguments():
                         type=str,
                         help="Type of performance testing. Valid values ['write', 'readwrite', 'nodecount'].")
 
+    parser.add_argument("--rpc-engine",
+                        choices=['xmlrpc', 'socket', 'asyncio'],
+                        default='xmlrpc',
+                        required=False,
+                        dest='rpc_engine',
+                        type=str,
+                        help="RPC engine the bootstrap server is running with. Valid values ['xmlrpc', 'socket', 'asyncio'].")
+
+    parser.add_argument("--lookup-mode",
+                        choices=['iterative', 'recursive'],
+                        default=None,
+                        required=False,
+                        dest='lookup_mode',
+                        type=str,
+                        help="Lookup mode used for the requests. Valid values ['iterative', 'recursive']. "
+                             "Defaults to the lookup mode configured on the bootstrap server.")
+
+    parser.add_argument("--batched",
+                        default=False,
+                        action="store_true",
+                        required=False,
+                        dest="batched",
+                        help="Set to send the keys of a sample with multi_set/multi_get instead of one by one "
+                             "(write and readwrite).")
+
     parser.add_argument("--input-file",
                         required=False,
                         dest='input_file',
@@ -55,17 +80,19 @@ def get_arguments():
                         help="Set to display the performance output as plot.")
 
     args = parser.parse_args()
-    return args.type, args.input_file, args.bootstrap_server, args.d_p_o, args.p_p_o, args.sample_size, args.e_per_sample
+    return args.type, args.input_file, args.bootstrap_server, args.d_p_o, args.p_p_o, args.sample_size, \
+        args.e_per_sample, args.rpc_engine, args.lookup_mode, args.batched
 
 
 def main():
 
-    run_type, input_file, bootstrap_server, d_p_o, p_p_o, sample_size, e_per_sample = get_arguments()
+    run_type, input_file, bootstrap_server, d_p_o, p_p_o, sample_size, e_per_sample, rpc_engine, lookup_mode, \
+        batched = get_arguments()
     performance_object = None
 
     client = None
     try:
-        client = ChordClient(bootstrap_server=bootstrap_server)
+        client = ChordClient(bootstrap_server=bootstrap_server, rpc_engine=rpc_engine, lookup_mode=lookup_mode)
     except:
         print("Something went wrong creating chord client.")
         exit(1)
@@ -74,13 +101,15 @@ def main():
         performance_object = WritePerformance(input_file=input_file,
                                               chord_client=client,
                                               sample_sizes=sample_size,
-                                              epochs_per_sample_size=e_per_sample)
+                                              epochs_per_sample_size=e_per_sample,
+                                              batched=batched)
 
     elif run_type == "readwrite":
         performance_object = ReadWritePerformance(input_file=input_file,
                                                   chord_client=client,
                                                   sample_sizes=sample_size,
-                                                  epochs_per_sample_size=e_per_sample)
+                                                  epochs_per_sample_size=e_per_sample,
+                                                  batched=batched)
 
     elif run_type == "nodecount":
         performance_object = WriteNodeCount(input_file=input_file,
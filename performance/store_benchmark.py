@@ -0,0 +1,63 @@
+"""
+This module compares the key store backends of the chord nodes: memory per key and time of the store
+operations a node performs, and for the log backend the time a restarted node takes to load its keys.
+No chord servers are needed.
+
+Usage: python -m performance.store_benchmark [--keys 1000000] [--m-bits 32]
+"""
+
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from constants.chord_constants import ChordConstants
+from chord.key_store import create_key_store
+from chord.log_store import SegmentLog, LogKeyStore
+
+
+def measure(name, function):
+    started = time.perf_counter()
+    result = function()
+    print("  {:<24} {:>10.3f} s".format(name, time.perf_counter() - started))
+    return result
+
+
+def run(key_count, m_bits):
+    random.seed(7)
+    keys = random.sample(range(2 ** m_bits), key_count)
+    ring_size = 2 ** m_bits
+
+    directory = tempfile.mkdtemp()
+    for backend in (ChordConstants.STORE_BACKEND_DICT, ChordConstants.STORE_BACKEND_COMPACT,
+                    ChordConstants.STORE_BACKEND_LOG):
+        print("{} backend, {} keys".format(backend, key_count))
+        if backend == ChordConstants.STORE_BACKEND_LOG:
+            # not synced, the benchmark measures the store and not the disk
+            store = LogKeyStore(SegmentLog(directory, sync=False, compaction_interval=0))
+        else:
+            store = create_key_store(backend)
+
+        def fill():
+            for i, key in enumerate(keys):
+                store[key] = i % 3 != 0
+
+        measure("set", fill)
+        measure("contains", lambda: sum(1 for key in keys[:100000] if key in store))
+        measure("replica keys", store.replica_keys)
+        measure("pop 1% range", lambda: store.pop_range(0, ring_size // 100, 'r'))
+        stats = store.get_stats()
+        print("  {:<24} {:>10.1f} bytes".format("memory per key", stats["bytes_per_key"]))
+        if backend == ChordConstants.STORE_BACKEND_LOG:
+            store._log.close()
+            measure("restart", lambda: LogKeyStore(SegmentLog(directory, sync=False, compaction_interval=0)))
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1000000, dest="keys", help="Number of keys stored.")
+    parser.add_argument("--m-bits", type=int, default=32, dest="m_bits", help="Size of the identifier space.")
+    arguments = parser.parse_args()
+    run(arguments.keys, arguments.m_bits)
@@ -0,0 +1,199 @@
+"""
+This module tests the asyncio engine (messaging.async_rpc): request/response round trips against a server spawned
+on localhost, lookups running into a dead or hung peer and key operations running into a stalled owner. No chord
+nodes are needed.
+"""
+
+
+import asyncio
+import os
+import socket
+import threading
+import time
+import unittest
+import xmlrpc.client
+from unittest import mock
+from constants.configuration_constants import ConfigurationConstants
+os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.test.json")
+from chord.location_cache import LocationCache
+from chord.node import Node
+from chord.tracing import LookupTracer
+from messaging.async_rpc import AsyncChordClient, AsyncChordServer, AsyncNodeRouter, INLINE_METHODS
+from messaging.socket_messaging import ChordSocketClient
+
+
+class DummyNode(object):
+
+    """
+    Node answering lookup_step from a fixed table of identifier -> (node, successor, next hop), after the delay
+    given for the identifier.
+    """
+
+    in_bracket = Node.in_bracket
+
+    def __init__(self, node_id, connection_string, steps=None, delays=None):
+        self._node = (node_id, connection_string)
+        self._steps = steps or {}
+        self._delays = delays or {}
+        self.calls = {}
+        self.location_cache = LocationCache(max_entries=8, ttl=30)
+        self.tracer = LookupTracer()
+
+    def get_node_id(self):
+        return self._node[0]
+
+    def get_connection_string(self):
+        return self._node[1]
+
+    def get_successor(self):
+        return self._node
+
+    def echo(self, value):
+        return value
+
+    def fail(self):
+        raise xmlrpc.client.Fault(42, "failed on purpose")
+
+    def lookup_step(self, identifier, candidate_count=0, trace_id=None):
+        self.calls[identifier] = self.calls.get(identifier, 0) + 1
+        time.sleep(self._delays.get(identifier, 0))
+        return self._steps[identifier]
+
+    def get_key(self, key, check_owner=False):
+        return self._node[0]
+
+
+class TestAsyncRPCAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            self.run_async(server.stop())
+
+        async def cancel_tasks():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.run_async(cancel_tasks())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+
+    def run_async(self, coroutine, timeout=10):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def serve(self, node_id, steps=None, delays=None):
+        listener = socket.socket()
+        listener.bind(("localhost", 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        node = DummyNode(node_id, "localhost:{}".format(port), steps, delays)
+        server = AsyncChordServer(node, executor_workers=8)
+        self.run_async(server.start("localhost", port))
+        self.servers.append(server)
+        return node
+
+    def test_round_trip(self):
+        node = self.serve(100000)
+        host, port = node.get_connection_string().split(":")
+        client = ChordSocketClient(host, port)
+        self.assertEqual([100000, node.get_connection_string()], list(client.get_successor()))
+        self.assertEqual({5: [b"x"]}, client.echo({5: [b"x"]}))
+        with self.assertRaises(xmlrpc.client.Fault) as context:
+            client.fail()
+        self.assertEqual(42, context.exception.faultCode)
+        client.close()
+
+        async def concurrent_calls():
+            async_client = AsyncChordClient(host, port)
+            results = await asyncio.gather(*[async_client.echo(i) for i in range(100)])
+            async_client.close()
+            return results
+        self.assertEqual(list(range(100)), self.run_async(concurrent_calls()))
+
+    def lookup_through_unreachable_peer(self, dead):
+        # local node 100000 points to the unreachable finger, its successor 300000 knows the answer
+        successor = self.serve(300000, {450000: ((300000, None), (500000, "localhost:1"), (300000, None))})
+        successor_node = (300000, successor.get_connection_string())
+        local = DummyNode(100000, "localhost:0", {450000: ((100000, "localhost:0"), successor_node, dead)})
+        local.location_cache.put(0, dead)
+        router = AsyncNodeRouter(local, None)
+        predecessor, owner = self.run_async(router.find_predecessor(450000)), \
+            self.run_async(router.find_successor(450000))
+        self.assertEqual(300000, predecessor[0])
+        self.assertEqual(500000, owner[0])
+        # the unreachable peer is no longer cached as owner
+        self.assertIsNone(local.location_cache.get(1))
+
+    def test_lookup_falls_back_on_dead_peer(self):
+        listener = socket.socket()
+        listener.bind(("localhost", 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        self.lookup_through_unreachable_peer((400000, "localhost:{}".format(port)))
+
+    def test_lookup_falls_back_on_hung_peer(self):
+        # accepts connections but never answers, the hop runs into lookup_hop_timeout
+        listener = socket.socket()
+        listener.bind(("localhost", 0))
+        listener.listen(8)
+        try:
+            self.lookup_through_unreachable_peer((400000, "localhost:{}".format(listener.getsockname()[1])))
+        finally:
+            listener.close()
+
+    def test_timed_out_hop_keeps_connection(self):
+        # slow lookup steps run on the executor of the peer, so they don't hold back its event loop
+        with mock.patch("messaging.async_rpc.INLINE_METHODS", INLINE_METHODS - {"lookup_step"}):
+            answer = ((300000, None), (500000, "localhost:1"), (300000, None))
+            peer = self.serve(300000, {450000: answer, 460000: answer}, {450000: 0.2, 460000: 0.6})
+            peer_node = (300000, peer.get_connection_string())
+            local = DummyNode(100000, "localhost:0", {identifier: ((100000, "localhost:0"), peer_node, peer_node)
+                                                      for identifier in (450000, 460000)})
+            router = AsyncNodeRouter(local, None)
+            router._lookup_hop_timeout = 0.3
+            client = router.get_client(peer_node)
+
+            async def concurrent_lookups():
+                slow = asyncio.ensure_future(router.find_successor(460000))
+                await asyncio.sleep(0.2)
+                # in flight on the same connection while the slow hop times out
+                return await asyncio.gather(slow, router.find_successor(450000), return_exceptions=True)
+            slow, fast = self.run_async(concurrent_lookups())
+        self.assertIsInstance(slow, asyncio.TimeoutError)
+        self.assertEqual(500000, fast[0])
+        self.assertEqual(1, peer.calls[450000])
+        self.assertIs(client, router.get_client(peer_node))
+        self.assertEqual({}, client._pending)
+
+    def test_route_falls_back_on_stalled_owner(self):
+        # cached owner accepts connections but never answers, the lookup finds the owner
+        listener = socket.socket()
+        listener.bind(("localhost", 0))
+        listener.listen(8)
+        try:
+            owner = self.serve(500000)
+            owner_node = (500000, owner.get_connection_string())
+            successor = self.serve(300000, {450000: ((300000, None), owner_node, (300000, None))})
+            successor_node = (300000, successor.get_connection_string())
+            local = DummyNode(100000, "localhost:0",
+                              {450000: ((100000, "localhost:0"), successor_node, successor_node)})
+            stalled = (460000, "localhost:{}".format(listener.getsockname()[1]))
+            local.location_cache.put(400000, stalled)
+            router = AsyncNodeRouter(local, None)
+            router._peer_call_timeout = 0.3
+            self.assertEqual(500000, self.run_async(router.get(450000, hash_it=False, lookup_mode="iterative")))
+            self.assertEqual(owner_node, tuple(local.location_cache.get(450000)))
+        finally:
+            listener.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+This module tests the binary RPC engine (messaging.socket_messaging): the value encoding and a
+request/response round trip against a server spawned on localhost. No chord nodes are needed.
+"""
+
+
+import os
+import threading
+import unittest
+import xmlrpc.client
+from constants.configuration_constants import ConfigurationConstants
+os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.test.json")
+from messaging.socket_messaging import BinaryCodec, ChordSocketClient, ThreadedChordTCPServer, split_connection_string
+
+
+class DummyNode(object):
+
+    def get_successor(self):
+        return 300000, "localhost:5002"
+
+    def echo(self, value):
+        return value
+
+    def fail(self):
+        raise xmlrpc.client.Fault(42, "failed on purpose")
+
+    def _hidden(self):
+        return True
+
+
+class DummyVirtualNode(DummyNode):
+
+    def get_successor(self):
+        return 500000, "localhost:5002/v1"
+
+
+class TestBinaryRPCAutomated(unittest.TestCase):
+
+    _server = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._server = ThreadedChordTCPServer(("localhost", 0))
+        cls._server.register_instance(DummyNode())
+        cls._server.register_virtual_node("/v1", DummyVirtualNode())
+        threading.Thread(target=cls._server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def test_codec_round_trip(self):
+        values = [None, True, False, 0, 1, -1, 2**64 + 7, -2**40, 1.5, "", "ip:port", b"\x00\xff",
+                  (100000, "localhost:5001"), [1, [2, (3,)]], {1: True, "a": None}]
+        for value in values:
+            self.assertEqual(value, BinaryCodec.decode(BinaryCodec.encode(value)))
+        self.assertIsInstance(BinaryCodec.decode(BinaryCodec.encode((1, 2))), tuple)
+
+    def test_codec_is_compact(self):
+        self.assertLess(len(BinaryCodec.encode((1000000, "localhost:5001"))), 24)
+
+    def test_remote_call(self):
+        client = ChordSocketClient("localhost", self._server.server_address[1])
+        self.assertEqual((300000, "localhost:5002"), client.get_successor())
+        self.assertEqual({5: [b"x"]}, client.echo({5: [b"x"]}))
+        client.close()
+
+    def test_remote_fault(self):
+        client = ChordSocketClient("localhost", self._server.server_address[1])
+        with self.assertRaises(xmlrpc.client.Fault) as context:
+            client.fail()
+        self.assertEqual(42, context.exception.faultCode)
+        with self.assertRaises(xmlrpc.client.Fault):
+            client._hidden()
+        # connection is still usable after faults
+        self.assertEqual(1, client.echo(1))
+        client.close()
+
+    def test_virtual_node(self):
+        self.assertEqual(("localhost", "5002", "/RPC2"), split_connection_string("localhost:5002"))
+        self.assertEqual(("localhost", "5002", "/v1"), split_connection_string("localhost:5002/v1"))
+        client = ChordSocketClient("localhost", self._server.server_address[1], "/v1")
+        self.assertEqual((500000, "localhost:5002/v1"), client.get_successor())
+        client.close()
+        client = ChordSocketClient("localhost", self._server.server_address[1], "/v2")
+        with self.assertRaises(xmlrpc.client.Fault):
+            client.get_successor()
+        client.close()
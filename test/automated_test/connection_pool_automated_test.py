@@ -0,0 +1,92 @@
+"""
+This module tests the keep-alive connection pool used for node to node communication.
+A small XML RPC server is spawned on localhost for the tests, no chord nodes are needed.
+"""
+
+
+import socket
+import socketserver
+import threading
+import time
+import unittest
+from xmlrpc import server
+from messaging.connection_pool import ConnectionPool
+
+
+class KeepAliveHandler(server.SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/', '/RPC2',)
+    protocol_version = "HTTP/1.1"
+
+
+class KeepAliveServer(socketserver.ThreadingMixIn, server.SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+class TestConnectionPoolAutomated(unittest.TestCase):
+
+    _server = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._server = KeepAliveServer(("localhost", 0), KeepAliveHandler, allow_none=True,
+                                     logRequests=False)
+        cls._server.register_function(lambda x, y: x + y, "add")
+        cls._server.register_function(lambda seconds: time.sleep(seconds) or True, "sleep")
+        threading.Thread(target=cls._server.serve_forever, daemon=True).start()
+        cls.connection_string = "localhost:" + str(cls._server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def test_connection_reused(self):
+        pool = ConnectionPool(max_size=4, max_size_per_peer=2, idle_timeout=30)
+        client = pool.get_client(self.connection_string)
+        for i in range(5):
+            self.assertEqual(i + 1, client.add(i, 1))
+        stats = pool.get_stats()
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(4, stats["hits"])
+        self.assertEqual(1, stats["idle"])
+        pool.close()
+
+    def test_idle_connection_evicted(self):
+        pool = ConnectionPool(max_size=4, max_size_per_peer=2, idle_timeout=0)
+        client = pool.get_client(self.connection_string)
+        client.add(1, 1)
+        client.add(1, 1)
+        stats = pool.get_stats()
+        self.assertEqual(2, stats["misses"])
+        self.assertEqual(1, stats["evictions"])
+        pool.close()
+
+    def test_reconnect_after_failure(self):
+        pool = ConnectionPool(max_size=4, max_size_per_peer=2, idle_timeout=30)
+        client = pool.get_client(self.connection_string)
+        client.add(1, 1)
+        # break the idle connection underneath the pool
+        connection, _ = pool.acquire(self.connection_string)
+        connection.proxy("transport")._connection[1].sock.close()
+        pool.release(connection)
+        self.assertEqual(3, client.add(1, 2))
+        self.assertEqual(1, pool.get_stats()["reconnects"])
+        pool.close()
+
+    def test_unknown_peer_raises(self):
+        pool = ConnectionPool()
+        with self.assertRaises(OSError):
+            pool.get_client("localhost:1").add(1, 1)
+
+    def test_timed_out_call_not_retried(self):
+        pool = ConnectionPool(max_size=4, max_size_per_peer=2, idle_timeout=30)
+        client = pool.get_client(self.connection_string, timeout=0.2)
+        client.add(1, 1)
+        with self.assertRaises(socket.timeout):
+            client.sleep(1)
+        stats = pool.get_stats()
+        self.assertEqual(0, stats["reconnects"])
+        self.assertEqual(1, stats["discarded"])
+        # a client without timeout keeps waiting for slow calls
+        self.assertTrue(pool.get_client(self.connection_string).sleep(0.3))
+        pool.close()
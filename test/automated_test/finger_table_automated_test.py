@@ -0,0 +1,94 @@
+"""
+This module tests the sorted finger index of the finger table. No chord nodes are needed.
+"""
+
+
+import os
+import threading
+import unittest
+from constants.configuration_constants import ConfigurationConstants
+os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.test.json")
+from chord.node import Finger, FingerTable
+from chord.ring import get_ring
+
+
+class TestFingerTableAutomated(unittest.TestCase):
+
+    m = 20
+    ring = [100000, 300000, 500000, 700000, 900000]
+
+    def build_table(self, node_id):
+        table = FingerTable(self.m, node_id)
+        for i in range(1, self.m + 1):
+            start = (node_id + 2 ** (i - 1)) % 2 ** self.m
+            node = min([n for n in self.ring if n >= start] or [self.ring[0]])
+            finger = Finger("localhost", node, 5000 + self.ring.index(node), i, node_id)
+            finger.set_node(node)
+            table.update_finger_at_ith_position(i - 1, finger)
+        return table
+
+    def test_duplicate_fingers_collapse(self):
+        table = self.build_table(100000)
+        # fingers 1 to 18 all point to the successor, 19 and 20 to 500000 and 700000
+        self.assertEqual(3, str(table).count("\n") - 2)
+        self.assertIn("| 300000 | localhost:5001 | 1, 2, 3", str(table))
+
+    def test_closest_preceding_finger(self):
+        table = self.build_table(100000)
+        self.assertEqual((300000, "localhost:5001"), table.closest_preceding_finger(400000))
+        self.assertEqual((700000, "localhost:5003"), table.closest_preceding_finger(800000))
+        # wrapping past zero
+        self.assertEqual((700000, "localhost:5003"), table.closest_preceding_finger(50000))
+        # nothing between the node and its successor
+        self.assertIsNone(table.closest_preceding_finger(200000))
+        # the node's own id stands for the whole ring
+        self.assertEqual((700000, "localhost:5003"), table.closest_preceding_finger(100000))
+
+    def test_virtual_node_finger_copy(self):
+        finger = Finger("localhost", 300000, "5001", 3, 100000)
+        finger.set_connection_string("localhost:5001/v2")
+        copy = finger.create_copy(200000)
+        self.assertEqual(("localhost", "5001", "localhost:5001/v2"),
+                         (copy.get_ip(), copy.get_port(), copy.get_connection_string()))
+
+    def test_concurrent_updates(self):
+        table = FingerTable(self.m, 100000)
+        node = self.ring[1]
+
+        def update(first):
+            # every thread sets its own fingers, none may be lost
+            for i in range(first, self.m, 4):
+                finger = Finger("localhost", node, 5001, i + 1, 100000)
+                finger.set_node(node)
+                table.update_finger_at_ith_position(i, finger)
+                table.closest_preceding_finger(800000)
+
+        threads = [threading.Thread(target=update, args=(first,)) for first in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(table.get_finger_ith(i) for i in range(self.m)))
+        self.assertIn("| 300000 | localhost:5001 | 1, 2, 3", str(table))
+
+    def test_ring_arithmetic(self):
+        ring = get_ring(self.m)
+        self.assertIs(ring, get_ring(self.m))
+        self.assertEqual(100001, ring.finger_start(100000, 1))
+        self.assertEqual((1000000 + 2 ** 19) % 2 ** 20, ring.finger_start(1000000, 20))
+        self.assertEqual(2 ** 20 - 5, ring.go_back(5, 10))
+        finger = Finger("localhost", 300000, 5001, 3, 100000, ring)
+        self.assertEqual(100004, finger.start)
+        finger.set_finger_number(4)
+        self.assertEqual(100008, finger.start)
+        self.assertFalse(hasattr(finger, "__dict__"))
+
+    def test_owned_fractions(self):
+        ring = get_ring(self.m)
+        self.assertEqual({100000: 1.0}, ring.owned_fractions([100000]))
+        fractions = ring.owned_fractions([100000, 2 ** 19 + 100000, 100000])
+        self.assertEqual({100000: 0.5, 2 ** 19 + 100000: 0.5}, fractions)
+        fractions = ring.owned_fractions(self.ring)
+        self.assertAlmostEqual(1.0, sum(fractions.values()))
+        self.assertEqual((2 ** 20 - 800000) / 2 ** 20, fractions[100000])
@@ -0,0 +1,133 @@
+"""
+This module tests the sorted key store of the chord nodes. No chord nodes are needed.
+"""
+
+
+import random
+import unittest
+from chord import ring_intervals
+from constants.chord_constants import ChordConstants
+from chord.key_store import KeyStore, CompactKeyStore, SortedKeyIndex, create_key_store
+
+
+def sharded_dict_store(data=None):
+    return create_key_store(ChordConstants.STORE_BACKEND_DICT, data, shards=4)
+
+
+def sharded_compact_store(data=None):
+    return create_key_store(ChordConstants.STORE_BACKEND_COMPACT, data, shards=4)
+
+
+BACKENDS = (KeyStore, CompactKeyStore, sharded_dict_store, sharded_compact_store)
+
+
+class TestKeyStoreAutomated(unittest.TestCase):
+
+    def setUp(self):
+        # small blocks and merges so the tests go through block splits, removals and merges
+        self._load = SortedKeyIndex.load
+        self._merge_threshold = CompactKeyStore.merge_threshold
+        SortedKeyIndex.load = 4
+        CompactKeyStore.merge_threshold = 8
+        random.seed(11)
+        self.keys = random.sample(range(1000), 200)
+
+    def tearDown(self):
+        SortedKeyIndex.load = self._load
+        CompactKeyStore.merge_threshold = self._merge_threshold
+
+    def test_dictionary_operations(self):
+        for backend in BACKENDS:
+            self.check_dictionary_operations(backend())
+
+    def check_dictionary_operations(self, store):
+        for key in self.keys:
+            store[key] = key % 2 == 0
+        del store[self.keys[0]]
+        self.assertEqual(self.keys[1] % 2 == 0, store.pop(self.keys[1]))
+        self.assertIsNone(store.pop(-1, None))
+        self.assertEqual(198, len(store))
+        self.assertEqual(sorted(self.keys[2:]), store.keys())
+        self.assertNotIn(self.keys[0], store)
+        self.assertEqual(self.keys[5] % 2 == 0, store[self.keys[5]])
+        self.assertEqual(dict(store.items()), store.to_dict())
+
+    def test_ring_intervals(self):
+        for backend in BACKENDS:
+            self.check_ring_intervals(backend({key: key % 3 == 0 for key in self.keys}))
+
+    def check_ring_intervals(self, store):
+        for lower, higher in ((100, 600), (600, 100), (self.keys[3], self.keys[7]), (self.keys[3], self.keys[3]),
+                              (0, 999), (999, 0), (500, 500)):
+            for type in ('c', 'l', 'r', 'o'):
+                expected = sorted(ring_intervals.select_in_interval(self.keys, lower, higher, type))
+                self.assertEqual(expected, sorted(store.keys_in_range(lower, higher, type)), (lower, higher, type))
+
+    def test_pop_range(self):
+        for backend in BACKENDS:
+            self.check_pop_range(backend(dict.fromkeys(self.keys, True)))
+
+    def check_pop_range(self, store):
+        # wrapping past zero
+        moved = store.pop_range(900, 50, 'o')
+        expected = [key for key in self.keys if key > 900 or key < 50]
+        self.assertEqual(sorted(expected), sorted(moved))
+        self.assertEqual(sorted(set(self.keys) - set(expected)), store.keys())
+        self.assertEqual([], store.keys_in_range(900, 50, 'o'))
+        store[950] = False
+        self.assertEqual({950: False}, store.pop_range(900, 50, 'r'))
+        self.assertEqual(len(self.keys) - len(expected), len(store))
+
+    def test_keys_page(self):
+        for backend in BACKENDS:
+            self.check_keys_page(backend({key: key % 3 == 0 for key in self.keys}))
+
+    def check_keys_page(self, store):
+        ordered = sorted(self.keys)
+        for lower, higher, limit in ((0, 999, 7), (100, 600, 1000), (ordered[5], ordered[5], 3), (601, 602, 5)):
+            expected = [key for key in ordered if lower <= key <= higher][:limit]
+            self.assertEqual(expected, store.keys_page(lower, higher, limit), (lower, higher, limit))
+
+        # walking the pages gives every key once
+        keys, cursor = [], 0
+        while True:
+            page = store.keys_page(cursor, 999, 9)
+            keys.extend(page)
+            if len(page) < 9:
+                break
+            cursor = page[-1] + 1
+        self.assertEqual(ordered, keys)
+
+    def test_replication_arrays(self):
+        data = {key: key % 3 == 0 for key in self.keys}
+        for backend in BACKENDS:
+            store = backend(data)
+            del store[self.keys[0]]
+            store[self.keys[1]] = not data[self.keys[1]]
+            expected = dict(data)
+            del expected[self.keys[0]]
+            expected[self.keys[1]] = not data[self.keys[1]]
+            self.assertEqual(sorted(key for key in expected if expected[key]), sorted(store.owned_keys().tolist()))
+            self.assertEqual(sorted(key for key in expected if not expected[key]),
+                             sorted(store.replica_keys().tolist()))
+            self.assertEqual(expected, store.to_dict())
+            stats = store.get_stats()
+            self.assertEqual(len(expected), stats["keys"])
+            self.assertGreater(stats["bytes_per_key"], 0)
+
+    def test_compact_arrays_read_only(self):
+        store = CompactKeyStore({key: key % 3 == 0 for key in self.keys})
+        owned = store.owned_keys()
+        with self.assertRaises(ValueError):
+            owned[0] = 1
+        with self.assertRaises(ValueError):
+            store.replica_keys().sort()
+        # later updates don't show through arrays given out before
+        before = owned.tolist()
+        store.pop_range(0, 999, 'c')
+        self.assertEqual(before, owned.tolist())
+        self.assertEqual(0, len(store.owned_keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+This module tests the key to owner location cache of the chord nodes. No chord nodes are needed.
+"""
+
+
+import time
+import unittest
+from chord.location_cache import LocationCache
+
+
+class TestLocationCacheAutomated(unittest.TestCase):
+
+    def test_range_lookup(self):
+        cache = LocationCache(max_entries=8, ttl=30)
+        cache.put(100, (300, "localhost:5002"))
+        cache.put(900, (100, "localhost:5001"))
+        self.assertEqual((300, "localhost:5002"), cache.get(300))
+        self.assertEqual((300, "localhost:5002"), cache.get(101))
+        self.assertIsNone(cache.get(100 + 500))
+        # range wrapping around the ring
+        self.assertEqual((100, "localhost:5001"), cache.get(950))
+        self.assertEqual((100, "localhost:5001"), cache.get(5))
+        stats = cache.get_stats()
+        self.assertEqual(4, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+
+    def test_newer_range_replaces_overlapping_ones(self):
+        cache = LocationCache(max_entries=8, ttl=30)
+        cache.put(100, (500, "localhost:5003"))
+        # node 300 joined in between
+        cache.put(100, (300, "localhost:5002"))
+        self.assertEqual((300, "localhost:5002"), cache.get(200))
+        self.assertEqual((500, "localhost:5003"), cache.get(400))
+        self.assertIsNone(cache.get(50))
+
+    def test_lru_eviction_and_ttl(self):
+        cache = LocationCache(max_entries=2, ttl=30)
+        cache.put(0, (10, "localhost:5001"))
+        cache.put(10, (20, "localhost:5002"))
+        cache.get(5)
+        cache.put(20, (30, "localhost:5003"))
+        self.assertIsNotNone(cache.get(5))
+        self.assertIsNone(cache.get(15))
+        self.assertEqual(1, cache.get_stats()["evictions"])
+
+        cache = LocationCache(max_entries=2, ttl=0.01)
+        cache.put(0, (10, "localhost:5001"))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(5))
+        self.assertEqual(1, cache.get_stats()["expired"])
+
+    def test_invalidation(self):
+        cache = LocationCache(max_entries=8, ttl=30)
+        cache.put(0, (10, "localhost:5001"))
+        cache.put(10, (20, "localhost:5002"))
+        cache.report_wrong_owner((10, "localhost:5001"))
+        self.assertIsNone(cache.get(5))
+        self.assertIsNotNone(cache.get(15))
+        cache.invalidate()
+        self.assertIsNone(cache.get(15))
+        self.assertEqual(1, cache.get_stats()["wrong_owner"])
@@ -0,0 +1,89 @@
+"""
+This module tests the on disk store of the chord nodes. No chord nodes are needed.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from chord.log_store import SegmentLog, LogKeyStore, LogValueStore, expiry_record
+
+
+class TestLogStoreAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self, segment_size=4096):
+        log = SegmentLog(self.directory, segment_size, sync=False, compaction_interval=0)
+        return log, LogKeyStore(log), LogValueStore(log)
+
+    def test_restart(self):
+        log, keys, values = self.open()
+        keys.update({key: key % 2 == 0 for key in range(100)})
+        for key in range(0, 100, 10):
+            values.put(key, bytes([key]) * key)
+        del keys[1]
+        keys[2] = False
+        self.assertEqual({key: key % 2 == 0 for key in range(50, 60)}, keys.pop_range(49, 59, 'r'))
+        values.pop(10)
+        values.pop_many([20, 30])
+        log.write([expiry_record(4, 1700000000.25), expiry_record(6, 1700000001.0), expiry_record(6, None)])
+        expected_keys = keys.to_dict()
+        expected_values = {key: bytes(value) for key, value in values.items()}
+        log.close()
+
+        log, keys, values = self.open()
+        self.assertEqual(expected_keys, keys.to_dict())
+        self.assertEqual(expected_values, {key: bytes(value) for key, value in values.items()})
+        self.assertEqual(len(expected_values), values.get_stats()["values"])
+        self.assertEqual(b"\x28" * 40, bytes(values.get(40)))
+        self.assertEqual({4: 1700000000.25}, log.take_recovered_expiries())
+        log.close()
+
+    def test_compaction(self):
+        log, keys, values = self.open(segment_size=1024)
+        for round in range(20):
+            for key in range(10):
+                values.put(key, bytes([round]) * 50)
+        keys.update(dict.fromkeys(range(10), True))
+        keys.clear()
+        segments = log.get_stats()["segments"]
+        self.assertGreater(log.compact(), 0)
+        stats = log.get_stats()
+        self.assertLess(stats["segments"], segments)
+        self.assertEqual({key: b"\x13" * 50 for key in range(10)},
+                         {key: bytes(value) for key, value in values.items()})
+        log.close()
+
+        log, keys, values = self.open(segment_size=1024)
+        self.assertEqual({}, keys.to_dict())
+        self.assertEqual(b"\x13" * 50, bytes(values.get(3)))
+        log.close()
+
+    def test_torn_record(self):
+        log, keys, values = self.open()
+        keys.update({1: True, 2: False})
+        values.put(1, b"value")
+        log.close()
+        segment = os.path.join(self.directory, sorted(os.listdir(self.directory))[-1])
+        with open(segment, "r+b") as segment_file:
+            segment_file.truncate(os.path.getsize(segment) - 2)
+
+        log, keys, values = self.open()
+        self.assertEqual({1: True, 2: False}, keys.to_dict())
+        self.assertIsNone(values.get(1))
+        self.assertGreater(log.get_stats()["truncated_bytes"], 0)
+        values.put(1, b"again")
+        log.close()
+        log, keys, values = self.open()
+        self.assertEqual(b"again", bytes(values.get(1)))
+        log.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
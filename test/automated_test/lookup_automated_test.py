@@ -0,0 +1,76 @@
+"""
+This module tests the iterative lookups of chord.node.Node on a simulated ring: the answer of lookup_step, lookups
+served without leaving the node, and hops at which the lookup makes no progress.
+"""
+
+
+import unittest
+from test.automated_test.simulated_ring import SimulatedRing
+from chord.node import LOOKUP_MAX_HOPS
+
+
+class TestLookupAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing([1000, 90000, 200000, 310000, 480000, 650000, 800000, 950000])
+
+    def test_lookup_step(self):
+        node = self.ring.by_id[90000]
+        identifier = 700000
+        step = node.lookup_step(identifier)
+        self.assertEqual(3, len(step))
+        self.assertEqual(self.ring.entry(90000), step[0])
+        self.assertEqual(self.ring.entry(200000), step[1])
+        self.assertEqual(self.ring.entry(self.ring.predecessor_of(identifier)), step[2])
+
+        # candidates precede identifier, closest to it first
+        candidates = node.lookup_step(identifier, 3)[3]
+        self.assertEqual(step[2], candidates[0])
+        offsets = [(candidate[0] - 90000) % node._ring.size for candidate in candidates]
+        self.assertEqual(sorted(offsets, reverse=True), offsets)
+        self.assertTrue(all(offset < identifier - 90000 for offset in offsets))
+
+    def test_lookup_finds_owner(self):
+        for node_id in self.ring.ordered:
+            node = self.ring.by_id[node_id]
+            for identifier in (0, 1000, 1001, 250000, 650000, 949999, 960000, 1048575):
+                self.assertEqual(self.ring.entry(self.ring.owner_of(identifier)), node.find_successor(identifier))
+                self.assertEqual(self.ring.entry(self.ring.predecessor_of(identifier)),
+                                 node.find_predecessor(identifier))
+
+    def test_local_short_circuit(self):
+        node = self.ring.by_id[310000]
+        # owned by the successor, answered by the node itself without calling any peer
+        self.assertEqual(self.ring.entry(480000), node.find_successor(400000))
+        self.assertEqual(0, self.ring.count_calls("lookup_step"))
+
+        node.find_successor(900000)
+        self.assertGreater(self.ring.count_calls("lookup_step"), 0)
+
+    def lag_finger_table(self, node_id):
+        # finger table and successor list not caught up yet, the node knows no node preceding any identifier
+        node = self.ring.by_id[node_id]
+        node.closest_preceding_finger = lambda identifier: self.ring.entry(node_id)
+        node._preceding_nodes = lambda identifier, count: []
+
+    def test_no_progress_continues_with_successor(self):
+        self.lag_finger_table(200000)
+        self.lag_finger_table(310000)
+        start = self.ring.by_id[90000]
+        for lookup in (start._iterative_lookup, start._parallel_lookup, self.ring.by_id[200000]._iterative_lookup):
+            self.assertEqual((self.ring.entry(480000), self.ring.entry(650000)), tuple(map(tuple, lookup(500000))))
+
+    def test_lookup_in_circles_gives_up(self):
+        # two nodes pointing at each other for an identifier neither of them precedes
+        first, second = self.ring.by_id[200000], self.ring.by_id[480000]
+        first.closest_preceding_finger = lambda identifier: self.ring.entry(480000)
+        second.closest_preceding_finger = lambda identifier: self.ring.entry(200000)
+        with self.assertRaises(Exception) as context:
+            first.find_successor(900000)
+        self.assertIn("gave up", str(context.exception))
+        # every other hop is answered by the first node itself
+        self.assertEqual(LOOKUP_MAX_HOPS // 2, self.ring.count_calls("lookup_step"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+This module tests the lookup tracing of the chord nodes. No chord nodes are needed.
+"""
+
+
+import unittest
+from chord.tracing import LookupTracer
+
+
+class TestLookupTracingAutomated(unittest.TestCase):
+
+    def test_disabled_tracer(self):
+        tracer = LookupTracer(enabled=False)
+        self.assertIsNone(tracer.start(10))
+        self.assertEqual(0, tracer.get_stats()["lookups"])
+
+    def test_histograms_and_peers(self):
+        tracer = LookupTracer(enabled=True, window=2, history=1)
+        for hops in ([0.0002, 0.003], [0.0004], [0.0002, 0.004, 2.0]):
+            trace = tracer.start(10)
+            for latency in hops:
+                trace.add_hop((1, "localhost:5001"), latency, retries=1)
+            tracer.finish(trace)
+
+        stats = tracer.get_stats()
+        self.assertEqual(3, stats["lookups"])
+        # only the last two lookups are in the window
+        self.assertEqual({"1": 1, "3": 1}, stats["hop_count_histogram"])
+        self.assertEqual(2.0, stats["mean_hops"])
+        self.assertEqual(1, stats["hop_latency_histogram_ms"]["<=0.25"])
+        self.assertEqual(1, stats["hop_latency_histogram_ms"]["<=0.5"])
+        self.assertEqual(1, stats["hop_latency_histogram_ms"]["<=5"])
+        self.assertEqual(1, stats["hop_latency_histogram_ms"][">1000"])
+        self.assertEqual(6, stats["peers"]["localhost:5001"]["hops"])
+        self.assertEqual(6, stats["peers"]["localhost:5001"]["retries"])
+
+        traces = tracer.get_traces(10)
+        self.assertEqual(1, len(traces))
+        self.assertEqual(3, traces[0]["hop_count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
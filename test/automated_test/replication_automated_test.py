@@ -0,0 +1,93 @@
+"""
+This module tests how chord.node.Node keeps the replicas of its keys on its successors on a simulated ring: keys
+set, deleted and expired on the owner.
+"""
+
+
+import time
+import unittest
+from test.automated_test.simulated_ring import SimulatedRing
+
+
+class TestReplicationAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing([1000, 90000, 200000, 310000, 480000, 650000, 800000, 950000])
+        self.owner = self.ring.by_id[480000]
+        self.successors = [self.ring.by_id[node_id] for node_id in (650000, 800000, 950000)]
+
+    def replicas(self, key):
+        return [node.get_store().get(key) for node in self.successors]
+
+    def test_delete_removes_replicas(self):
+        self.owner.set(400000, hash_it=False, value=b"value")
+        self.assertEqual([False] * 3, self.replicas(400000))
+        self.assertEqual([b"value"] * 3, [node._values.get(400000) for node in self.successors])
+        self.owner.delete(400000, hash_it=False)
+        self.assertEqual([None] * 3, self.replicas(400000))
+        self.assertEqual([None] * 3, [node._values.get(400000) for node in self.successors])
+        self.assertEqual(3, self.ring.count_calls("delete_replicas"))
+
+    def test_multi_delete_one_call_per_successor(self):
+        keys = [400000, 420000, 460000]
+        self.owner.multi_set(keys, hash_it=False)
+        self.owner.multi_delete(keys + [470000], hash_it=False)
+        self.assertEqual(3, self.ring.count_calls("delete_replicas"))
+        for key in keys:
+            self.assertEqual([None] * 3, self.replicas(key))
+
+    def test_owned_keys_not_removed(self):
+        self.successors[0].get_store()[400000] = True
+        self.successors[0].delete_replicas([400000])
+        self.assertTrue(self.successors[0].get_store()[400000])
+
+    def test_expiry_removes_replicas(self):
+        self.owner.set(400000, hash_it=False, ttl=0.01)
+        self.assertEqual([False] * 3, self.replicas(400000))
+        deadline = time.monotonic() + 5
+        while not self.owner.expire_keys():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+        # removed before the replicas' own timer wheels ran
+        self.assertEqual([None] * 3, self.replicas(400000))
+
+    def test_unreachable_successor_skipped(self):
+        self.owner.set(400000, hash_it=False)
+        self.ring.down.add(self.successors[1].get_connection_string())
+        self.owner.delete(400000, hash_it=False)
+        self.assertEqual([None, False, None], self.replicas(400000))
+
+    def test_distinct_successors(self):
+        ring = SimulatedRing([100000, 600000])
+        node = ring.by_id[100000]
+        # the successor list of a two node ring names the other node twice and the node itself
+        self.assertEqual(2, len(set(node.get_successor_list())))
+        node.set(50000, hash_it=False)
+        self.assertEqual(1, ring.count_calls("receive_keys_before_leave"))
+        node.delete(50000, hash_it=False)
+        self.assertEqual(1, ring.count_calls("delete_replicas"))
+
+
+class TestVirtualNodeReplicationAutomated(unittest.TestCase):
+
+    def test_replicas_on_other_servers(self):
+        # servers 0 and 1 host three virtual nodes each, next to each other on the ring
+        ring = SimulatedRing([100000, 200000, 300000, 400000, 500000, 600000], servers={
+            100000: 0, 200000: 0, 300000: 1, 400000: 1, 500000: 1, 600000: 0})
+        owner = ring.by_id[100000]
+        self.assertEqual(["localhost:6000/v1", "localhost:6001", "localhost:6001/v1"],
+                         [successor[1] for successor in owner.get_successor_list()])
+        owner.set(50000, hash_it=False)
+        # the sibling virtual node is skipped, the first node of the other server gets the only replica
+        self.assertEqual([None, False, None], [ring.by_id[node_id].get_store().get(50000)
+                                               for node_id in (200000, 300000, 400000)])
+
+    def test_virtual_node_fingers(self):
+        ring = SimulatedRing([100000, 300000], servers={100000: 0, 300000: 0})
+        finger = ring.by_id[100000]._new_finger(ring.entry(300000), 2)
+        self.assertEqual(("localhost", "6000", "localhost:6000/v1"),
+                         (finger.get_ip(), finger.get_port(), finger.get_connection_string()))
+
+
+if __name__ == "__main__":
+    unittest.main()
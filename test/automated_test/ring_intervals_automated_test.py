@@ -0,0 +1,34 @@
+"""
+This module tests the vectorized ring interval classification against Node.in_bracket. No chord nodes are needed.
+"""
+
+
+import os
+import unittest
+from constants.configuration_constants import ConfigurationConstants
+os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.test.json")
+from chord import ring_intervals
+from chord.node import Node
+
+
+class TestRingIntervalsAutomated(unittest.TestCase):
+
+    def test_same_semantics_as_in_bracket(self):
+        # small ring, every interval and type, including wrapping and lower == higher
+        ids = list(range(8))
+        for lower in ids:
+            for higher in ids:
+                for type in ('c', 'l', 'r', 'o'):
+                    expected = [Node.in_bracket(None, i, [lower, higher], type) for i in ids]
+                    self.assertEqual(expected, ring_intervals.in_interval(ids, lower, higher, type).tolist(),
+                                     (lower, higher, type))
+
+    def test_large_identifiers(self):
+        ids = [2 ** 70, 5, 2 ** 64 + 1]
+        self.assertEqual([2 ** 70, 2 ** 64 + 1], ring_intervals.select_in_interval(ids, 2 ** 64, 4, 'o'))
+        self.assertEqual([], ring_intervals.select_in_interval([], 1, 10, 'c'))
+
+
+if __name__ == "__main__":
+    unittest.main()
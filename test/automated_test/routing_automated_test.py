@@ -0,0 +1,314 @@
+"""
+This module tests how chord.node.Node routes on a simulated ring: operations served by the local node in process
+next hops and fingers picked by proximity, owners found in the successor list, hedged lookup hops and multi key
+requests grouped by owner.
+"""
+
+
+import concurrent.futures
+import time
+import unittest
+from test.automated_test.simulated_ring import SimulatedRing
+from messaging.connection_pool import ConnectionPoolManager
+
+
+RING = [1000, 90000, 200000, 310000, 480000, 650000, 800000, 950000]
+
+
+class TestLocalRoutingAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing(RING)
+
+    def test_owned_key_stays_local(self):
+        node = self.ring.by_id[310000]
+        entry = self.ring.entry(310000)
+        self.assertEqual(entry, tuple(node.set(250000, hash_it=False)))
+        self.assertEqual(entry, tuple(node.get(250000, hash_it=False)))
+        self.assertEqual(entry, tuple(node.delete(250000, hash_it=False)))
+        for operation in ("lookup_step", "set_key", "get_key", "delete_key"):
+            self.assertEqual(0, self.ring.count_calls(operation))
+
+    def test_remote_owner(self):
+        node = self.ring.by_id[310000]
+        self.assertEqual(self.ring.entry(800000), tuple(node.set(700000, hash_it=False)))
+        self.assertEqual(1, self.ring.calls[(self.ring.entry(800000)[1], "set_key")])
+        self.assertTrue(self.ring.by_id[800000].get_key(700000))
+        # the hops on the local node are never sent through its own server
+        self.assertFalse([call for call in self.ring.calls if call[0] == node.get_connection_string()])
+
+    def test_settings_read_once(self):
+        class NoConfiguration(object):
+            def __getattr__(self, name):
+                raise AssertionError("configuration read per request: {}".format(name))
+        for peer in self.ring.by_id.values():
+            peer._config = NoConfiguration()
+        node = self.ring.by_id[310000]
+        self.assertEqual(self.ring.entry(800000), tuple(node.set(700000, value=b"x" * 100, hash_it=False)))
+        self.assertEqual(self.ring.entry(800000), tuple(node.get(700000, hash_it=False)))
+        self.assertEqual([self.ring.entry(800000)], [tuple(result) for result in node.multi_get([700000], False)])
+        self.assertEqual([700000], list(node.scan(650001, 800000)))
+        self.assertEqual(self.ring.entry(800000), tuple(node.delete(700000, hash_it=False)))
+
+    def test_batched_ownership(self):
+        # range of 1000 wraps past zero
+        node = self.ring.by_id[1000]
+        keys = [950000, 950001, 1048575, 0, 1000, 1001, 500000]
+        self.assertEqual(set(key for key in keys if not node._owns(key)), node._not_owned(keys))
+        self.assertEqual({950000, 1001, 500000}, node._not_owned(keys))
+
+
+class TestProximityRoutingAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing(RING)
+        ConnectionPoolManager.reset_connection_pool()
+        self.pool = ConnectionPoolManager.get_connection_pool()
+
+    def tearDown(self):
+        ConnectionPoolManager.reset_connection_pool()
+
+    def set_rtts(self, rtts):
+        for node_id, rtt in rtts.items():
+            self.pool._record_rtt(self.ring.entry(node_id)[1], rtt)
+
+    def test_next_hop_without_rtts(self):
+        node = self.ring.by_id[90000]
+        candidates = [self.ring.entry(800000), self.ring.entry(480000)]
+        self.assertEqual(self.ring.entry(800000), node._select_next_hop(900000, candidates))
+        self.assertEqual(0, node.get_proximity_stats()["selections"])
+
+    def test_next_hop_closest_when_rtts_alike(self):
+        node = self.ring.by_id[90000]
+        self.set_rtts({800000: 0.010, 480000: 0.009})
+        candidates = [self.ring.entry(800000), self.ring.entry(480000)]
+        # the few ms saved don't pay for the extra hops left from the farther candidate
+        self.assertEqual(self.ring.entry(800000), node._select_next_hop(900000, candidates))
+        self.assertEqual(1, node.get_proximity_stats()["selections"])
+        self.assertEqual(0, node.get_proximity_stats()["rerouted"])
+
+    def test_next_hop_avoids_slow_node(self):
+        node = self.ring.by_id[90000]
+        self.set_rtts({800000: 0.2, 480000: 0.001})
+        candidates = [self.ring.entry(800000), self.ring.entry(480000)]
+        self.assertEqual(self.ring.entry(480000), node._select_next_hop(900000, candidates))
+        stats = node.get_proximity_stats()
+        self.assertEqual(1, stats["rerouted"])
+        self.assertGreater(stats["estimated_latency_saved_ms"], 0)
+
+    def test_finger_node_lowest_rtt(self):
+        node = self.ring.by_id[90000]
+        # last finger covers [614288, 90000), the successor of its start and the nodes after it are candidates
+        self.set_rtts({650000: 0.05, 800000: 0.01, 950000: 0.02})
+        self.assertEqual(self.ring.entry(800000), node._select_finger_node(20, self.ring.entry(650000)))
+        # the candidate never called before is probed
+        self.assertEqual(1, self.ring.calls[(self.ring.entry(1000)[1], "get_node_id")])
+
+    def test_finger_node_stays_in_interval(self):
+        node = self.ring.by_id[90000]
+        # finger 19 covers [352144, 614288), 650000 and further are no candidates however fast
+        self.set_rtts({480000: 0.05, 650000: 0.001, 800000: 0.001})
+        self.assertEqual(self.ring.entry(480000), node._select_finger_node(19, self.ring.entry(480000)))
+
+    def test_finger_node_unreachable_successor(self):
+        node = self.ring.by_id[90000]
+        self.ring.down.add(self.ring.entry(650000)[1])
+        self.assertEqual(self.ring.entry(650000), node._select_finger_node(20, self.ring.entry(650000)))
+
+
+class TestSuccessorListRoutingAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing(RING)
+        self.node = self.ring.by_id[90000]
+
+    def test_owner_in_successor_list(self):
+        self.assertEqual((self.ring.entry(90000), self.ring.entry(200000)), self.node._successor_list_owner(150000))
+        self.assertEqual((self.ring.entry(310000), self.ring.entry(480000)), self.node._successor_list_owner(400000))
+        self.assertEqual((self.ring.entry(310000), self.ring.entry(480000)), self.node._successor_list_owner(480000))
+        # past the last successor, or the node's own keys
+        self.assertIsNone(self.node._successor_list_owner(480001))
+        self.assertIsNone(self.node._successor_list_owner(50000))
+
+    def test_untrusted_entries(self):
+        self.node.successor_list = [self.ring.entry(200000), self.ring.entry(200000), self.ring.entry(480000)]
+        self.assertEqual((self.ring.entry(90000), self.ring.entry(200000)), self.node._successor_list_owner(150000))
+        self.assertIsNone(self.node._successor_list_owner(400000))
+        self.node.successor_list = [self.ring.entry(310000), self.ring.entry(200000), self.ring.entry(480000)]
+        self.assertIsNone(self.node._successor_list_owner(400000))
+
+    def test_route_skips_lookup(self):
+        self.assertEqual(self.ring.entry(480000), tuple(self.node.set(400000, hash_it=False)))
+        self.assertEqual(0, self.ring.count_calls("lookup_step"))
+        self.assertEqual(1, self.ring.count_calls("set_key"))
+
+    def test_route_wrong_owner_hint(self):
+        # 480000 missing from a stale successor list, 650000 refuses the key and the key is looked up
+        self.node.successor_list = [self.ring.entry(200000), self.ring.entry(310000), self.ring.entry(650000)]
+        self.assertEqual(self.ring.entry(480000), tuple(self.node.set(400000, hash_it=False)))
+        self.assertEqual(1, self.ring.calls[(self.ring.entry(650000)[1], "set_key")])
+        self.assertGreater(self.ring.count_calls("lookup_step"), 0)
+        # 650000 only holds the replica sent by 480000
+        self.assertFalse(self.ring.by_id[650000].get_store()[400000])
+        self.assertEqual(1, self.node.location_cache.get_stats()["wrong_owner"])
+
+
+class TestHedgedRoutingAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing(RING)
+        self.node = self.ring.by_id[90000]
+        self.candidates = [self.ring.entry(800000), self.ring.entry(650000), self.ring.entry(480000)]
+        self.configure(parallelism=2, hedge_delay=0.1)
+
+    def tearDown(self):
+        if self.node._hedging_executor:
+            self.node._hedging_executor.shutdown()
+
+    def configure(self, parallelism, hedge_delay):
+        self.node._lookup_parallelism = parallelism
+        self.node._lookup_hedge_delay = hedge_delay
+
+    def step(self):
+        started = time.monotonic()
+        step = self.node._hedged_lookup_step(900000, self.candidates, 2)
+        return [tuple(entry) for entry in step[:2]], time.monotonic() - started
+
+    def calls(self, node_id):
+        return self.ring.calls[(self.ring.entry(node_id)[1], "lookup_step")]
+
+    def test_no_hedge_when_answered_in_time(self):
+        step, _ = self.step()
+        self.assertEqual([self.ring.entry(800000), self.ring.entry(950000)], step)
+        self.assertEqual((1, 0, 0), (self.calls(800000), self.calls(650000), self.calls(480000)))
+        self.assertEqual(0, self.node.get_hedging_stats()["hedges"])
+
+    def test_hedge_after_delay(self):
+        self.ring.delays[self.ring.entry(800000)[1]] = 0.5
+        step, elapsed = self.step()
+        # the second candidate is queried once the hedge delay passed and answers first
+        self.assertEqual(self.ring.entry(650000), step[0])
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertLess(elapsed, 0.4)
+        # parallelism 2, the third candidate is never queried
+        self.assertEqual((1, 1, 0), (self.calls(800000), self.calls(650000), self.calls(480000)))
+        stats = self.node.get_hedging_stats()
+        self.assertEqual((1, 2, 1, 1), (stats["hops"], stats["requests"], stats["hedges"], stats["hedge_wins"]))
+
+    def test_hedge_at_once_on_failure(self):
+        self.configure(parallelism=2, hedge_delay=1)
+        self.ring.down.add(self.ring.entry(800000)[1])
+        step, elapsed = self.step()
+        self.assertEqual(self.ring.entry(650000), step[0])
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(1, self.node.get_hedging_stats()["failed_requests"])
+
+    def test_all_candidates_failing(self):
+        self.ring.down.update(self.ring.nodes)
+        with self.assertRaises(ConnectionRefusedError):
+            self.step()
+        self.assertEqual(1, self.calls(480000))
+
+    def test_late_answer_ignored(self):
+        self.ring.delays[self.ring.entry(800000)[1]] = 0.3
+        step, _ = self.step()
+        self.assertEqual(self.ring.entry(650000), step[0])
+        time.sleep(0.4)
+        stats = self.node.get_hedging_stats()
+        self.assertEqual((1, 0), (stats["hops"], stats["failed_requests"]))
+
+    def test_queued_losers_cancelled(self):
+        # one worker, the hedges queue up behind the first query and are dropped once it answers
+        self.configure(parallelism=3, hedge_delay=0.02)
+        self.node._hedging_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.ring.delays[self.ring.entry(800000)[1]] = 0.2
+        self.ring.delays[self.ring.entry(650000)[1]] = 0.3
+        step, _ = self.step()
+        self.assertEqual(self.ring.entry(800000), step[0])
+        time.sleep(0.4)
+        self.assertEqual(0, self.calls(480000))
+
+
+class TestMultiKeyRoutingAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SimulatedRing(RING)
+        self.node = self.ring.by_id[90000]
+        # owners 200000, 200000, 480000, 480000, 650000, 800000, 800000, 1000
+        self.keys = [150000, 180000, 400000, 450000, 600000, 700000, 750000, 990000]
+
+    def owners(self, keys):
+        return [self.ring.entry(self.ring.owner_of(key)) for key in keys]
+
+    def results(self, results):
+        return [tuple(result) if result else None for result in results]
+
+    def test_grouped_by_owner(self):
+        values = [str(key).encode() for key in self.keys]
+        self.assertEqual(self.owners(self.keys), self.results(self.node.multi_set(self.keys, False, values=values)))
+        # one batch per owner, no single key requests
+        self.assertEqual(5, self.ring.count_calls("set_keys"))
+        self.assertEqual(0, self.ring.count_calls("set_key"))
+        # keys in the range of an owner already found need no lookup of their own
+        self.assertLess(self.ring.count_calls("lookup_step"), len(self.keys))
+        self.assertEqual(b"450000", self.ring.by_id[480000]._values.get(450000))
+
+        missing = 500000
+        self.assertEqual(self.owners(self.keys) + [None],
+                         self.results(self.node.multi_get(self.keys + [missing], False)))
+        self.assertEqual(5, self.ring.count_calls("get_keys"))
+        self.assertEqual(self.owners(self.keys), self.results(self.node.multi_delete(self.keys, False)))
+        self.assertEqual([None] * len(self.keys), self.node.multi_get(self.keys, False))
+
+    def test_partial_wrong_owner(self):
+        # 480000 missing from a stale successor list, 650000 gets the keys of 480000 and turns them down
+        self.node.successor_list = [self.ring.entry(200000), self.ring.entry(310000), self.ring.entry(650000)]
+        keys = [400000, 450000, 600000]
+        self.assertEqual(self.owners(keys), self.results(self.node.multi_set(keys, False)))
+        self.assertEqual(1, self.ring.calls[(self.ring.entry(650000)[1], "set_keys")])
+        self.assertTrue(self.ring.by_id[650000].get_store()[600000])
+        self.assertTrue(self.ring.by_id[480000].get_store()[400000])
+        self.assertTrue(self.ring.by_id[480000].get_store()[450000])
+        self.assertGreaterEqual(self.node.location_cache.get_stats()["wrong_owner"], 1)
+
+    def test_failed_batch_falls_back(self):
+        self.ring.failing.add((self.ring.entry(800000)[1], "set_keys"))
+        self.assertEqual(self.owners(self.keys), self.results(self.node.multi_set(self.keys, False)))
+        # the keys of the failed batch went one by one
+        self.assertEqual(2, self.ring.calls[(self.ring.entry(800000)[1], "set_key")])
+        self.assertTrue(self.ring.by_id[800000].get_store()[700000])
+
+    def test_unreachable_owner(self):
+        self.ring.down.add(self.ring.entry(800000)[1])
+        keys = [150000, 700000, 750000]
+        self.assertEqual(self.owners(keys[:1]) + [None, None], self.results(self.node.multi_set(keys, False)))
+
+    def test_owner_not_found(self):
+        lookup = self.node._lookup
+
+        def failing_lookup(identifier, *args, **kwargs):
+            if identifier == 700000:
+                raise Exception("lookup failed on purpose")
+            return lookup(identifier, *args, **kwargs)
+        self.node._lookup = failing_lookup
+        # the owners of the other keys are found in the successor list and by lookups
+        keys = [150000, 400000, 700000, 990000]
+        self.assertEqual(self.owners(keys[:2]) + [None] + self.owners(keys[3:]),
+                         self.results(self.node.multi_set(keys, False)))
+        self.assertTrue(self.ring.by_id[200000].get_store()[150000])
+        self.assertTrue(self.ring.by_id[1000].get_store()[990000])
+
+    def test_upload_not_found(self):
+        owner = self.ring.by_id[480000]
+        results, refused = owner.set_keys([[400000, b"first", None], [420000, None, "missing"],
+                                           [460000, b"third", None]])
+        self.assertEqual([self.ring.entry(480000), None, self.ring.entry(480000)], self.results(results))
+        self.assertEqual([420000], refused)
+        self.assertEqual((b"first", None, b"third"), tuple(owner._values.get(key) for key in (400000, 420000, 460000)))
+        self.assertEqual((True, None, True), tuple(owner.get_store().get(key) for key in (400000, 420000, 460000)))
+        # the accepted keys are replicated
+        self.assertFalse(self.ring.by_id[650000].get_store()[460000])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+This module builds rings of chord nodes calling each other in process, for the tests of the routing code.
+Every node has the finger table, successor list and neighbours it has in a stable ring. Peers are reached through
+PeerClient's which count the calls and can be made slow or unreachable, as a whole or for one method. No servers
+are spawned, the nodes only get the connection strings of the servers they would run on.
+"""
+
+
+import collections
+import os
+import threading
+import time
+from constants.configuration_constants import ConfigurationConstants
+os.environ.setdefault(ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE,
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.test.json"))
+from chord.node import Node
+
+
+class PeerClient(object):
+
+    """
+    Client of a node of the simulated ring. Attribute access gives the node's method, called in process.
+    """
+
+    def __init__(self, ring, node):
+        self._ring = ring
+        self._node = node
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        method = getattr(self._node, name)
+        connection_string = self._node.get_connection_string()
+
+        def call(*args):
+            with self._ring.lock:
+                self._ring.calls[(connection_string, name)] += 1
+            delay = self._ring.delays.get(connection_string)
+            if delay:
+                time.sleep(delay)
+            if connection_string in self._ring.down or (connection_string, name) in self._ring.failing:
+                raise ConnectionRefusedError("{} is down.".format(connection_string))
+            return method(*args)
+        return call
+
+
+class SimulatedNode(Node):
+
+    def __init__(self, ring, node_id, port, virtual_node):
+        super().__init__(node_id=node_id, node_ip="localhost", virtual_node=virtual_node)
+        # the configured port is the one of every node, each simulated server gets its own
+        self._port = port
+        self._connection_string = "localhost:{}".format(port)
+        if virtual_node:
+            self._connection_string += "/v{}".format(virtual_node)
+        self._simulated_ring = ring
+
+    def get_xml_client(self, node, timeout=None):
+        # calls to this node itself are still served by Node._get_client
+        return PeerClient(self._simulated_ring, self._simulated_ring.nodes[node[1]])
+
+
+class SimulatedRing(object):
+
+    """
+    Ring of SimulatedNode's with the given ids. Every node runs on a server of its own unless servers says
+    otherwise.
+    """
+
+    def __init__(self, node_ids, successor_list_size=3, servers=None):
+        """
+        :param node_ids: Ids of the nodes.
+        :param successor_list_size: Length of the successor lists.
+        :param servers: Dictionary of node id -> number of the server the node is a virtual node of.
+        """
+        self.lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.delays = {}
+        self.down = set()
+        # (connection string, method) of single methods failing
+        self.failing = set()
+        ordered = sorted(node_ids)
+        servers = servers or {node_id: index for index, node_id in enumerate(ordered)}
+        virtual_nodes = collections.Counter()
+        self.by_id = {}
+        for node_id in ordered:
+            server = servers[node_id]
+            self.by_id[node_id] = SimulatedNode(self, node_id, 6000 + server, virtual_nodes[server])
+            virtual_nodes[server] += 1
+        self.nodes = {node.get_connection_string(): node for node in self.by_id.values()}
+
+        for index, node_id in enumerate(ordered):
+            node = self.by_id[node_id]
+            m = node._ring.m_bits
+            for i in range(1, m + 1):
+                finger_node = self.entry(self.owner_of(node.i_start(node_id, i)))
+                node._finger_table.update_finger_at_ith_position(i - 1, node._new_finger(finger_node, i))
+            successors = [ordered[(index + k) % len(ordered)] for k in range(1, successor_list_size + 1)]
+            node.successor_list = [self.entry(successor) for successor in successors]
+            node.successor = self.entry(successors[0])
+            node.predecessor = self.entry(ordered[index - 1])
+        self.ordered = ordered
+
+    def entry(self, node_id):
+        """
+        :return: (node id, connection string) of the node.
+        """
+        return node_id, self.by_id[node_id].get_connection_string()
+
+    def owner_of(self, identifier):
+        """
+        :return: Id of the node responsible for identifier.
+        """
+        return next((node_id for node_id in sorted(self.by_id) if node_id >= identifier), min(self.by_id))
+
+    def predecessor_of(self, identifier):
+        """
+        :return: Id of the node preceding identifier.
+        """
+        ordered = sorted(self.by_id)
+        return ordered[ordered.index(self.owner_of(identifier)) - 1]
+
+    def count_calls(self, name):
+        return sum(count for (_, method), count in self.calls.items() if method == name)
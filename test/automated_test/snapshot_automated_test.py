@@ -0,0 +1,69 @@
+"""
+This module tests the snapshots chord nodes restart from. No chord nodes are needed.
+"""
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from chord import snapshot
+
+
+class TestSnapshotAutomated(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot(self):
+        self.assertIsNone(snapshot.load_snapshot(self.directory, 60))
+        checkpoint = snapshot.write_checkpoint(self.directory, [(1, True), (2, False)], [(1, b"value")],
+                                               [(2, 1700000000.5)])
+        snapshot.save_snapshot(self.directory, {"predecessor": [5, "localhost:5000"], "checkpoint": checkpoint})
+        state = snapshot.load_snapshot(self.directory, 60)
+        self.assertEqual([5, "localhost:5000"], state["predecessor"])
+        self.assertEqual(({1: True, 2: False}, [(1, b"value")], {2: 1700000000.5}),
+                         snapshot.read_checkpoint(self.directory, checkpoint))
+
+        # a new snapshot removes the checkpoint of the previous one
+        snapshot.save_snapshot(self.directory, {"checkpoint": snapshot.write_checkpoint(self.directory, [], [])})
+        self.assertFalse(os.path.exists(os.path.join(self.directory, checkpoint)))
+
+    def test_checkpoint_removal(self):
+        first = snapshot.write_checkpoint(self.directory, [], [])
+        second = snapshot.write_checkpoint(self.directory, [], [])
+        # a snapshot without checkpoint (log store backend) removes none
+        self.assertEqual([], snapshot.save_snapshot(self.directory, {"checkpoint": None}))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, first)))
+
+        # checkpoints newer than the one saved are kept
+        third = snapshot.write_checkpoint(self.directory, [], [])
+        self.assertEqual([], snapshot.save_snapshot(self.directory, {"checkpoint": second}))
+        self.assertEqual([second, third], sorted(name for name in os.listdir(self.directory)
+                                                 if name.startswith(snapshot.CHECKPOINT_PREFIX)))
+
+        # failures are reported instead of ignored
+        with open(os.path.join(self.directory, snapshot.CHECKPOINT_PREFIX + "1"), "w"):
+            pass
+        failures = snapshot.save_snapshot(self.directory, {"checkpoint": third})
+        self.assertEqual([snapshot.CHECKPOINT_PREFIX + "1"], [name for name, _ in failures])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, second)))
+
+    def test_stale_snapshot(self):
+        snapshot.save_snapshot(self.directory, {"checkpoint": None})
+        path = os.path.join(self.directory, snapshot.SNAPSHOT_FILE)
+        with open(path) as snapshot_file:
+            state = json.load(snapshot_file)
+        state["saved_at"] -= 120
+        with open(path, "w") as snapshot_file:
+            json.dump(state, snapshot_file)
+        self.assertIsNone(snapshot.load_snapshot(self.directory, 60))
+        self.assertIsNotNone(snapshot.load_snapshot(self.directory, 600))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+This module tests the timer wheel expiring the keys set with a ttl. No chord nodes are needed.
+"""
+
+
+import random
+import unittest
+from chord.timer_wheel import TimerWheel
+
+
+class TestTimerWheelAutomated(unittest.TestCase):
+
+    def test_expiry(self):
+        # small levels so keys go through the higher levels and the overflow
+        wheel = TimerWheel(1000.0, tick=1.0, slots=4, levels=3)
+        wheel.schedule("soon", 1002.5)
+        wheel.schedule("later", 1050)
+        wheel.schedule("far", 1500)
+        wheel.schedule("past", 990)
+        self.assertEqual(["past"], wheel.advance(1000.5))
+        self.assertEqual([], wheel.advance(1001.9))
+        self.assertEqual(["soon"], wheel.advance(1002.5))
+        self.assertEqual([], wheel.advance(1049))
+        self.assertEqual(["later"], wheel.advance(1050))
+        self.assertEqual(["far"], wheel.advance(2000))
+        self.assertEqual(0, len(wheel))
+
+    def test_reschedule_and_cancel(self):
+        wheel = TimerWheel(0, tick=1.0, slots=4, levels=3)
+        wheel.schedule(1, 10)
+        wheel.schedule(1, 30)
+        wheel.schedule(2, 10)
+        self.assertEqual(10, wheel.cancel(2))
+        self.assertIsNone(wheel.cancel(2))
+        self.assertEqual([], wheel.advance(20))
+        self.assertEqual([(1, 30)], wheel.get_deadlines([1, 2]))
+        self.assertEqual([1], wheel.advance(30))
+
+    def test_against_deadlines(self):
+        random.seed(5)
+        now = 5000.0
+        wheel = TimerWheel(now, tick=0.5, slots=4, levels=3)
+        deadlines = {}
+        for _ in range(2000):
+            if random.random() < 0.6:
+                key = random.randrange(300)
+                deadlines[key] = now + random.choice([random.uniform(-2, 4), random.uniform(0, 40),
+                                                      random.uniform(0, 200)])
+                wheel.schedule(key, deadlines[key])
+            else:
+                now += random.choice([0.2, 1, 7, 33])
+                expected = set(key for key, deadline in deadlines.items() if deadline // 0.5 <= now // 0.5)
+                self.assertEqual(expected, set(wheel.advance(now)))
+                for key in expected:
+                    del deadlines[key]
+        self.assertEqual(len(deadlines), len(wheel))
+
+
+if __name__ == "__main__":
+    unittest.main()
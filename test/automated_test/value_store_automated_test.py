@@ -0,0 +1,60 @@
+"""
+This module tests the value store of the chord nodes. No chord nodes are needed.
+"""
+
+
+import time
+import unittest
+import xmlrpc.client
+from chord.value_store import ValueStore, as_bytes
+
+
+class TestValueStoreAutomated(unittest.TestCase):
+
+    def test_values(self):
+        store = ValueStore()
+        store.put(1, b"abc")
+        store.put(2, b"defgh")
+        store.put(1, b"a")
+        self.assertEqual(b"a", store.get(1))
+        self.assertEqual([(2, b"defgh")], store.get_many([2, 3]))
+        self.assertEqual(6, store.get_stats()["value_bytes"])
+        self.assertEqual(b"defgh", store.pop(2))
+        store.pop_many([1, 3])
+        self.assertEqual({"values": 0, "value_bytes": 0, "staged_bytes": 0}, store.get_stats())
+
+    def test_staged_chunks(self):
+        store = ValueStore()
+        value = bytes(range(100))
+        view = memoryview(value)
+        for offset in range(0, 100, 16):
+            store.stage_chunk("t1", offset, view[offset:offset + 16], len(value))
+        self.assertEqual(100, store.get_stats()["staged_bytes"])
+        with self.assertRaises(ValueError):
+            store.stage_chunk("t1", 95, b"too long", len(value))
+        self.assertEqual(value, store.take_staged("t1"))
+        self.assertIsNone(store.take_staged("t1"))
+        self.assertEqual(0, store.get_stats()["staged_bytes"])
+
+    def test_purge_staged(self):
+        store = ValueStore()
+        store.staged_value_ttl = 0.05
+        store.stage_chunk("t1", 0, b"abc", 10)
+        self.assertEqual(0, store.purge_staged())
+        time.sleep(0.1)
+        store.stage_chunk("t2", 0, b"abc", 10)
+        # t1 was dropped by the upload starting, t2 isn't expired yet
+        self.assertEqual(0, store.purge_staged())
+        self.assertIsNone(store.take_staged("t1"))
+        time.sleep(0.1)
+        self.assertEqual(1, store.purge_staged())
+        self.assertEqual(0, store.get_stats()["staged_bytes"])
+
+    def test_as_bytes(self):
+        self.assertEqual(b"value", as_bytes(xmlrpc.client.Binary(b"value")))
+        self.assertEqual(b"\xc3\xa9", as_bytes("é"))
+        self.assertEqual(b"lu", as_bytes(memoryview(b"value")[2:4]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+This module tests the bounded worker pool of the node servers (messaging.worker_pool): the queue bound, the
+overloaded fault, the server statistics and two nodes calling each other with all their workers busy.
+Servers are spawned on localhost, no chord nodes are needed.
+"""
+
+
+import os
+import socket
+import threading
+import time
+import unittest
+import xmlrpc.client
+from constants.configuration_constants import ConfigurationConstants
+os.environ[ConfigurationConstants.CHORD_CONFIGURATION_FILE_ENV_VARIABLE] = \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.test.json")
+from constants.messaging_constants import MessagingConstants
+from messaging.connection_pool import ConnectionPool
+from messaging.socket_messaging import ChordSocketClient, ThreadedChordTCPServer
+
+
+class BlockingNode(object):
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.pool = ConnectionPool(rpc_engine=MessagingConstants.RPC_ENGINE_SOCKET, call_timeout=0.5)
+
+    def block(self):
+        return self.release.wait(10)
+
+    def echo(self, value):
+        return value
+
+    def relay(self, port):
+        # both nodes get here before calling each other, so neither has a free worker for the other's call
+        self.barrier.wait()
+        return self.pool.get_client("localhost:{}".format(port)).echo(True)
+
+
+class TestWorkerPoolAutomated(unittest.TestCase):
+
+    def start_server(self, node, worker_count, queue_size):
+        server = ThreadedChordTCPServer(("localhost", 0), worker_count=worker_count, queue_size=queue_size)
+        server.register_instance(node)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def stop_server(self, server):
+        server.shutdown()
+        closing = threading.Thread(target=server.server_close)
+        closing.start()
+        closing.join(5)
+        self.assertFalse(closing.is_alive())
+
+    def client(self, server):
+        return ChordSocketClient("localhost", server.server_address[1], timeout=10)
+
+    def wait_for(self, server, name, value, at_least=False):
+        deadline = time.monotonic() + 5
+        while not (server.get_server_stats()[name] >= value if at_least else server.get_server_stats()[name] == value):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_overloaded_fault(self):
+        node = BlockingNode()
+        server = self.start_server(node, worker_count=1, queue_size=1)
+        results = {}
+        blocked = threading.Thread(target=lambda: results.update(block=self.client(server).block()))
+        blocked.start()
+        self.wait_for(server, "busy_workers", 1)
+        queued = threading.Thread(target=lambda: results.update(echo=self.client(server).echo(1)))
+        queued.start()
+        self.wait_for(server, "queue_depth", 1)
+
+        # queue is full, the next request is rejected without waiting for a worker
+        started = time.monotonic()
+        with self.assertRaises(xmlrpc.client.Fault) as context:
+            self.client(server).echo(2)
+        self.assertEqual(MessagingConstants.OVERLOADED_FAULT_CODE, context.exception.faultCode)
+        self.assertLess(time.monotonic() - started, 1)
+
+        stats = server.get_server_stats()
+        self.assertEqual(1, stats["workers"])
+        self.assertEqual(1, stats["queue_size"])
+        self.assertEqual(1, stats["rejected"])
+        node.release.set()
+        blocked.join(5)
+        queued.join(5)
+        self.assertEqual({"block": True, "echo": 1}, results)
+        # closed connections of the clients count as served too
+        self.wait_for(server, "served", 2, at_least=True)
+        self.assertEqual(0, server.get_server_stats()["busy_workers"])
+        self.stop_server(server)
+
+    def test_close_with_full_queue(self):
+        node = BlockingNode()
+        server = self.start_server(node, worker_count=1, queue_size=1)
+        threading.Thread(target=lambda: self.client(server).block(), daemon=True).start()
+        self.wait_for(server, "busy_workers", 1)
+        connection = socket.create_connection(server.server_address)
+        connection.sendall(b"\0\0\0\0")
+        self.wait_for(server, "queue_depth", 1)
+        self.stop_server(server)
+        node.release.set()
+        connection.close()
+
+    def test_nodes_calling_each_other(self):
+        node = BlockingNode()
+        first = self.start_server(node, worker_count=1, queue_size=4)
+        second = self.start_server(node, worker_count=1, queue_size=4)
+        errors = []
+
+        def relay(server, peer):
+            try:
+                self.client(server).relay(peer.server_address[1])
+            except xmlrpc.client.Fault as fault:
+                errors.append(fault)
+
+        threads = [threading.Thread(target=relay, args=(first, second)),
+                   threading.Thread(target=relay, args=(second, first))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        # the nested calls time out instead of both nodes waiting on each other for good
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        # the first call timing out frees a worker, the other call may still make it in time
+        self.assertIn(len(errors), (1, 2))
+        self.assertEqual(1, self.client(first).echo(1))
+        node.pool.close()
+        self.stop_server(first)
+        self.stop_server(second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,9 @@ accessibility for configuration properties throughout the project.
 
 import json
 import os
+from constants.chord_constants import ChordConstants
 from constants.configuration_constants import ConfigurationConstants
+from constants.messaging_constants import MessagingConstants
 
 
 __all__ = ["ConfigurationManager"]
@@ -43,6 +45,105 @@ class Configuration(object):
     def get_stabilize_interval(self):
         return self._config[ConfigurationConstants.CHORD_STABILIZE_INTERVAL]
 
+    def get_rpc_engine(self):
+        return self._config.get(ConfigurationConstants.CHORD_RPC_ENGINE, MessagingConstants.RPC_ENGINE_XMLRPC)
+
+    def get_async_executor_workers(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_ASYNC_EXECUTOR_WORKERS, 32))
+
+    def get_server_worker_count(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_SERVER_WORKER_COUNT, 32))
+
+    def get_server_queue_size(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_SERVER_QUEUE_SIZE, 128))
+
+    def get_lookup_mode(self):
+        return self._config.get(ConfigurationConstants.CHORD_LOOKUP_MODE, ChordConstants.LOOKUP_MODE_ITERATIVE)
+
+    def get_lookup_hop_timeout(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_LOOKUP_HOP_TIMEOUT, 1))
+
+    def get_lookup_timeout(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_LOOKUP_TIMEOUT, 5))
+
+    def get_lookup_parallelism(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_LOOKUP_PARALLELISM, 1))
+
+    def get_lookup_hedge_delay(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_LOOKUP_HEDGE_DELAY, 0.05))
+
+    def get_lookup_tracing(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_LOOKUP_TRACING, 0))
+
+    def get_lookup_trace_window(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_LOOKUP_TRACE_WINDOW, 1000))
+
+    def get_lookup_trace_history(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_LOOKUP_TRACE_HISTORY, 100))
+
+    def get_store_backend(self):
+        return self._config.get(ConfigurationConstants.CHORD_STORE_BACKEND, ChordConstants.STORE_BACKEND_DICT)
+
+    def get_store_shards(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_STORE_SHARDS, 1))
+
+    def get_store_directory(self):
+        return self._config.get(ConfigurationConstants.CHORD_STORE_DIRECTORY, "data")
+
+    def get_store_segment_size(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_STORE_SEGMENT_SIZE, 64 * 1024 * 1024))
+
+    def get_store_sync(self):
+        return bool(int(self._config.get(ConfigurationConstants.CHORD_STORE_SYNC, 1)))
+
+    def get_store_compaction_interval(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_STORE_COMPACTION_INTERVAL, 30))
+
+    def get_snapshot_interval(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_SNAPSHOT_INTERVAL, 0))
+
+    def get_snapshot_max_age(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_SNAPSHOT_MAX_AGE, 600))
+
+    def get_max_value_size(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_MAX_VALUE_SIZE, 16 * 1024 * 1024))
+
+    def get_value_chunk_size(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_VALUE_CHUNK_SIZE, 256 * 1024))
+
+    def get_scan_page_size(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_SCAN_PAGE_SIZE, 1000))
+
+    def get_expiry_tick(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_EXPIRY_TICK, 1))
+
+    def get_virtual_nodes(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_VIRTUAL_NODES, 1))
+
+    def get_location_cache_size(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_LOCATION_CACHE_SIZE, 1024))
+
+    def get_location_cache_ttl(self):
+        return float(self._config.get(ConfigurationConstants.CHORD_LOCATION_CACHE_TTL, 30))
+
+    def get_proximity_routing(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_PROXIMITY_ROUTING, 0))
+
+    def get_proximity_candidates(self):
+        return int(self._config.get(ConfigurationConstants.CHORD_PROXIMITY_CANDIDATES, 3))
+
+    def get_connection_pool_size(self):
+        return int(self._config.get(ConfigurationConstants.CONNECTION_POOL_SIZE, 64))
+
+    def get_connection_pool_size_per_peer(self):
+        return int(self._config.get(ConfigurationConstants.CONNECTION_POOL_SIZE_PER_PEER, 4))
+
+    def get_connection_idle_timeout(self):
+        return float(self._config.get(ConfigurationConstants.CONNECTION_IDLE_TIMEOUT, 30))
+
+    def get_peer_call_timeout(self):
+        return float(self._config.get(ConfigurationConstants.PEER_CALL_TIMEOUT, 30)) or None
+
     def get_log_file(self):
         return self._config[ConfigurationConstants.LOG_FILE]
 